@@ -18,7 +18,14 @@ class EtkenMaddeController extends Controller
     public function index(Request $request)
     {
         $perPage = $request->input('per_page', 15);
-        $etkenMaddeler = EtkenMadde::paginate($perPage);
+        $query = EtkenMadde::query();
+
+        // Artımlı senkronizasyon (ML servisi): yalnızca değişen kayıtlar
+        if ($request->filled('updated_since')) {
+            $query->changedSince($request->input('updated_since'), $request->input('after_id'));
+        }
+
+        $etkenMaddeler = $query->paginate($perPage);
 
         return response()->json([
             'status' => 'success',
@@ -18,7 +18,14 @@ class HastaController extends Controller
     public function index(Request $request)
     {
         $perPage = $request->input('per_page', 15);
-        $hastalar = Hasta::paginate($perPage);
+        $query = Hasta::query();
+
+        // Artımlı senkronizasyon (ML servisi): yalnızca değişen kayıtlar
+        if ($request->filled('updated_since')) {
+            $query->changedSince($request->input('updated_since'), $request->input('after_id'));
+        }
+
+        $hastalar = $query->paginate($perPage);
 
         return response()->json([
             'status' => 'success',
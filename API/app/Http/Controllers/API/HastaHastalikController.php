@@ -43,6 +43,11 @@ public function index(Request $request)
             $query->where('siddet', $siddet);
         }
 
+        // Artımlı senkronizasyon (ML servisi): yalnızca değişen kayıtlar
+        if ($request->filled('updated_since')) {
+            $query->changedSince($request->input('updated_since'), $request->input('after_id'));
+        }
+
         $hastaHastaliklar = $query->paginate($perPage);
 
         return response()->json([
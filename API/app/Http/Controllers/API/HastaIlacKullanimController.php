@@ -43,6 +43,11 @@ public function index(Request $request)
             $query->where('etkinlik_degerlendirmesi', $etkinlik);
         }
 
+        // Artımlı senkronizasyon (ML servisi): yalnızca değişen kayıtlar
+        if ($request->filled('updated_since')) {
+            $query->changedSince($request->input('updated_since'), $request->input('after_id'));
+        }
+
         $hastaIlacKullanimlar = $query->paginate($perPage);
 
         return response()->json([
@@ -36,6 +36,11 @@ public function index(Request $request)
             });
         }
 
+        // Artımlı senkronizasyon (ML servisi): yalnızca değişen kayıtlar
+        if ($request->filled('updated_since')) {
+            $query->changedSince($request->input('updated_since'), $request->input('after_id'));
+        }
+
         $hastaliklar = $query->paginate($perPage);
 
         return response()->json([
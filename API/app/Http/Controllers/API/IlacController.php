@@ -16,8 +16,14 @@ class IlacController extends Controller
     public function index(Request $request)
     {
         $perPage = $request->input('per_page', 15);
-        $ilaclar = Ilac::with('etkenMaddeler:etken_madde_id,etken_madde_adi')
-            ->paginate($perPage);
+        $query = Ilac::with('etkenMaddeler:etken_madde_id,etken_madde_adi');
+
+        // Artımlı senkronizasyon (ML servisi): yalnızca değişen kayıtlar
+        if ($request->filled('updated_since')) {
+            $query->changedSince($request->input('updated_since'), $request->input('after_id'));
+        }
+
+        $ilaclar = $query->paginate($perPage);
 
         return response()->json([
             'status' => 'success',
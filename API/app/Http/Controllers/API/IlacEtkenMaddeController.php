@@ -38,6 +38,11 @@ public function index(Request $request)
             $query->where('miktar', 'like', "%{$dozajAra}%");
         }
 
+        // Artımlı senkronizasyon (ML servisi): yalnızca değişen kayıtlar
+        if ($request->filled('updated_since')) {
+            $query->changedSince($request->input('updated_since'), $request->input('after_id'));
+        }
+
         $ilacEtkenMaddeler = $query->paginate($perPage);
 
         return response()->json([
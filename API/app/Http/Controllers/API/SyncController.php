@@ -0,0 +1,57 @@
+<?php
+
+namespace App\Http\Controllers\API;
+
+use App\Http\Controllers\Controller;
+use App\Models\EtkenMadde;
+use App\Models\Hasta;
+use App\Models\HastaHastalik;
+use App\Models\HastaIlacKullanim;
+use App\Models\Hastalik;
+use App\Models\Ilac;
+use App\Models\IlacEtkenMadde;
+
+class SyncController extends Controller
+{
+    /**
+     * ML servisinin senkronize ettiği veri kümeleri ve modelleri
+     *
+     * @var array<string, class-string>
+     */
+    protected const TABLOLAR = [
+        'hastalar' => Hasta::class,
+        'hastaliklar' => Hastalik::class,
+        'hasta_hastaliklar' => HastaHastalik::class,
+        'ilaclar' => Ilac::class,
+        'etken_maddeler' => EtkenMadde::class,
+        'ilac_etken_maddeler' => IlacEtkenMadde::class,
+        'hasta_ilac_kullanim' => HastaIlacKullanim::class,
+    ];
+
+    /**
+     * Bir veri kümesindeki canlı kayıtların birincil anahtarlarını listeler.
+     *
+     * ML servisi artımlı senkronizasyondan sonra yerel anlık görüntüde bu
+     * listede olmayan satırları (kalıcı silinen kayıtlar) düşürür.
+     *
+     * @param  string  $tablo
+     * @return \Illuminate\Http\JsonResponse
+     */
+    public function ids($tablo)
+    {
+        if (!array_key_exists($tablo, self::TABLOLAR)) {
+            return response()->json([
+                'status' => 'error',
+                'message' => 'Bilinmeyen veri kümesi'
+            ], 404);
+        }
+
+        $model = self::TABLOLAR[$tablo];
+
+        return response()->json([
+            'status' => 'success',
+            'data' => $model::liveKeys(),
+            'message' => 'Kayıt anahtarları başarıyla listelendi'
+        ]);
+    }
+}
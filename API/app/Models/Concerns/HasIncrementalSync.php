@@ -0,0 +1,59 @@
+<?php
+
+namespace App\Models\Concerns;
+
+use Illuminate\Database\Eloquent\SoftDeletes;
+use Illuminate\Support\Carbon;
+
+trait HasIncrementalSync
+{
+    /**
+     * Artımlı senkronizasyon için yalnızca değişen kayıtları getirir.
+     *
+     * updated_at değeri verilen zamandan sonra (veya aynı anda) değişen kayıtlar
+     * ile birincil anahtarı $afterId'den büyük olan kayıtlar (zaman damgası boş
+     * olabilen yeni kayıtlar) döndürülür. Soft delete kullanan modellerde silinen
+     * kayıtlar da deleted_at alanıyla birlikte gelir ki istemci onları düşürebilsin.
+     *
+     * @param  \Illuminate\Database\Eloquent\Builder  $query
+     * @param  string  $updatedSince
+     * @param  int|null  $afterId
+     * @return \Illuminate\Database\Eloquent\Builder
+     */
+    public function scopeChangedSince($query, $updatedSince, $afterId = null)
+    {
+        $keyName = $this->getQualifiedKeyName();
+        $updatedAt = $this->qualifyColumn($this->getUpdatedAtColumn());
+        $since = Carbon::parse($updatedSince)->setTimezone(config('app.timezone'));
+
+        $query->where(function ($q) use ($updatedAt, $since, $keyName, $afterId) {
+            $q->where($updatedAt, '>=', $since);
+
+            if ($afterId) {
+                $q->orWhere($keyName, '>', $afterId);
+            }
+        });
+
+        if (in_array(SoftDeletes::class, class_uses_recursive($this))) {
+            $query->withTrashed();
+        }
+
+        // Sayfalar arasında kararlı sıralama
+        return $query->orderBy($keyName);
+    }
+
+    /**
+     * Canlı (silinmemiş) kayıtların birincil anahtarlarını artan sırada döndürür.
+     *
+     * changedSince yalnızca soft delete edilen kayıtları bildirebilir; kalıcı
+     * olarak silinen kayıtları ML servisi bu listede bulamayarak düşürür.
+     *
+     * @return \Illuminate\Support\Collection
+     */
+    public static function liveKeys()
+    {
+        $keyName = (new static)->getKeyName();
+
+        return static::query()->toBase()->orderBy($keyName)->pluck($keyName);
+    }
+}
@@ -2,12 +2,13 @@
 
 namespace App\Models;
 
+use App\Models\Concerns\HasIncrementalSync;
 use Illuminate\Database\Eloquent\Factories\HasFactory;
 use Illuminate\Database\Eloquent\Model;
 
 class EtkenMadde extends Model
 {
-    use HasFactory;
+    use HasFactory, HasIncrementalSync;
 
     protected $table = 'etken_maddeler';
     protected $primaryKey = 'etken_madde_id';
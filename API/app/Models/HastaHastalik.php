@@ -2,12 +2,13 @@
 
 namespace App\Models;
 
+use App\Models\Concerns\HasIncrementalSync;
 use Illuminate\Database\Eloquent\Factories\HasFactory;
 use Illuminate\Database\Eloquent\Model;
 
 class HastaHastalik extends Model
 {
-    use HasFactory;
+    use HasFactory, HasIncrementalSync;
 
     protected $table = 'hasta_hastaliklar';
     protected $primaryKey = 'hasta_hastalik_id';
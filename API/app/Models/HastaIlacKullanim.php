@@ -2,12 +2,13 @@
 
 namespace App\Models;
 
+use App\Models\Concerns\HasIncrementalSync;
 use Illuminate\Database\Eloquent\Factories\HasFactory;
 use Illuminate\Database\Eloquent\Model;
 
 class HastaIlacKullanim extends Model
 {
-    use HasFactory;
+    use HasFactory, HasIncrementalSync;
 
     protected $table = 'hasta_ilac_kullanim';
     protected $primaryKey = 'kullanim_id';
@@ -2,6 +2,7 @@
 
 namespace App\Models;
 
+use App\Models\Concerns\HasIncrementalSync;
 use Illuminate\Database\Eloquent\Factories\HasFactory;
 use Illuminate\Database\Eloquent\Model;
 
@@ -10,7 +11,7 @@
  */
 class Hastalik extends Model
 {
-    use HasFactory;
+    use HasFactory, HasIncrementalSync;
 
     protected $table = 'hastaliklar';
     protected $primaryKey = 'hastalik_id';
@@ -2,12 +2,13 @@
 
 namespace App\Models;
 
+use App\Models\Concerns\HasIncrementalSync;
 use Illuminate\Database\Eloquent\Factories\HasFactory;
 use Illuminate\Database\Eloquent\Model;
 
 class IlacEtkenMadde extends Model
 {
-    use HasFactory;
+    use HasFactory, HasIncrementalSync;
 
     protected $table = 'ilac_etken_maddeler';
     protected $primaryKey = 'ilac_etken_madde_id';
@@ -15,6 +15,7 @@
 use App\Http\Controllers\API\MedicationReminderController;
 use App\Http\Controllers\API\ReceteController;
 use App\Http\Controllers\API\SearchController;
+use App\Http\Controllers\API\SyncController;
 use App\Http\Controllers\API\UserController;
 use Illuminate\Http\Request;
 use Illuminate\Support\Facades\Route;
@@ -163,5 +164,8 @@
 Route::get('/ilac-etken-maddeler/etken-madde/{etkenMadde}/ilaclar', [IlacEtkenMaddeController::class, 'getMedicinesByActiveSubstance']);
 Route::get('/ilac-etken-maddeler/ilac/{ilac}/etken-maddeler', [IlacEtkenMaddeController::class, 'getActiveSubstancesByMedicine']);
 
+// ML servisi senkronizasyonu: silinen kayıtları ayıklamak için canlı birincil anahtarlar
+Route::get('/sync/{tablo}/ids', [SyncController::class, 'ids']);
+
 Route::get('/general/search', [SearchController::class, 'search']);
 Route::get('/general/{receteNo}', [SearchController::class, 'getMedicineByBarcode']);
@@ -0,0 +1,33 @@
+"""
+İlaç Öneri Sistemi gunicorn ayarları
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Tüm ayarlar ortam değişkenleriyle değiştirilebilir. Tahmin CPU ağırlıklı olduğundan
+varsayılan olarak çekirdek başına bir worker süreci, her worker'da birkaç iş parçacığı
+(gthread) çalışır. Her worker hasta özellikleri modelinin (orman) ayrı bir kopyasını taşır;
+worker sayısı belirlenirken model boyutu x worker sayısı kadar bellek hesaba katılmalıdır.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Uzun süren toplu tahmin akışları için istek zaman aşımı (saniye)
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Bellek sızıntılarına karşı worker'ları belirli istek sayısından sonra yenile (0 = kapalı)
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 0))
+
+# Uygulama ve model fork öncesi ana süreçte yüklenir (bkz. wsgi.py)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = os.environ.get("GUNICORN_ERROR_LOG", "-")
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
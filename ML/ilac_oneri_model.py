@@ -1,28 +1,35 @@
 import numpy as np
 import pandas as pd
 import requests
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import warnings
-from sklearn.exceptions import ConvergenceWarning
 import joblib
 import flask
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import logging
 import os
 import json
+import hashlib
 import datetime
-from sklearn.model_selection import GridSearchCV
-from collections import defaultdict
-import seaborn as sns
-import matplotlib.pyplot as plt
-import random
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 import time
+import pickle
+import threading
+import multiprocessing
+import uuid
 
+try:
+    import fcntl  # worker süreçleri arası eğitim kilidi (yalnızca POSIX)
+except ImportError:
+    fcntl = None
+
+
+# Eğitim (sklearn model seçimi, topluluk modelleri, metrikler) ve görselleştirme (matplotlib,
+# seaborn) modülleri yalnızca kullanıldıkları fonksiyonlarda içe aktarılır; sadece tahmin
+# sunan süreçler bu bağımlılıkları yüklemez.
 
 # Loglama ayarları
 logging.basicConfig(
@@ -41,6 +48,976 @@ app = Flask(__name__)
 # API Adresleri (değiştirilmesi gerekebilir)
 API_BASE_URL = "http://192.168.1.16:8000/api"  # Laravel API base URL
 
+# Eğitim verisi uç noktaları: veri kümesi -> (yol, sayfa boyutu)
+API_ENDPOINTS = {
+    "hastalar": ("/hastalar", 5000),
+    "hastaliklar": ("/hastaliklar", 5000),
+    "hasta_hastaliklar": ("/hasta-hastaliklar", 5000),
+    "ilaclar": ("/ilaclar", 5000),
+    "etken_maddeler": ("/etken-maddeler", 5000),
+    "ilac_etken_maddeler": ("/ilac-etken-maddeler", 1000),
+    "hasta_ilac_kullanim": ("/hasta-ilac-kullanim", 5000)
+}
+
+# Tabloların birincil anahtarları (artımlı senkronizasyonda birleştirme için)
+TABLE_PRIMARY_KEYS = {
+    "hastalar": "hasta_id",
+    "hastaliklar": "hastalik_id",
+    "hasta_hastaliklar": "hasta_hastalik_id",
+    "ilaclar": "ilac_id",
+    "etken_maddeler": "etken_madde_id",
+    "ilac_etken_maddeler": "ilac_etken_madde_id",
+    "hasta_ilac_kullanim": "kullanim_id"
+}
+
+# Anlık görüntüde saklanan tipli sütunlar: veri kümesi -> {sütun: tip}
+# (prepare_data ve improved_data_preparation'ın kullandığı sütunlar + senkronizasyon alanları)
+TABLE_SCHEMAS = {
+    "hastalar": {"hasta_id": "int64", "yas": "int64", "cinsiyet": "str", "boy": "float64",
+                 "kilo": "float64", "vki": "float64", "updated_at": "str"},
+    "hastaliklar": {"hastalik_id": "int64", "hastalik_adi": "str", "hastalik_kategorisi": "str",
+                    "updated_at": "str"},
+    "hasta_hastaliklar": {"hasta_hastalik_id": "int64", "hasta_id": "int64", "hastalik_id": "int64",
+                          "siddet": "str", "updated_at": "str"},
+    "ilaclar": {"ilac_id": "int64", "ilac_adi": "str", "updated_at": "str"},
+    "etken_maddeler": {"etken_madde_id": "int64", "etken_madde_adi": "str", "updated_at": "str"},
+    "ilac_etken_maddeler": {"ilac_etken_madde_id": "int64", "ilac_id": "int64", "etken_madde_id": "int64",
+                            "updated_at": "str"},
+    "hasta_ilac_kullanim": {"kullanim_id": "int64", "hasta_id": "int64", "ilac_id": "int64",
+                            "hasta_hastalik_id": "float64", "updated_at": "str"}
+}
+
+# Bir veri kümesindeki canlı kayıtların birincil anahtarları (kalıcı silinenleri ayıklamak için)
+SYNC_IDS_ENDPOINT = "/sync/{key}/ids"
+
+# Eski API sürümlerinde farklı adlandırılmış sütunlar: eski ad -> yeni ad
+COLUMN_ALIASES = {
+    "adi": "ilac_adi",
+    "kategori": "hastalik_kategorisi"
+}
+
+# Artımlı senkronizasyon için yerel anlık görüntü dizini
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "veri_snapshot")
+
+# Tam uzlaştırma aralığı (saat): son tam çekimden bu kadar süre geçtiyse artımlı yerine tüm
+# veriler yeniden çekilir. Silinen kayıtlar zaten canlı anahtar listesiyle ayıklandığından
+# yalnızca updated_at'i güncellenmeden değiştirilen kayıtlar için bir güvenlik ağıdır; 0 = kapalı.
+SNAPSHOT_FULL_SYNC_HOURS = float(os.environ.get("SNAPSHOT_FULL_SYNC_HOURS", os.environ.get("SNAPSHOT_TTL_HOURS", 24 * 7)))
+
+# Parquet için pyarrow gerekir, yoksa tipli pickle dosyalarına düşülür
+try:
+    import pyarrow  # noqa: F401
+    SNAPSHOT_FORMAT = "parquet"
+except ImportError:
+    SNAPSHOT_FORMAT = "pickle"
+
+# Akış halinde JSON ayrıştırma için ijson; yoksa her sayfa tek seferde ayrıştırılır
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Worker süreçleri arasında paylaşılan önbellek için redis; yoksa süreç içi önbellek kullanılır
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Eşzamanlı veri çekme ayarları
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 8))
+FETCH_TIMEOUT = (5, 120)  # (bağlantı, okuma) saniye
+
+# İstek yolunda yapılan Laravel API çağrıları (hasta demografisi, ilaç bilgisi): kısa zaman
+# aşımları, paylaşılan bağlantı havuzu ve art arda UPSTREAM_BREAKER_FAILURES hatadan sonra
+# API'yi UPSTREAM_BREAKER_RESET saniye boyunca hiç çağırmayan devre kesici
+UPSTREAM_TIMEOUT = (
+    float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 1.0)),
+    float(os.environ.get("UPSTREAM_READ_TIMEOUT", 2.0))
+)  # (bağlantı, okuma) saniye
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", 16))
+UPSTREAM_BREAKER_FAILURES = int(os.environ.get("UPSTREAM_BREAKER_FAILURES", 5))
+UPSTREAM_BREAKER_RESET = float(os.environ.get("UPSTREAM_BREAKER_RESET", 30))
+
+# Önbellek ayarları: CACHE_BACKEND "memory" (süreç içi LRU + TTL) veya "redis" (worker'lar
+# arası paylaşımlı; redis paketi gerekir, Redis'e ulaşılamazsa süreç içi önbelleğe düşülür)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+HASTA_CACHE_MAX_SIZE = int(os.environ.get("HASTA_CACHE_MAX_SIZE", 10000))
+HASTA_CACHE_TTL = float(os.environ.get("HASTA_CACHE_TTL", 3600))  # saniye
+
+# Tahmin sonucu önbelleği: aynı normalize girdiler ve aynı model için sonuç yeniden hesaplanmaz.
+# Anahtar model parmak izini içerir; yeni model eski sonuçlarla hiçbir zaman eşleşmez.
+PREDICTION_CACHE_MAX_SIZE = int(os.environ.get("PREDICTION_CACHE_MAX_SIZE", 20000))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 600))  # saniye
+
+# Hiperparametre araması ayarları
+# mode: "halving" (ardışık yarılama, bütçeli), "grid" (tam ızgara araması) veya "none" (varsayılan parametreler)
+# halving modunda kaynak ağaç sayısıdır: adaylar min_resources ağaçla başlar, her turda
+# en iyi 1/factor kısmı factor kat daha fazla ağaçla yeniden denenir (en fazla max_resources)
+HYPERPARAM_SEARCH = {
+    "mode": os.environ.get("HYPERPARAM_SEARCH_MODE", "halving"),
+    "n_candidates": int(os.environ.get("HYPERPARAM_SEARCH_CANDIDATES", 24)),  # ilk turdaki aday sayısı (bütçe)
+    "factor": int(os.environ.get("HYPERPARAM_SEARCH_FACTOR", 3)),
+    "min_resources": int(os.environ.get("HYPERPARAM_SEARCH_MIN_TREES", 25)),
+    "max_resources": int(os.environ.get("HYPERPARAM_SEARCH_MAX_TREES", 300)),
+    "n_jobs": int(os.environ.get("HYPERPARAM_SEARCH_JOBS", -1)),
+    "random_state": 42
+}
+
+# Hiperparametre aramasında ön işleme (ColumnTransformer) önbelleği: aynı kat verisi için
+# kodlama adaylar arasında bir kez yapılır. Boş bırakılırsa önbellek kapatılır.
+PREPROCESS_CACHE_DIR = os.environ.get("PREPROCESS_CACHE_DIR", "onisleme_cache")
+PREPROCESS_CACHE_MAX_BYTES = os.environ.get("PREPROCESS_CACHE_MAX_BYTES", "1G")
+
+# ID özellikleri (hastalık, etken madde) benzersiz değer sayısından bağımsız olarak her zaman
+# kategorik ve seyrek (CSR) kodlanır. Benzersiz değer sayısı eşiği aşarsa one-hot yerine
+# sabit genişlikte özellik karma (hashing) kullanılır; böylece özellik sayısı sınırlı kalır.
+ID_FEATURES = ["hastalik_id", "etken_madde_id"]
+ID_HASHING_THRESHOLD = int(os.environ.get("ID_HASHING_THRESHOLD", 5000))
+ID_HASH_FEATURES = int(os.environ.get("ID_HASH_FEATURES", 2 ** 12))
+
+# Bir tahmin isteğinde döndürülecek öneri sayısı
+MAX_RECOMMENDATIONS = 5
+
+# Hastalık başına eğitimde önceden sıralanıp saklanan en iyi ilaç sayısı
+HASTALIK_TOPK = int(os.environ.get("HASTALIK_TOPK", 50))
+
+# Toplu tahmin isteğinde kabul edilen en fazla sorgu sayısı
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get("PREDICT_BATCH_MAX_SIZE", 1000))
+
+# Hibrit modelde alt model skorlarının birleştirme ağırlıkları: "etken madde,hastalık,hasta özellikleri"
+HYBRID_FUSION_WEIGHTS = tuple(float(w) for w in os.environ.get("HYBRID_FUSION_WEIGHTS", "1.0,1.0,0.8").split(","))
+if len(HYBRID_FUSION_WEIGHTS) != 3:
+    raise ValueError("HYBRID_FUSION_WEIGHTS üç ağırlık içermeli: etken madde, hastalık, hasta özellikleri")
+
+# Keşif modu: 0'dan büyükse en iyi MAX_RECOMMENDATIONS önerinin skoru ±oran kadar rastgele
+# değiştirilip öneriler yeniden sıralanır (listeye yeni ilaç girmez). Rastgelelik
+# tohum ve sorgudan türetilir; aynı sorgu her zaman aynı sıralamayı alır (önbellek ve kıyaslama için).
+HYBRID_EXPLORATION_RATE = float(os.environ.get("HYBRID_EXPLORATION_RATE", 0))
+HYBRID_EXPLORATION_SEED = int(os.environ.get("HYBRID_EXPLORATION_SEED", 42))
+
+# Hasta özellikleri modeli: hasta-ilaç kullanımları (cinsiyet, yaş, VKİ, ilaç) profillerine
+# indirgenir ve tekrar sayısı örnek ağırlığı olur. Eğitim süresini sınırlamak için en fazla
+# bu kadar profil (en sık görülenler) kullanılır.
+PATIENT_MODEL_FEATURES = ["cinsiyet", "yas", "vki"]
+PATIENT_MODEL_MAX_ROWS = int(os.environ.get("PATIENT_MODEL_MAX_ROWS", 100000))
+# Ormanın eğitim ve predict_proba'da kullandığı iş parçacığı sayısı (-1: tüm çekirdekler). Her
+# gunicorn worker'ı modeli ayrı çalıştırdığından varsayılan 1'dir.
+PATIENT_MODEL_N_JOBS = int(os.environ.get("PATIENT_MODEL_N_JOBS", 1))
+
+# Hibrit modelin kayıt yeri: sayısal diziler .npy dosyaları olarak sürüm klasörlerine yazılır,
+# CURRENT dosyası etkin sürümü gösterir. Diziler mmap_mode='r' ile açıldığından aynı makinedeki
+# worker süreçleri tek fiziksel kopyayı paylaşır. Hasta özellikleri modeli (RandomForest) bu
+# kapsamda değildir: sklearn ağaç düğümlerini yüklerken kendi belleğine kopyalar, bu yüzden her
+# worker ormanın ayrı bir kopyasını taşır. Eski tek dosyalık joblib modeli de yüklenebilir.
+RECOMMENDER_MODEL_PATH = os.environ.get("RECOMMENDER_MODEL_PATH", "improved_drug_recommender")
+RECOMMENDER_LEGACY_MODEL_PATH = os.environ.get("RECOMMENDER_LEGACY_MODEL_PATH", "improved_drug_recommender.joblib")
+RECOMMENDER_ARTIFACT_KEEP = int(os.environ.get("RECOMMENDER_ARTIFACT_KEEP", 3))  # diskte saklanan sürüm sayısı
+
+# Çok süreçli sunucuda (gunicorn) her worker CURRENT dosyasını en fazla bu aralıkla (saniye)
+# kontrol eder ve başka bir worker'ın yayınladığı yeni sürümü yükler. 0 kontrolü kapatır.
+RECOMMENDER_RELOAD_INTERVAL = float(os.environ.get("RECOMMENDER_RELOAD_INTERVAL", 5))
+
+# Arka plan eğitim işleri: aynı anda en fazla TRAIN_MAX_WORKERS eğitim çalışır,
+# bellekte son TRAIN_JOB_HISTORY işin durumu saklanır. İş kayıtları TRAIN_JOBS_DIR altına da
+# yazılır; durum sorgusu hangi worker sürecine düşerse düşsün yanıtlanır. Eğitimin kendisi
+# her iş için ayrı başlatılan (spawn) bir süreçte çalışır; servis eden worker'ın belleği ve
+# GIL'i eğitimle paylaşılmaz, yeni sürüm CURRENT dosyası üzerinden yüklenir.
+TRAIN_MAX_WORKERS = int(os.environ.get("TRAIN_MAX_WORKERS", 1))
+TRAIN_JOB_HISTORY = int(os.environ.get("TRAIN_JOB_HISTORY", 20))
+TRAIN_JOBS_DIR = os.environ.get("TRAIN_JOBS_DIR", "egitim_isleri")
+
+# Etken madde uyumu ayarları: ortak etken maddesi olmayan ilaçlara uygulanan sabit değerler
+ETKEN_MADDE_ESLESMESIZ_CARPAN = float(os.environ.get("ETKEN_MADDE_ESLESMESIZ_CARPAN", 0.3))  # etken maddesi bilinen ama eşleşmeyen ilaç
+ETKEN_MADDE_BILGISIZ_CARPAN = float(os.environ.get("ETKEN_MADDE_BILGISIZ_CARPAN", 0.5))  # etken madde bilgisi olmayan ilaç
+# Hibrit modelde eşleşmeyen aday ilaçların etken madde skoru (boş bırakılırsa bu ilaçlar skorlanmaz)
+ETKEN_MADDE_FALLBACK_SCORE = os.environ.get("ETKEN_MADDE_FALLBACK_SCORE", "0")
+ETKEN_MADDE_FALLBACK_SCORE = float(ETKEN_MADDE_FALLBACK_SCORE) if ETKEN_MADDE_FALLBACK_SCORE else None
+
+
+class PageColumns:
+    """Tek bir API sayfasından ayıklanan gerekli sütun değerleri"""
+    
+    def __init__(self, columns):
+        self.values = {col: [] for col in columns}
+        self.rows = 0
+        self.last_page = 1
+        self.per_page = None
+        self.total = None
+    
+    def append(self, record):
+        for col, values in self.values.items():
+            values.append(record.get(col))
+        self.rows += 1
+
+
+class ColumnBuffer:
+    """
+    Bir tablonun gerekli sütunları için önceden ayrılmış tipli diziler
+    
+    Sayfalar hangi sırayla gelirse gelsin (sayfa - 1) * per_page konumuna yazılır,
+    sonradan birleştirme veya sıralama gerekmez. Sayfalama sırasında kayıt sayısı
+    değişirse tampon büyütülür, boş kalan satırlar atılır.
+    """
+    
+    def __init__(self, schema, capacity):
+        self.schema = schema
+        self.columns = {col: self._allocate(dtype, capacity) for col, dtype in schema.items()}
+        self.filled = np.zeros(capacity, dtype=bool)
+        # Sütun adı eski API adıyla gelirse (COLUMN_ALIASES) ayrıca tutulur
+        self.extra = {}
+    
+    @staticmethod
+    def _allocate(dtype, capacity):
+        if dtype == "str":
+            return np.full(capacity, None, dtype=object)
+        return np.full(capacity, np.nan, dtype=np.float64)
+    
+    def _ensure_capacity(self, size):
+        capacity = len(self.filled)
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2)
+        for col, dtype in self.schema.items():
+            grown = self._allocate(dtype, new_capacity)
+            grown[:capacity] = self.columns[col]
+            self.columns[col] = grown
+        grown = np.zeros(new_capacity, dtype=bool)
+        grown[:capacity] = self.filled
+        self.filled = grown
+    
+    def write(self, offset, page_columns):
+        end = offset + page_columns.rows
+        self._ensure_capacity(end)
+        for col, values in page_columns.values.items():
+            if col in self.columns:
+                target = self.columns[col]
+                if target.dtype == object:
+                    target[offset:end] = values
+                else:
+                    target[offset:end] = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+            elif any(value is not None for value in values):
+                self.extra.setdefault(col, {})[offset] = values
+        self.filled[offset:end] = True
+    
+    def to_frame(self):
+        df = pd.DataFrame({col: values[self.filled] for col, values in self.columns.items()})
+        for col, chunks in self.extra.items():
+            column = np.full(len(self.filled), None, dtype=object)
+            for offset, values in chunks.items():
+                column[offset:offset + len(values)] = values
+            df[col] = column[self.filled]
+        return df
+
+
+def parse_page_stream(stream, columns):
+    """
+    Laravel sayfa yanıtını ijson ile akış halinde ayrıştırır
+    
+    Kayıtlar dict olarak biriktirilmez; her kaydın yalnızca istenen sütunları
+    (iç içe ilişkiler hariç) PageColumns'a eklenir.
+    """
+    page = PageColumns(columns)
+    wanted = set(columns)
+    item_prefixes = ("data.data.item", "data.item", "item")  # sayfalı, {"data": [...]}, [...]
+    row = None
+    
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if prefix in item_prefixes:
+            if event == "start_map":
+                row = {}
+            elif event == "end_map":
+                page.append(row)
+                row = None
+        elif row is not None:
+            parent, _, col = prefix.rpartition(".")
+            if parent in item_prefixes and col in wanted and event in ("string", "number", "boolean", "null"):
+                row[col] = value
+        elif prefix == "data.last_page" and event == "number":
+            page.last_page = int(value)
+        elif prefix == "data.per_page" and event in ("number", "string"):
+            page.per_page = int(value)
+        elif prefix == "data.total" and event == "number":
+            page.total = int(value)
+    
+    return page
+
+
+def apply_column_aliases(df, schema):
+    """Eski adla gelen sütunları (COLUMN_ALIASES) şemadaki adlarına taşır"""
+    for old_col, new_col in COLUMN_ALIASES.items():
+        if new_col in schema and old_col in df.columns and df[new_col].isna().all():
+            df[new_col] = df[old_col]
+    return df
+
+
+def build_table_frame(key, rows):
+    """
+    API kayıtlarından şemadaki tipli sütunlarla bir DataFrame oluşturur
+    
+    Args:
+        key (str): Veri kümesi adı (TABLE_SCHEMAS anahtarı)
+        rows (list): dict kayıtları listesi
+        
+    Returns:
+        pandas.DataFrame: Yalnızca şema sütunlarını içeren tipli DataFrame
+    """
+    schema = TABLE_SCHEMAS[key]
+    rows = [row for row in rows if isinstance(row, dict)]
+    df = pd.DataFrame.from_records(rows, columns=list(schema) + list(COLUMN_ALIASES)) if rows else pd.DataFrame(columns=list(schema))
+    df = apply_column_aliases(df, schema)
+    return coerce_table_frame(df[list(schema)], schema)
+
+
+def coerce_table_frame(df, schema):
+    """DataFrame sütunlarını şemadaki tiplere dönüştürür (boş değer içeren tam sayılar float kalır)"""
+    df = df.copy()
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            df[col] = None
+        if dtype == "str":
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+        else:
+            values = pd.to_numeric(df[col], errors="coerce")
+            if dtype == "int64" and not values.isna().any():
+                df[col] = values.astype("int64")
+            else:
+                df[col] = values.astype("float64")
+    return df
+
+
+def create_http_session(pool_size):
+    """Bağlantı havuzlu (keep-alive) bir requests oturumu oluşturur"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class UpstreamUnavailable(Exception):
+    """Laravel API'ye ulaşılamadığında (zaman aşımı, bağlantı hatası, 5xx) veya devre açıkken fırlatılır"""
+
+
+class CircuitBreaker:
+    """
+    Art arda max_failures hatadan sonra devreyi reset_timeout saniye açık tutar; bu sürede
+    çağrılar beklemeden reddedilir. Süre dolunca tek bir deneme çağrısına izin verilir
+    (yarı açık); deneme başarılı olursa devre kapanır, başarısız olursa yeniden açılır.
+    """
+    
+    def __init__(self, max_failures, reset_timeout):
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        """closed, open veya half_open"""
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return "open"
+            return "half_open"
+    
+    def allow(self):
+        """Çağrı yapılabiliyorsa True döndürür"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_progress = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_progress = False
+            if self.opened_at is not None or self.failures >= self.max_failures:
+                if self.opened_at is None:
+                    logger.warning(f"Laravel API devre kesici açıldı: {self.failures} ardışık hata")
+                self.opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """
+    İstek yolunda Laravel API'ye yapılan çağrılar için istemci: paylaşılan bağlantı havuzu,
+    kısa zaman aşımları, devre kesici ve birden çok kaynağı eşzamanlı çeken get_many.
+    Yavaş veya erişilemeyen bir API, tahmin yapan worker'ları en fazla zaman aşımı kadar bekletir.
+    """
+    
+    def __init__(self, base_url, timeout=UPSTREAM_TIMEOUT, pool_size=UPSTREAM_POOL_SIZE, breaker=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker(UPSTREAM_BREAKER_FAILURES, UPSTREAM_BREAKER_RESET)
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _ensure_started(self):
+        """Oturumu ve eşzamanlı çekme havuzunu ilk kullanımda oluşturur (fork sonrası worker'da)"""
+        with self._lock:
+            if self._session is None:
+                self._session = create_http_session(self.pool_size)
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="laravel")
+    
+    def get_json(self, path):
+        """
+        GET isteği yapar ve yanıtın 'data' alanını (yoksa tüm gövdeyi) döndürür.
+        200 dışındaki 4xx yanıtlarında None döner.
+        
+        Raises:
+            UpstreamUnavailable: Devre açıksa, zaman aşımı/bağlantı hatasında veya 5xx yanıtında
+        """
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"Devre açık, istek atlandı: {path}")
+        self._ensure_started()
+        
+        try:
+            response = self._session.get(f"{self.base_url}{path}", timeout=self.timeout)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise UpstreamUnavailable(f"{path}: {e}") from e
+        
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise UpstreamUnavailable(f"{path}: HTTP {response.status_code}")
+        self.breaker.record_success()
+        
+        if response.status_code != 200:
+            logger.warning(f"Laravel API yanıtı {response.status_code}: {path} - {response.text[:100]}")
+            return None
+        
+        payload = response.json()
+        return payload.get('data', {}) if isinstance(payload, dict) else payload
+    
+    def get_many(self, paths):
+        """
+        Birden çok yolu eşzamanlı çeker
+        
+        Returns:
+            dict: Yol -> get_json sonucu veya yakalanan istisna
+        """
+        paths = list(dict.fromkeys(paths))
+        if not paths:
+            return {}
+        self._ensure_started()
+        
+        futures = {self._executor.submit(self.get_json, path): path for path in paths}
+        results = {}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = e
+        return results
+
+
+# İstek yolundaki Laravel API çağrıları için paylaşılan istemci
+laravel_client = UpstreamClient(API_BASE_URL)
+
+
+class TTLCache:
+    """
+    Süreç içi, iş parçacığı güvenli LRU + TTL önbellek. Kayıt sayısı max_size'ı aşınca en uzun
+    süredir kullanılmayan kayıt atılır; ttl saniyesi dolan kayıt ilk erişimde silinir.
+    Değerler pickle ile saklanır ve her okumada yeni bir kopya döner (RedisCache gibi);
+    çağıranın dönen sonucu değiştirmesi önbellekteki kaydı bozmaz.
+    İsabet/ıska ve tahliye sayaçları stats() ile okunur.
+    """
+    backend = "memory"
+    shared = False  # yalnızca bu süreçte görünür
+    
+    def __init__(self, name, max_size, ttl):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # anahtar -> (son geçerlilik zamanı, pickle ile serileştirilmiş değer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def _get(self, key, default, now):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def _set(self, key, value, expires_at):
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def get(self, key, default=None):
+        missing = object()
+        with self._lock:
+            value = self._get(key, missing, time.monotonic())
+        return default if value is missing else pickle.loads(value)
+    
+    def get_many(self, keys):
+        """Önbellekte bulunan anahtarları {anahtar: değer} olarak döndürür"""
+        missing = object()
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._get(key, missing, now)
+                if value is not missing:
+                    found[key] = value
+        return {key: pickle.loads(value) for key, value in found.items()}
+    
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+    
+    def set_many(self, items, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        items = {key: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) for key, value in items.items()}
+        with self._lock:
+            for key, value in items.items():
+                self._set(key, value, expires_at)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def stats(self):
+        """Önbellek boyutu ve isabet/ıska/tahliye sayaçları"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "backend": self.backend,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class RedisCache:
+    """
+    Worker süreçleri arasında paylaşılan Redis önbelleği (TTLCache ile aynı arayüz). Değerler
+    JSON olarak saklanır; süre dolumu Redis'e, boyut sınırı Redis'in maxmemory ilkesine
+    bırakılır. Redis hataları ıska sayılır, tahmin akışını kesmez.
+    """
+    backend = "redis"
+    shared = True  # tüm worker'lar aynı anahtarları görür
+    
+    def __init__(self, name, client, ttl):
+        self.name = name
+        self.client = client
+        self.ttl = ttl
+        self.prefix = f"ilac_oneri:{name}:"
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+    
+    def _count(self, hits=0, misses=0, errors=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.errors += errors
+    
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+    
+    def get_many(self, keys):
+        """Önbellekte bulunan anahtarları {anahtar: değer} olarak döndürür"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = self.client.mget([f"{self.prefix}{key}" for key in keys])
+        except redis.RedisError as e:
+            logger.warning(f"Redis önbelleği okunamadı ({self.name}): {e}")
+            self._count(misses=len(keys), errors=1)
+            return {}
+        found = {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+        self._count(hits=len(found), misses=len(keys) - len(found))
+        return found
+    
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+    
+    def set_many(self, items, ttl=None):
+        expire_seconds = max(1, int(self.ttl if ttl is None else ttl))
+        try:
+            pipe = self.client.pipeline()
+            for key, value in items.items():
+                pipe.set(f"{self.prefix}{key}", json.dumps(value, default=json_default), ex=expire_seconds)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Redis önbelleğine yazılamadı ({self.name}): {e}")
+            self._count(errors=1)
+    
+    def delete(self, key):
+        try:
+            self.client.delete(f"{self.prefix}{key}")
+        except redis.RedisError as e:
+            logger.warning(f"Redis önbelleğinden silinemedi ({self.name}): {e}")
+            self._count(errors=1)
+    
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Redis önbelleği temizlenemedi ({self.name}): {e}")
+            self._count(errors=1)
+    
+    def stats(self):
+        """İsabet/ıska ve hata sayaçları (boyut Redis tarafında tutulur)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "backend": self.backend,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "errors": self.errors
+            }
+
+
+# Oluşturulan önbellekler (ad -> önbellek), /cache/stats için
+caches = {}
+
+def create_cache(name, max_size, ttl):
+    """
+    CACHE_BACKEND ayarına göre önbellek oluşturur ve kaydeder. Redis istenmiş ama paket yüklü
+    değilse veya sunucuya ulaşılamıyorsa süreç içi önbellek kullanılır.
+    """
+    cache = None
+    if CACHE_BACKEND == "redis":
+        if redis is None:
+            logger.warning("CACHE_BACKEND=redis ama redis paketi yüklü değil, süreç içi önbellek kullanılıyor")
+        else:
+            try:
+                client = redis.Redis.from_url(
+                    CACHE_REDIS_URL,
+                    socket_connect_timeout=UPSTREAM_TIMEOUT[0],
+                    socket_timeout=UPSTREAM_TIMEOUT[1]
+                )
+                client.ping()
+                cache = RedisCache(name, client, ttl)
+            except redis.RedisError as e:
+                logger.warning(f"Redis'e bağlanılamadı ({e}), süreç içi önbellek kullanılıyor")
+    
+    if cache is None:
+        cache = TTLCache(name, max_size, ttl)
+    caches[name] = cache
+    return cache
+
+
+def canonical_id_set(values):
+    """ID listesini sıralı ve tekrarsız listeye çevirir (tekil değer ve None da kabul edilir)"""
+    if values is None:
+        return []
+    if not isinstance(values, (list, tuple, set, frozenset)):
+        values = [values]
+    return sorted(set(values), key=repr)
+
+
+def normalize_id_list(values):
+    """
+    İstekten gelen tekil ID veya ID listesini canonical_id_set ile tekrarsız listeye çevirir;
+    liste içinde liste/sözlük gibi geçersiz değerlerde ValueError
+    """
+    if isinstance(values, dict):
+        raise ValueError("ID listesi sözlük olamaz")
+    try:
+        return canonical_id_set(values)
+    except TypeError:
+        raise ValueError("ID listesi tekil ID veya ID listesi olmalı")
+
+
+def prediction_cache_key(*parts):
+    """Normalize edilmiş tahmin girdilerinden kanonik önbellek anahtarı (SHA-1 özeti) üretir"""
+    payload = json.dumps(parts, sort_keys=True, default=lambda value: value.item() if isinstance(value, np.generic) else str(value))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# Tahmin sonucu önbellekleri (IlacOneriModel.predict_ilac ve HybridDrugRecommender.predict)
+ilac_tahmin_cache = create_cache("ilac_tahmin", PREDICTION_CACHE_MAX_SIZE, PREDICTION_CACHE_TTL)
+hibrit_tahmin_cache = create_cache("hibrit_tahmin", PREDICTION_CACHE_MAX_SIZE, PREDICTION_CACHE_TTL)
+
+
+def as_id_array(values):
+    """Tam sayı değerli ID dizilerini int64'e çevirir (boş değerler önceden atılmış olmalı)"""
+    values = np.asarray(values)
+    if values.dtype.kind == "f" and len(values) and np.all(np.mod(values, 1) == 0):
+        return values.astype(np.int64)
+    if values.dtype.kind == "O":
+        numeric = pd.to_numeric(values, errors="coerce")
+        if not np.isnan(numeric).any():
+            return as_id_array(numeric)
+    return values
+
+
+def max_by_key(keys, values):
+    """
+    Aynı anahtara ait değerlerin en büyüğünü alır
+    
+    Returns:
+        tuple: (sıralı benzersiz anahtarlar, anahtar başına en büyük değerler)
+    """
+    uniques, inverse = np.unique(np.asarray(keys), return_inverse=True)
+    maxima = np.full(len(uniques), -np.inf)
+    np.maximum.at(maxima, inverse.ravel(), np.asarray(values, dtype=np.float64))
+    return uniques, maxima
+
+
+def top_k_indices(scores, k):
+    """
+    Skoru en yüksek k elemanın indekslerini azalan sırada döndürür. Tam sıralama yerine
+    argpartition kullanılır; eşit skorlarda küçük indeks önce gelir (kararlı sıralamayla aynı sonuç).
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]  # k'ıncı en yüksek skor
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def patient_profile_frame(hastalar, medians=None):
+    """
+    Hasta satırlarını hasta özellikleri modelinin profil özelliklerine çevirir; eğitim ve tahmin
+    aynı dönüşümü kullanır. VKİ eksikse boy (cm) ve kilodan hesaplanır, eksik yaş ve VKİ
+    medyanla doldurulur, yaş tam sayıya ve VKİ bir ondalığa yuvarlanır.
+    
+    Args:
+        hastalar: cinsiyet, yas, vki (varsa boy, kilo) sütunlu DataFrame
+        medians: {'yas': ..., 'vki': ...}; None ise bu veriden hesaplanır (eğitim)
+        
+    Returns:
+        (profil, medians): PATIENT_MODEL_FEATURES sütunlu DataFrame ve kullanılan medyanlar
+    """
+    def numeric(col):
+        if col not in hastalar.columns:
+            return pd.Series(np.nan, index=hastalar.index, dtype=np.float64)
+        values = pd.to_numeric(hastalar[col], errors='coerce').astype(np.float64)
+        return values.where(np.isfinite(values))
+    
+    boy_metre = numeric('boy') / 100
+    values = {
+        'yas': numeric('yas'),
+        'vki': numeric('vki').fillna(numeric('kilo') / boy_metre.where(boy_metre > 0) ** 2)
+    }
+    if medians is None:
+        medians = {col: float(value.median()) if value.notna().any() else 0.0 for col, value in values.items()}
+    
+    profil = pd.DataFrame(index=hastalar.index)
+    cinsiyet = hastalar['cinsiyet'] if 'cinsiyet' in hastalar.columns else pd.Series(None, index=hastalar.index, dtype=object)
+    profil['cinsiyet'] = cinsiyet.fillna('').astype(str).replace('', 'bilinmiyor')
+    for col, decimals in (('yas', 0), ('vki', 1)):
+        profil[col] = values[col].fillna(medians.get(col, 0.0)).round(decimals)
+    return profil[PATIENT_MODEL_FEATURES], medians
+
+
+def hash_id_features(X, n_features=ID_HASH_FEATURES):
+    """
+    ID sütunlarını 'sütun=değer' belirteçlerine çevirip seyrek (CSR) karma matrisine dönüştürür.
+    12 ve 12.0 aynı belirteci üretir; sayı olmayan değerler tek bir bilinmeyen belirtece düşer.
+    """
+    from sklearn.feature_extraction import FeatureHasher
+    
+    X = pd.DataFrame(X)
+    tokens = []
+    for column in X.columns:
+        values = pd.to_numeric(X[column], errors="coerce")
+        values = values.where(values % 1 == 0)
+        tokens.append(f"{column}=" + values.astype("Int64").astype(str))
+    hasher = FeatureHasher(n_features=n_features, input_type="string", alternate_sign=False)
+    return hasher.transform(np.column_stack(tokens) if tokens else np.empty((len(X), 0), dtype=object))
+
+
+def hashed_feature_names(transformer, input_features):
+    """hash_id_features çıktısı için özellik isimleri (FunctionTransformer.get_feature_names_out)"""
+    n_features = (transformer.kw_args or {}).get("n_features", ID_HASH_FEATURES)
+    return np.array([f"id_hash_{i}" for i in range(n_features)], dtype=object)
+
+
+def build_id_feature_transformer(id_frame):
+    """
+    ID sütunları için seyrek dönüştürücü seçer: az sayıda benzersiz değerde one-hot,
+    ID_HASHING_THRESHOLD aşıldığında sabit genişlikte karma.
+    """
+    from sklearn.preprocessing import OneHotEncoder, FunctionTransformer
+    
+    cardinality = max((id_frame[column].nunique() for column in id_frame.columns), default=0)
+    if cardinality > ID_HASHING_THRESHOLD:
+        logger.info(f"ID özellikleri karma ile kodlanıyor: {cardinality} benzersiz değer, {ID_HASH_FEATURES} sütun")
+        return FunctionTransformer(
+            hash_id_features,
+            kw_args={"n_features": ID_HASH_FEATURES},
+            feature_names_out=hashed_feature_names,
+            accept_sparse=True
+        )
+    return OneHotEncoder(handle_unknown='ignore', sparse_output=True)
+
+
+def load_npy(path, mmap_mode="r"):
+    """.npy dosyasını bellek eşlemeli açar; Python nesnesi içeren diziler normal yüklenir"""
+    try:
+        return np.load(path, mmap_mode=mmap_mode)
+    except ValueError:
+        return np.load(path, allow_pickle=True)
+
+
+def resolve_recommender_path():
+    """Yüklenecek hibrit model yolunu döndürür: sürümlü kayıt klasörü, yoksa eski joblib dosyası"""
+    if os.path.exists(os.path.join(RECOMMENDER_MODEL_PATH, "CURRENT")):
+        return RECOMMENDER_MODEL_PATH
+    if os.path.exists(RECOMMENDER_LEGACY_MODEL_PATH):
+        return RECOMMENDER_LEGACY_MODEL_PATH
+    return None
+
+
+class CSRIndex(Mapping):
+    """
+    Anahtar -> değerler ilişkisini CSR dizileriyle tutan salt okunur indeks
+    (ör. ilaç -> etken maddeler, hastalık -> ilaçlar).
+    
+    keys[i] anahtarının değerleri indices[indptr[i]:indptr[i + 1]] aralığındadır;
+    data verilmişse aynı aralık değerlerin skorlarını tutar. Mapping arayüzü sayesinde
+    dict bekleyen kodlar (get, in, items, len) değişmeden çalışır: data yoksa değer
+    bir liste, varsa {değer: skor} sözlüğüdür.
+    """
+    
+    def __init__(self, keys, indptr, indices, data=None):
+        self.keys_array = np.asarray(keys)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices)
+        self.data = None if data is None else np.asarray(data, dtype=np.float64)
+        self._positions = {key: i for i, key in enumerate(self.keys_array.tolist())}
+    
+    @classmethod
+    def from_pairs(cls, keys, values, data=None):
+        """
+        (anahtar, değer[, skor]) çiftlerinden indeks oluşturur. Anahtarlar sıralanır,
+        her anahtarın değerleri girdideki sırasını korur; boş anahtar/değerler atlanır.
+        """
+        frame = pd.DataFrame({"key": np.asarray(keys), "value": np.asarray(values)})
+        if data is not None:
+            frame["data"] = np.asarray(data, dtype=np.float64)
+        frame = frame.dropna(subset=["key", "value"])
+        
+        codes, uniques = pd.factorize(frame["key"], sort=True)
+        order = np.argsort(codes, kind="stable")
+        indptr = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(uniques)), out=indptr[1:])
+        
+        return cls(
+            as_id_array(np.asarray(uniques)),
+            indptr,
+            as_id_array(frame["value"].to_numpy()[order]),
+            None if data is None else frame["data"].to_numpy()[order]
+        )
+    
+    def save_arrays(self, directory, name):
+        """Dizileri directory/name.<dizi>.npy dosyalarına yazar"""
+        arrays = {"keys": self.keys_array, "indptr": self.indptr, "indices": self.indices}
+        if self.data is not None:
+            arrays["data"] = self.data
+        for part, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.{part}.npy"), np.asarray(array))
+    
+    @classmethod
+    def load_arrays(cls, directory, name, mmap_mode="r"):
+        """save_arrays ile yazılmış indeksi açar; diziler kopyalanmadan bellek eşlemeli kullanılır"""
+        def part(suffix):
+            return load_npy(os.path.join(directory, f"{name}.{suffix}.npy"), mmap_mode)
+        
+        data = part("data") if os.path.exists(os.path.join(directory, f"{name}.data.npy")) else None
+        return cls(part("keys"), part("indptr"), part("indices"), data)
+    
+    def inverted(self):
+        """
+        Ters indeks döndürür: değer -> o değeri içeren anahtarlar (ör. etken madde -> ilaçlar).
+        Tekrarlanan (anahtar, değer) çiftleri tek kez yer alır.
+        """
+        keys = np.repeat(self.keys_array, np.diff(self.indptr))
+        pairs = pd.DataFrame({"key": keys, "value": self.indices}).drop_duplicates()
+        return CSRIndex.from_pairs(pairs["value"], pairs["key"])
+    
+    def distinct_counts(self):
+        """Her anahtarın farklı değer sayısı (keys_array sırasıyla; tekrarlanan değerler bir kez sayılır)"""
+        rows = np.repeat(np.arange(len(self.keys_array)), np.diff(self.indptr))
+        pairs = pd.DataFrame({"row": rows, "value": self.indices}).drop_duplicates()
+        return np.bincount(pairs["row"].to_numpy(), minlength=len(self.keys_array))
+    
+    def row(self, key):
+        """Anahtarın değer (ve skor) dilimlerini NumPy görünümü olarak döndürür"""
+        pos = self._positions.get(key)
+        if pos is None:
+            empty = self.indices[:0]
+            return empty, (None if self.data is None else self.data[:0])
+        start, end = self.indptr[pos], self.indptr[pos + 1]
+        return self.indices[start:end], (None if self.data is None else self.data[start:end])
+    
+    def __getitem__(self, key):
+        if key not in self._positions:
+            raise KeyError(key)
+        indices, data = self.row(key)
+        if data is None:
+            return indices.tolist()
+        return dict(zip(indices.tolist(), data.tolist()))
+    
+    def __contains__(self, key):
+        return key in self._positions
+    
+    def __iter__(self):
+        return iter(self._positions)
+    
+    def __len__(self):
+        return len(self._positions)
+
+
 class IlacOneriModel:
     def __init__(self):
         self.model = None
@@ -60,128 +1037,446 @@ class IlacOneriModel:
         self.error_report = []
         self.warnings = []
         
-        # Modeli yükle (eğer varsa)
-        if os.path.exists(self.model_path):
-            self.load_model()
-        else:
-            logger.info("Model bulunamadı. Yeni model eğitilecek.")
+        # Kayıtlı model ilk ihtiyaçta yüklenir (ensure_model_loaded)
+        self._load_lock = threading.Lock()
+        self._load_attempted = False
             
         # İlaç etki vektörü eşleştirme tablosu
         self.ilac_etki_vektoru = {}
         
         # Hasta özellikleri geçici önbelleği
-        self.hasta_ozellikleri_cache = {}
-    
-    def fetch_data(self):
-        """API'den veri çekme - geliştirilmiş loglama ile"""
-        logger.info("Veriler API'den çekiliyor...")
-        data = {
-            "hastalar": [],
-            "hastaliklar": [],
-            "hasta_hastaliklar": [],
-            "ilaclar": [],
-            "etken_maddeler": [],
-            "ilac_etken_maddeler": [],
-            "hasta_ilac_kullanim": []
-        }
+        self.hasta_ozellikleri_cache = create_cache("hasta_demografik", HASTA_CACHE_MAX_SIZE, HASTA_CACHE_TTL)
         
-        endpoints = {
-            "hastalar": "/hastalar?per_page=5000",
-            "hastaliklar": "/hastaliklar?per_page=5000",
-            "hasta_hastaliklar": "/hasta-hastaliklar?per_page=5000",
-            "ilaclar": "/ilaclar?per_page=5000",
-            "etken_maddeler": "/etken-maddeler?per_page=5000",
-            "ilac_etken_maddeler": "/ilac-etken-maddeler?per_page=1000",
-            "hasta_ilac_kullanim": "/hasta-ilac-kullanim?per_page=5000"
-        }
+        # Veri çekme için paylaşılan HTTP oturumu (ilk kullanımda oluşturulur)
+        self._http_session = None
+        self.last_fetch_errors = set()
+    
+    def ensure_model_loaded(self):
+        """Model henüz yüklenmemişse kayıtlı dosyadan bir kez yüklemeyi dener; model hazırsa True döner"""
+        if self.model is not None:
+            return True
         
-        total_records = 0
+        with self._load_lock:
+            if self.model is None and not self._load_attempted:
+                self._load_attempted = True
+                if os.path.exists(self.model_path):
+                    self.load_model()
+                else:
+                    logger.info("Model bulunamadı. Yeni model eğitilecek.")
+        
+        return self.model is not None
+    
+    def fetch_tables(self, since=None):
+        """
+        API'den akış halinde veri çekme - sayfalar dict listesine dönüştürülmeden
+        yalnızca TABLE_SCHEMAS sütunları tipli sütun tamponlarına yazılır
+        
+        Bellek kullanımı ham JSON boyutuyla değil, gerekli sütun sayısıyla büyür.
+        
+        Args:
+            since (dict, optional): Veri kümesi -> ek sorgu parametreleri
+                (örn. {"updated_since": ..., "after_id": ...}). Verilirse yalnızca değişen
+                kayıtlar istenir ve silinenleri ayırt etmek için deleted_at sütunu da tutulur
+        
+        Returns:
+            dict: Veri kümesi -> tipli DataFrame
+        """
+        logger.info("Veriler API'den akış halinde çekiliyor...")
+        since = since or {}
+        buffers = {}
         
         try:
-            # Her endpoint için veri çek
-            for key, endpoint in endpoints.items():
-                try:
-                    #logger.info(f"'{key}' verileri çekiliyor: {API_BASE_URL}{endpoint}")
-                    page = 1
-                    while True:  # Sayfa bazında veri çekmeye devam et
-                        #logger.info(f"Sayfa {page} çekiliyor...")
-                        response = requests.get(f"{API_BASE_URL}{endpoint}")
-                        
-                        # HTTP yanıt kodu kontrol et
-                        if response.status_code != 200:
-                            logger.error(f"API Hatası: {endpoint} - Durum Kodu: {response.status_code}")
-                            logger.error(f"Yanıt İçeriği: {response.text[:200]}...")
-                            break
-                        
-                        # Yanıt içeriğini parçala
-                        try:
-                            response_json = response.json()
-                            #logger.info(f"'{key}' API yanıtı: {type(response_json)} tipinde")
-                            
-                            # Yanıt yapısını kontrol et 
-                            if isinstance(response_json, dict):
-                                if 'data' in response_json:
-                                    # Laravel API tipik yapısı: {"data": [...]}
-                                    if isinstance(response_json['data'], dict) and 'data' in response_json['data']:
-                                        # Paginate yapısı: {"data": {"data": [...], "current_page": 1, ...}}
-                                        response_data = response_json['data']['data']
-                                        total_pages = response_json['data'].get('last_page', 1)
-                                        #logger.info(f"Sayfalanmış veri yapısı tespit edildi. Toplam sayfa: {total_pages}")
-                                    else:
-                                        response_data = response_json['data']
-                                        total_pages = 1
-                                else:
-                                    response_data = []
-                                    logger.warning(f"'{key}' için 'data' alanı bulunamadı")
-                                    total_pages = 1
-                            else:
-                                response_data = response_json
-                                total_pages = 1
-                            
-                            # Liste olduğundan emin ol
-                            if not isinstance(response_data, list):
-                                logger.error(f"'{key}' için veri listesi değil: {type(response_data)}")
-                                response_data = []
-                                total_pages = 1
-                            
-                            # Veriyi kaydet
-                            data[key].extend(response_data)  # Yeni verileri mevcut veriye ekle
-                            
-                            # Veri içeriğini logla
-                            num_records = len(response_data)
-                            total_records += num_records
-                            #logger.info(f"'{key}' için {num_records} kayıt alındı. Toplam {total_records} kayıt.")
-                            
-                            # Sayfanın sonuna gelindi mi kontrol et
-                            if page >= total_pages:
-                                break
-                            else:
-                                page += 1  # Sonraki sayfaya geç
-
-                        except ValueError as json_err:
-                            logger.error(f"JSON parse hatası ({key}): {json_err}")
-                            logger.error(f"Ham yanıt: {response.text[:200]}...")
-                
-                except Exception as e:
-                    logger.error(f"'{key}' verileri çekilirken hata: {e}")
-                    import traceback
-                    logger.error(traceback.format_exc())
+            for key, page, page_columns in self._iter_pages(self._fetch_page_columns, since):
+                if page == 1:
+                    # Toplam kayıt sayısı ilk sayfada öğrenilir, tamponlar bir kez ayrılır
+                    capacity = max(page_columns.total or 0, page_columns.rows)
+                    buffers[key] = ColumnBuffer(self._stream_schema(key, key in since), capacity)
+                offset = (page - 1) * (page_columns.per_page or page_columns.rows)
+                buffers[key].write(offset, page_columns)
             
-            logger.info(f"Veri çekme tamamlandı. Toplam {total_records} kayıt alındı.")
+            tables = {}
+            for key in API_ENDPOINTS:
+                schema = self._stream_schema(key, key in since)
+                if key in buffers:
+                    df = apply_column_aliases(buffers[key].to_frame(), schema)
+                else:
+                    df = pd.DataFrame(columns=list(schema))
+                tables[key] = coerce_table_frame(df[list(schema)], schema)
+                logger.info(f"'{key}': {len(tables[key])} kayıt")
             
-            # Her veri kümesinin yapısını özet olarak raporla
-            for key, value in data.items():
-                record_count = len(value)
-                sample = str(value[0])[:100] + "..." if record_count > 0 else "Veri yok"
-                #logger.info(f"'{key}': {record_count} kayıt, örnek: {sample}")
+            if self.last_fetch_errors:
+                logger.warning(f"Eksik çekilen veri kümeleri: {sorted(self.last_fetch_errors)}")
             
-            return data
+            logger.info(f"Veri çekme tamamlandı. Toplam {sum(len(df) for df in tables.values())} kayıt alındı.")
+            return tables
         
         except Exception as e:
             logger.error(f"Veri çekme işlemi sırasında genel hata: {e}")
             import traceback
             logger.error(traceback.format_exc())
             raise
+    
+    def _stream_schema(self, key, incremental):
+        """Akış halinde çekilecek sütunlar: şema + (artımlı çekimde) deleted_at"""
+        schema = dict(TABLE_SCHEMAS[key])
+        if incremental:
+            schema["deleted_at"] = "str"
+        return schema
+    
+    def _iter_pages(self, fetch_page, since):
+        """
+        Her uç noktanın ilk sayfasını, ardından kalan sayfalarını eşzamanlı çeker
+        
+        Bir uç noktanın 1. sayfası her zaman diğer sayfalarından önce üretilir.
+        
+        Args:
+            fetch_page (callable): (session, key, page, extra_params) -> (sonuç, toplam sayfa)
+            since (dict): Veri kümesi -> ek sorgu parametreleri
+            
+        Yields:
+            tuple: (veri kümesi, sayfa numarası, sonuç)
+        """
+        session = self._get_http_session()
+        self.last_fetch_errors = set()
+        
+        with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+            # İlk sayfalar: toplam sayfa sayısını öğrenmek için tüm uç noktalar aynı anda
+            first_pages = {
+                executor.submit(fetch_page, session, key, 1, since.get(key)): key
+                for key in API_ENDPOINTS
+            }
+            
+            # Kalan sayfalar, ilk sayfası gelen uç nokta için hemen kuyruğa alınır
+            remaining_pages = {}
+            for future in as_completed(first_pages):
+                key = first_pages[future]
+                result, total_pages = future.result()
+                if result is None:
+                    self.last_fetch_errors.add(key)
+                    continue
+                yield key, 1, result
+                for page in range(2, total_pages + 1):
+                    remaining_pages[executor.submit(fetch_page, session, key, page, since.get(key))] = (key, page)
+            
+            for future in as_completed(remaining_pages):
+                key, page = remaining_pages[future]
+                result, _ = future.result()
+                if result is None:
+                    self.last_fetch_errors.add(key)
+                    continue
+                yield key, page, result
+    
+    def _fetch_page_columns(self, session, key, page, extra_params=None):
+        """
+        Bir sayfayı akış halinde çekip yalnızca gerekli sütunları ayıklar
+        
+        Returns:
+            tuple: (PageColumns, toplam sayfa sayısı) - hata durumunda PageColumns None
+        """
+        endpoint, per_page = API_ENDPOINTS[key]
+        params = {"per_page": per_page, "page": page}
+        if extra_params:
+            params.update(extra_params)
+        columns = list(self._stream_schema(key, bool(extra_params)))
+        columns += [old_col for old_col, new_col in COLUMN_ALIASES.items() if new_col in columns]
+        
+        try:
+            with session.get(f"{API_BASE_URL}{endpoint}", params=params, timeout=FETCH_TIMEOUT, stream=True) as response:
+                if response.status_code != 200:
+                    logger.error(f"API Hatası: {endpoint} (sayfa {page}) - Durum Kodu: {response.status_code}")
+                    logger.error(f"Yanıt İçeriği: {response.text[:200]}...")
+                    return None, 1
+                
+                if ijson is not None:
+                    response.raw.decode_content = True
+                    page_columns = parse_page_stream(response.raw, columns)
+                else:
+                    # ijson yoksa sayfa bir kez ayrıştırılır, kayıtlar hemen sütunlara aktarılır
+                    response_json = response.json()
+                    records, last_page = self._parse_page(key, response_json)
+                    page_columns = PageColumns(columns)
+                    for record in records:
+                        if isinstance(record, dict):
+                            page_columns.append(record)
+                    del records
+                    page_columns.last_page = last_page
+                    if isinstance(response_json, dict) and isinstance(response_json.get("data"), dict):
+                        page_columns.per_page = response_json["data"].get("per_page")
+                        page_columns.total = response_json["data"].get("total")
+                
+                return page_columns, page_columns.last_page
+        
+        except ValueError as json_err:
+            logger.error(f"JSON parse hatası ({key}, sayfa {page}): {json_err}")
+            return None, 1
+        except Exception as e:
+            logger.error(f"'{key}' verileri çekilirken hata (sayfa {page}): {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return None, 1
+    
+    def _get_http_session(self):
+        """Uç noktalar arasında paylaşılan keep-alive oturumu (bağlantı havuzu ile)"""
+        if self._http_session is None:
+            self._http_session = create_http_session(FETCH_MAX_WORKERS)
+        return self._http_session
+    
+    def _parse_page(self, key, response_json):
+        """
+        Laravel yanıtından kayıt listesini ve toplam sayfa sayısını ayıklar
+        (ijson yoksa _fetch_page_columns tarafından kullanılır)
+        
+        Returns:
+            tuple: (kayıt listesi, toplam sayfa sayısı)
+        """
+        total_pages = 1
+        if isinstance(response_json, dict):
+            if 'data' in response_json:
+                # Laravel API tipik yapısı: {"data": [...]}
+                if isinstance(response_json['data'], dict) and 'data' in response_json['data']:
+                    # Paginate yapısı: {"data": {"data": [...], "current_page": 1, "last_page": N, ...}}
+                    response_data = response_json['data']['data']
+                    total_pages = int(response_json['data'].get('last_page') or 1)
+                else:
+                    response_data = response_json['data']
+            else:
+                response_data = []
+                logger.warning(f"'{key}' için 'data' alanı bulunamadı")
+        else:
+            response_data = response_json
+        
+        # Liste olduğundan emin ol
+        if not isinstance(response_data, list):
+            logger.error(f"'{key}' için veri listesi değil: {type(response_data)}")
+            return [], 1
+        
+        return response_data, total_pages
+
+    def sync_data(self, full=False, use_snapshot=False):
+        """
+        Eğitim verisini artımlı olarak senkronize eder
+        
+        Yerel anlık görüntü varsa her tablo için yalnızca son senkronizasyondan beri
+        değişen kayıtlar (updated_at / id su seviyesi) çekilir ve birincil anahtara
+        göre anlık görüntüyle birleştirilir; ardından canlı birincil anahtar listesinde
+        olmayan (kalıcı silinen) satırlar düşülür. Anlık görüntü yoksa, son tam çekimin
+        üzerinden SNAPSHOT_FULL_SYNC_HOURS geçmişse veya full=True ise tüm veriler çekilir.
+        
+        Args:
+            full (bool): Tam senkronizasyon zorla
+            use_snapshot (bool): Geçerli bir anlık görüntü varsa API'ye hiç gitmeden kullan
+            
+        Returns:
+            dict: Veri kümesi -> tipli DataFrame (TABLE_SCHEMAS sütunları)
+        """
+        self.last_fetch_errors = set()
+        snapshot = None if full else self._load_snapshot()
+        
+        if snapshot is not None and use_snapshot:
+            logger.info(f"Yerel anlık görüntü API'ye gidilmeden kullanılıyor (senkronizasyon: {snapshot['synced_at']})")
+            return snapshot["data"]
+        
+        if snapshot is None:
+            logger.info("Tam senkronizasyon yapılıyor...")
+            data = self.fetch_tables()
+        else:
+            watermarks = snapshot["watermarks"]
+            since = {
+                key: self._watermark_params(watermarks[key])
+                for key in API_ENDPOINTS
+                if watermarks.get(key)
+            }
+            logger.info(f"Artımlı senkronizasyon yapılıyor (son senkronizasyon: {snapshot['synced_at']})")
+            delta = self.fetch_tables(since=since)
+            data = self._reconcile_deleted(self._merge_delta(snapshot["data"], delta))
+        
+        # Eksik çekilen tablo varsa anlık görüntüyü ilerletme, bir sonraki çağrı tekrar dener
+        if self.last_fetch_errors:
+            logger.warning("Veri çekme hataları nedeniyle anlık görüntü güncellenmedi")
+            return data
+        
+        watermarks = {key: self._compute_watermark(key, df) for key, df in data.items()}
+        self._save_snapshot(data, watermarks, previous=snapshot)
+        return data
+    
+    def _merge_delta(self, snapshot_data, delta):
+        """Değişen kayıtları birincil anahtara göre anlık görüntü tablolarına uygular"""
+        merged = {}
+        for key in API_ENDPOINTS:
+            df = snapshot_data[key]
+            changed = delta.get(key)
+            if changed is None or changed.empty:
+                merged[key] = df
+                continue
+            
+            pk = TABLE_PRIMARY_KEYS[key]
+            # Soft delete edilmiş kayıtlar yalnızca anlık görüntüden düşülür
+            if "deleted_at" in changed.columns:
+                live_rows = changed[changed["deleted_at"].isna()].drop(columns="deleted_at")
+            else:
+                live_rows = changed
+            
+            kept = df[~df[pk].isin(changed[pk])]
+            merged[key] = coerce_table_frame(
+                pd.concat([kept, live_rows], ignore_index=True),
+                TABLE_SCHEMAS[key]
+            )
+            logger.info(f"'{key}': {len(changed)} değişen kayıt uygulandı "
+                        f"({len(changed) - len(live_rows)} silindi), toplam {len(merged[key])}")
+        return merged
+    
+    def _reconcile_deleted(self, data):
+        """
+        Kalıcı silinen kayıtları anlık görüntüden düşürür. Artımlı çekim yalnızca soft
+        delete edilen kayıtları bildirebildiğinden her tablo için canlı birincil anahtarlar
+        (SYNC_IDS_ENDPOINT) çekilir ve listede olmayan satırlar atılır. Listesi alınamayan
+        tablolar olduğu gibi kalır; bir sonraki senkronizasyon yeniden dener.
+        """
+        session = self._get_http_session()
+        with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+            live_ids = dict(zip(API_ENDPOINTS, executor.map(lambda key: self._fetch_live_ids(session, key), API_ENDPOINTS)))
+        
+        reconciled = {}
+        for key, df in data.items():
+            ids = live_ids.get(key)
+            if ids is not None:
+                live = df[TABLE_PRIMARY_KEYS[key]].isin(ids)
+                if not live.all():
+                    logger.info(f"'{key}': {int((~live).sum())} silinmiş kayıt anlık görüntüden düşüldü")
+                    df = df[live].reset_index(drop=True)
+            reconciled[key] = df
+        return reconciled
+    
+    def _fetch_live_ids(self, session, key):
+        """Bir veri kümesindeki canlı kayıtların birincil anahtarlarını çeker (hata durumunda None)"""
+        endpoint = SYNC_IDS_ENDPOINT.format(key=key)
+        try:
+            response = session.get(f"{API_BASE_URL}{endpoint}", timeout=FETCH_TIMEOUT)
+            if response.status_code != 200:
+                logger.warning(f"Canlı kayıt listesi alınamadı: {endpoint} - Durum Kodu: {response.status_code}")
+                return None
+            ids = response.json().get("data")
+            if not isinstance(ids, list):
+                logger.warning(f"Canlı kayıt listesi beklenen biçimde değil: {endpoint}")
+                return None
+            return as_id_array(np.asarray(ids))
+        except Exception as e:
+            logger.warning(f"'{key}' canlı kayıt listesi çekilirken hata: {e}")
+            return None
+    
+    def _compute_watermark(self, key, df):
+        """Bir tablo için en son updated_at ve en büyük birincil anahtar değerini bulur"""
+        pk = TABLE_PRIMARY_KEYS[key]
+        updated_values = df["updated_at"].dropna()
+        id_values = df[pk].dropna()
+        return {
+            "updated_at": str(updated_values.max()) if len(updated_values) else None,
+            "max_id": int(id_values.max()) if len(id_values) else None
+        }
+    
+    def _watermark_params(self, watermark):
+        """Su seviyesini API sorgu parametrelerine dönüştürür"""
+        params = {"updated_since": watermark.get("updated_at") or "1970-01-01T00:00:00Z"}
+        if watermark.get("max_id") is not None:
+            params["after_id"] = watermark["max_id"]
+        return params
+    
+    def _snapshot_file(self, key):
+        extension = "parquet" if SNAPSHOT_FORMAT == "parquet" else "pkl"
+        return os.path.join(SNAPSHOT_DIR, f"{key}.{extension}")
+    
+    def _table_hash(self, df):
+        """Tablo içeriğinin özet değeri (sütun adları ve satır değerleri)"""
+        digest = hashlib.sha256(",".join(df.columns).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return digest.hexdigest()
+    
+    def _load_snapshot(self):
+        """
+        Yerel anlık görüntüyü yükler
+        
+        Manifest yoksa, süresi dolmuşsa, biçim değişmişse veya bir tablonun içerik
+        özeti manifestle uyuşmuyorsa None döndürür (tam senkronizasyon gerekir).
+        """
+        manifest_path = os.path.join(SNAPSHOT_DIR, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            
+            full_synced_at = manifest.get("full_synced_at", manifest["synced_at"])
+            age_hours = (datetime.datetime.now() - datetime.datetime.fromisoformat(full_synced_at)).total_seconds() / 3600
+            if SNAPSHOT_FULL_SYNC_HOURS > 0 and age_hours > SNAPSHOT_FULL_SYNC_HOURS:
+                logger.info(f"Son tam senkronizasyonun üzerinden {age_hours:.1f} saat geçti, tam uzlaştırma yapılacak")
+                return None
+            
+            if manifest.get("format") != SNAPSHOT_FORMAT:
+                logger.info("Anlık görüntü biçimi değişmiş, tam senkronizasyon yapılacak")
+                return None
+            
+            data = {}
+            for key in API_ENDPOINTS:
+                table = manifest["tables"][key]
+                path = self._snapshot_file(key)
+                df = pd.read_parquet(path) if SNAPSHOT_FORMAT == "parquet" else pd.read_pickle(path)
+                if self._table_hash(df) != table["hash"]:
+                    logger.warning(f"'{key}' anlık görüntüsü bozuk (içerik özeti uyuşmuyor), tam senkronizasyon yapılacak")
+                    return None
+                data[key] = df
+            
+            logger.info(f"Yerel anlık görüntü yüklendi: {SNAPSHOT_DIR} ({sum(len(df) for df in data.values())} kayıt)")
+            return {
+                "data": data,
+                "watermarks": {key: manifest["tables"][key]["watermark"] for key in API_ENDPOINTS},
+                "synced_at": manifest["synced_at"],
+                "full_synced_at": full_synced_at,
+                "hashes": {key: manifest["tables"][key]["hash"] for key in API_ENDPOINTS}
+            }
+        except Exception as e:
+            logger.error(f"Anlık görüntü yüklenemedi, tam senkronizasyon yapılacak: {e}")
+            return None
+    
+    def _save_snapshot(self, data, watermarks, previous=None):
+        """
+        Her tabloyu ayrı bir sütunlu dosyaya, su seviyelerini ve içerik özetlerini
+        manifest'e yazar. İçeriği değişmeyen tablolar yeniden yazılmaz; manifest en
+        son ve atomik olarak yazıldığı için yarım kalan kayıt eski anlık görüntüyü bozmaz.
+        """
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        previous_hashes = previous["hashes"] if previous else {}
+        tables = {}
+        
+        try:
+            for key, df in data.items():
+                table_hash = self._table_hash(df)
+                path = self._snapshot_file(key)
+                if previous_hashes.get(key) != table_hash or not os.path.exists(path):
+                    tmp_path = path + ".tmp"
+                    if SNAPSHOT_FORMAT == "parquet":
+                        df.to_parquet(tmp_path, index=False)
+                    else:
+                        df.to_pickle(tmp_path)
+                    os.replace(tmp_path, path)
+                tables[key] = {"hash": table_hash, "rows": len(df), "watermark": watermarks[key]}
+            
+            # Artımlı kayıtta son tam çekimin zamanı korunur
+            synced_at = datetime.datetime.now().isoformat()
+            full_synced_at = previous["full_synced_at"] if previous else synced_at
+            
+            manifest_path = os.path.join(SNAPSHOT_DIR, "manifest.json")
+            with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({
+                    "synced_at": synced_at,
+                    "full_synced_at": full_synced_at,
+                    "format": SNAPSHOT_FORMAT,
+                    "tables": tables
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(manifest_path + ".tmp", manifest_path)
+            logger.info(f"Anlık görüntü kaydedildi: {SNAPSHOT_DIR} ({SNAPSHOT_FORMAT})")
+        except Exception as e:
+            logger.error(f"Anlık görüntü kaydedilemedi: {e}")
 
     def prepare_data(self, data):
             """Veri hazırlama ve temizleme"""
@@ -221,20 +1516,14 @@ class IlacOneriModel:
                 self.etken_madde_lookup = {}
             
             # İlaç-etken madde ilişkisi lookup tablosu oluştur
-            # Bu tablo, her ilacın etken maddelerini tutacak
+            # Bu tablo, her ilacın etken maddelerini tutacak (CSR dizileri, dict gibi okunur)
             self.ilac_etken_lookup = {}
             
             if 'ilac_id' in ilac_etken_df.columns and 'etken_madde_id' in ilac_etken_df.columns:
-                # Her ilacın etken maddelerini bir listeye ekle
-                for _, row in ilac_etken_df.iterrows():
-                    ilac_id = row['ilac_id']
-                    etken_id = row['etken_madde_id']
-                    
-                    if ilac_id not in self.ilac_etken_lookup:
-                        self.ilac_etken_lookup[ilac_id] = []
-                    
-                    # Etken madde ID'sini ekle
-                    self.ilac_etken_lookup[ilac_id].append(etken_id)
+                self.ilac_etken_lookup = CSRIndex.from_pairs(ilac_etken_df['ilac_id'], ilac_etken_df['etken_madde_id'])
+            
+            # Ters indeks: etken madde -> ilaçlar (tahminde yalnızca ortak etken maddeli ilaçlar dolaşılır)
+            self._build_etken_indexes()
             
             logger.info(f"Lookup tabloları oluşturuldu: {len(self.ilac_lookup)} ilaç, {len(self.etken_madde_lookup)} etken madde, {len(self.ilac_etken_lookup)} ilaç-etken madde ilişkisi")
             
@@ -414,6 +1703,19 @@ class IlacOneriModel:
                 target = pd.Series(dtype='float')
                 return features, target
         
+    def _build_etken_indexes(self):
+        """
+        İlaç -> etken madde eşleştirmesinden etken madde -> ilaç ters indeksini ve ilaç başına
+        farklı etken madde sayısını (ilac_etken_lookup.keys_array sırasıyla) oluşturur
+        """
+        # Eski model dosyalarından gelen dict eşleştirmeyi CSR indeksine çevir
+        if not isinstance(self.ilac_etken_lookup, CSRIndex):
+            pairs = [(ilac_id, etken_id) for ilac_id, etken_ids in self.ilac_etken_lookup.items() for etken_id in etken_ids]
+            self.ilac_etken_lookup = CSRIndex.from_pairs([p[0] for p in pairs], [p[1] for p in pairs])
+        
+        self.etken_ilac_index = self.ilac_etken_lookup.inverted()
+        self.ilac_etken_cardinality = self.ilac_etken_lookup.distinct_counts()
+
     def safe_dataframe_creation(self, data_list, required_columns=[]):
         """
         Güvenli DataFrame oluşturma - boş veya eksik veriler için önlemler alır
@@ -428,83 +1730,50 @@ class IlacOneriModel:
         # Fonksiyon girişini logla
         #logger.info(f"DataFrame oluşturuluyor: {len(data_list) if isinstance(data_list, list) else 'Liste değil'} öğe, gerekli sütunlar: {required_columns}")
         
+        # Anlık görüntüden gelen tipli tablolar doğrudan kullanılır
+        if isinstance(data_list, pd.DataFrame):
+            df = data_list.copy()
+            for col in required_columns:
+                if col not in df.columns:
+                    logger.warning(f"Gerekli sütun '{col}' veride yok, None değerleriyle ekleniyor")
+                    df[col] = None
+            return df[required_columns]
+        
         # Veri listesi yoksa veya boşsa, boş DataFrame döndür
         if not data_list or not isinstance(data_list, list) or len(data_list) == 0:
             logger.warning(f"Boş veya geçersiz veri listesi. Boş DataFrame döndürülüyor.")
             return pd.DataFrame(columns=required_columns)
         
         # Geçerli dict öğelerini filtreleme
-        valid_items = []
-        invalid_count = 0
-        
-        for i, item in enumerate(data_list):
-            if isinstance(item, dict):
-                valid_items.append(item)
-            else:
-                invalid_count += 1
-                if invalid_count <= 3:  # Sadece ilk 3 geçersiz öğeyi logla
-                    logger.warning(f"Geçersiz öğe #{i}: {type(item)} - {str(item)[:50]}")
+        valid_items = [item for item in data_list if isinstance(item, dict)]
+        invalid_count = len(data_list) - len(valid_items)
         
         if invalid_count > 0:
-            logger.warning(f"Toplam {invalid_count} geçersiz öğe atlandı")
-        
-        if len(valid_items) == 0:
-            logger.error("Geçerli öğe kalmadı. Boş DataFrame döndürülüyor.")
-            return pd.DataFrame(columns=required_columns)
-        
-        # Tüm öğelerin aynı yapıda olduğundan emin ol
-        # İlk öğeyi referans olarak al
-        keys_from_first_item = set(valid_items[0].keys())
-        
-        # Tüm öğelerde ortak olan anahtarları bul
-        common_keys = keys_from_first_item.copy()
-        for item in valid_items[1:]:
-            item_keys = set(item.keys())
-            common_keys = common_keys.intersection(item_keys)
-        
-        # Eksik anahtarları tespit et
-        all_keys = set()
-        for item in valid_items:
-            all_keys.update(item.keys())
-        
-        missing_keys_count = {key: 0 for key in all_keys}
-        for item in valid_items:
-            for key in all_keys:
-                if key not in item:
-                    missing_keys_count[key] += 1
-        
-        # Eksik anahtarları logla
-        for key, count in missing_keys_count.items():
-            if count > 0:
-                logger.info(f"'{key}' anahtarı {count}/{len(valid_items)} öğede eksik")
-        
-        # Ortak anahtarları logla
-        #logger.info(f"Tüm öğelerde ortak olan {len(common_keys)} anahtar: {common_keys}")
+            # Sadece ilk 3 geçersiz öğeyi logla
+            invalid_items = ((i, item) for i, item in enumerate(data_list) if not isinstance(item, dict))
+            for _, (i, item) in zip(range(3), invalid_items):
+                logger.warning(f"Geçersiz öğe #{i}: {type(item)} - {str(item)[:50]}")
+            logger.warning(f"Toplam {invalid_count} geçersiz öğe atlandı")
         
-        # Tüm anahtar değer çiftlerinin sabit uzunlukta olduğunu garantile
-        standardized_data = []
+        if len(valid_items) == 0:
+            logger.error("Geçerli öğe kalmadı. Boş DataFrame döndürülüyor.")
+            return pd.DataFrame(columns=required_columns)
         
-        for item in valid_items:
-            new_item = {}
-            for key in all_keys:
-                new_item[key] = item.get(key, None)
-            standardized_data.append(new_item)
+        # Eksik anahtarları tespit et - tüm anahtarlar tek geçişte sayılır
+        key_counts = Counter(chain.from_iterable(valid_items))
+        for key, count in key_counts.items():
+            if count < len(valid_items):
+                logger.info(f"'{key}' anahtarı {len(valid_items) - count}/{len(valid_items)} öğede eksik")
         
         try:
-            # DataFrame oluştur
-            df = pd.DataFrame(standardized_data)
-            
-            # Gerekli sütunların var olduğundan emin ol
+            # DataFrame'i doğrudan gerekli kolonlarla oluştur: satır başına dict kopyası yok,
+            # eksik anahtarlar ve hiç olmayan kolonlar NaN olur
             for col in required_columns:
-                if col not in df.columns:
+                if col not in key_counts:
                     logger.warning(f"Gerekli sütun '{col}' veride yok, None değerleriyle ekleniyor")
-                    df[col] = None
-                    
-            logger.info(f"Gerekli kolonlar: {required_columns}")
             
-            # Sadece gerekli kolonları tut, geri kalanları sil
-            df_cleaned = df[required_columns]
-            #logger.info(f"Yalnızca gerekli kolonlar kaldı: {df_cleaned.columns.tolist()}")
+            df_cleaned = pd.DataFrame.from_records(valid_items, columns=required_columns)
+            logger.info(f"Gerekli kolonlar: {required_columns}")
             
             # NaN değerleri hakkında bilgi
             na_counts = df_cleaned.isna().sum()
@@ -520,8 +1789,7 @@ class IlacOneriModel:
             logger.error(traceback.format_exc())
             
             # Hata detaylarını incelemek için veri örneği
-            if standardized_data:
-                logger.error(f"İlk veri örneği: {standardized_data[0]}")
+            logger.error(f"İlk veri örneği: {valid_items[0]}")
             
             # Boş DataFrame döndür
             return pd.DataFrame(columns=required_columns)
@@ -796,6 +2064,9 @@ class IlacOneriModel:
     # Veri analizi fonksiyonları
     def analyze_data_distribution(df, column, title):
         """Bir sütunun değer dağılımını analiz eder ve görselleştirir"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         plt.figure(figsize=(10, 6))
         value_counts = df[column].value_counts()
         
@@ -817,6 +2088,8 @@ class IlacOneriModel:
         
     def analyze_relationships(df1, df2, key, title):
         """İki veri çerçevesi arasındaki ilişkileri analiz eder"""
+        import matplotlib.pyplot as plt
+        
         merged = pd.merge(df1, df2, on=key, how='inner')
         relationship_counts = merged.groupby(key).size().reset_index(name='count')
         
@@ -834,6 +2107,9 @@ class IlacOneriModel:
     # Eksik veriler için analiz
     def analyze_missing_data(df, title):
         """Veri çerçevesindeki eksik değerleri analiz eder"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         missing = df.isnull().sum()
         missing_percent = 100 * missing / len(df)
         missing_data = pd.concat([missing, missing_percent], axis=1)
@@ -851,6 +2127,15 @@ class IlacOneriModel:
 
     def train_model(self, force_retrain=False):
         """Model eğitimi"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+        from sklearn.exceptions import ConvergenceWarning
+        
+        self.ensure_model_loaded()
         if self.model is not None and not force_retrain:
             current_time = datetime.datetime.now()
             last_trained = self.model_last_trained or datetime.datetime.min
@@ -863,8 +2148,8 @@ class IlacOneriModel:
         logger.info("Model eğitimi başlatılıyor...")
         
         try:
-            # Verileri çek
-            data = self.fetch_data()
+            # Verileri çek (yerel anlık görüntü varsa yalnızca değişenler)
+            data = self.sync_data()
             
             # Verileri hazırla
             features, target = self.prepare_data(data)
@@ -881,12 +2166,18 @@ class IlacOneriModel:
             # Kategorik ve sayısal özellikleri belirle
             categorical_features = []
             numerical_features = []
+            id_features = []
             
             # Her özelliğin türünü belirle
             for column in features.columns:
                 if column == 'hasta_id':
                     continue  # hasta_id'yi özellik olarak kullanma
                 
+                # ID'ler sayısal değer taşımaz; ölçeklenmeden seyrek kategorik olarak kodlanır
+                if column in ID_FEATURES:
+                    id_features.append(column)
+                    continue
+                
                 # Veri türüne göre kategorik/sayısal olarak sınıflandır
                 if features[column].dtype == object or len(features[column].unique()) < 10:
                     categorical_features.append(column)
@@ -895,10 +2186,12 @@ class IlacOneriModel:
             
             logger.info(f"Kategorik özellikler: {categorical_features}")
             logger.info(f"Sayısal özellikler: {numerical_features}")
+            logger.info(f"ID özellikleri: {id_features}")
             
             # Kolon bazında veri dönüşümleri için preprocessor oluştur
-            categorical_transformer = OneHotEncoder(handle_unknown='ignore')
+            categorical_transformer = OneHotEncoder(handle_unknown='ignore', sparse_output=True)
             numerical_transformer = StandardScaler()
+            id_transformer = build_id_feature_transformer(features[id_features])
             
             warnings.filterwarnings("ignore", category=ConvergenceWarning)
             warnings.filterwarnings("ignore", category=UserWarning)
@@ -907,9 +2200,11 @@ class IlacOneriModel:
             preprocessor = ColumnTransformer(
                 transformers=[
                     ("cat", categorical_transformer, categorical_features),
-                    ("num", numerical_transformer, numerical_features)
+                    ("num", numerical_transformer, numerical_features),
+                    ("id", id_transformer, id_features)
                 ],
-                remainder="drop"  # hasta_id gibi diğer sütunları düşür
+                remainder="drop",  # hasta_id gibi diğer sütunları düşür
+                sparse_threshold=1.0  # çıktı her zaman CSR kalır, orman seyrek matrisle eğitilir
             )
             
             # Veriyi eğitim ve test olarak böl
@@ -917,43 +2212,25 @@ class IlacOneriModel:
             logger.info(f"Veri bölündü: X-Eğitim {X_train.shape[0]} kayıt, Test {X_test.shape[0]} kayıt")
             logger.info(f"Veri bölündü: Y-Eğitim {y_train.shape[0]} kayıt, Test {y_test.shape[0]} kayıt")
             
-            # GridSearch için hiperparametre aralıkları
-            param_grid = {
-                'classifier__n_estimators': [100, 200, 300],
-                'classifier__max_depth': [10, 20, 30, None],
-                'classifier__min_samples_split': [2, 5, 10],
-                'classifier__min_samples_leaf': [1, 2, 4],
-                'classifier__max_features': ['sqrt', 'log2', None]
-            }
-            
-            # Model pipeline'ı
+            # Model pipeline'ı (ön işleme adımı, kat verisi ve parametreleri aynıysa önbellekten gelir)
+            preprocess_memory = joblib.Memory(PREPROCESS_CACHE_DIR, verbose=0) if PREPROCESS_CACHE_DIR else None
             pipeline = Pipeline([
                 ("preprocessor", preprocessor),
                 ("classifier", RandomForestClassifier(random_state=42, class_weight='balanced'))
-            ])
+            ], memory=preprocess_memory)
             
-            # GridSearch ile en iyi modeli bul (yeterli veri varsa)
-            if len(X_train) > 100:
-                logger.info("GridSearch ile hiperparametre optimizasyonu yapılıyor...")
-                
-                # Veri miktarına göre çapraz doğrulama (cv) değerini ayarla
-                cv = 5 if len(X_train) > 500 else 3
-                
-                grid_search = GridSearchCV(
-                    pipeline, 
-                    param_grid, 
-                    cv=cv, 
-                    scoring='f1_weighted',
-                    n_jobs=-1
-                )
+            # Hiperparametre araması ile en iyi modeli bul (yeterli veri varsa)
+            if len(X_train) > 100 and HYPERPARAM_SEARCH["mode"] != "none":
+                best_pipeline = self._search_hyperparameters(pipeline, X_train, y_train)
                 
-                grid_search.fit(X_train, y_train)
-                best_pipeline = grid_search.best_estimator_
-                logger.info(f"En iyi parametreler: {grid_search.best_params_}")
+                # Kaydedilen model önbellek dizinine bağlı kalmasın; önbelleği boyut sınırına indir
+                best_pipeline.set_params(memory=None)
+                if preprocess_memory is not None:
+                    preprocess_memory.reduce_size(bytes_limit=PREPROCESS_CACHE_MAX_BYTES)
             else:
                 # Veri azsa varsayılan parametrelerle eğit
                 logger.info("Veri az olduğu için hiperparametre optimizasyonu atlandı.")
-                best_pipeline = pipeline
+                best_pipeline = pipeline.set_params(memory=None)
                 best_pipeline.fit(X_train, y_train)
             
             # Model performansını değerlendir
@@ -1015,10 +2292,14 @@ class IlacOneriModel:
             self.model = best_pipeline
             self.preprocessor = preprocessor
             self.model_last_trained = datetime.datetime.now()
+            # Eski modelin sonuçları artık eşleşmez; anahtarda modelin eğitim zamanı olduğundan
+            # paylaşılan (Redis) önbellek diğer worker'lar için silinmez, TTL ile düşer
+            if not ilac_tahmin_cache.shared:
+                ilac_tahmin_cache.clear()
             
             # Özel encoderları sakla (prediction için kullanılacak)
-            self.etken_madde_encoder = categorical_transformer
-            self.hastalik_encoder = categorical_transformer
+            self.etken_madde_encoder = id_transformer
+            self.hastalik_encoder = id_transformer
             
             # Model metriklerini sakla
             self.model_metrics = {
@@ -1039,6 +2320,70 @@ class IlacOneriModel:
             logger.error(f"Hata ayrıntıları: {traceback.format_exc()}")
             return None, None, None, None
 
+    def _search_hyperparameters(self, pipeline, X_train, y_train):
+        """
+        HYPERPARAM_SEARCH ayarlarına göre hiperparametre araması yapar ve en iyi pipeline'ı döndürür.
+        Her aday için duvar saati süresi ve skor loglanır.
+        """
+        from sklearn.model_selection import GridSearchCV
+        
+        search_config = HYPERPARAM_SEARCH
+        
+        # Veri miktarına göre çapraz doğrulama (cv) değerini ayarla
+        cv = 5 if len(X_train) > 500 else 3
+        
+        param_grid = {
+            'classifier__max_depth': [10, 20, 30, None],
+            'classifier__min_samples_split': [2, 5, 10],
+            'classifier__min_samples_leaf': [1, 2, 4],
+            'classifier__max_features': ['sqrt', 'log2', None]
+        }
+        
+        if search_config["mode"] == "grid":
+            logger.info("GridSearch ile hiperparametre optimizasyonu yapılıyor...")
+            search = GridSearchCV(
+                pipeline,
+                dict(param_grid, classifier__n_estimators=[100, 200, 300]),
+                cv=cv,
+                scoring='f1_weighted',
+                n_jobs=search_config["n_jobs"]
+            )
+        else:
+            from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+            from sklearn.model_selection import HalvingRandomSearchCV
+            
+            logger.info(f"Ardışık yarılama ile hiperparametre optimizasyonu yapılıyor "
+                        f"({search_config['n_candidates']} aday, {search_config['min_resources']}-{search_config['max_resources']} ağaç)...")
+            search = HalvingRandomSearchCV(
+                pipeline,
+                param_grid,
+                n_candidates=search_config["n_candidates"],
+                factor=search_config["factor"],
+                resource='classifier__n_estimators',
+                min_resources=search_config["min_resources"],
+                max_resources=search_config["max_resources"],
+                cv=cv,
+                scoring='f1_weighted',
+                n_jobs=search_config["n_jobs"],
+                random_state=search_config["random_state"]
+            )
+        
+        baslangic = time.time()
+        search.fit(X_train, y_train)
+        sure = time.time() - baslangic
+        
+        # Aday başına duvar saati süresi (tüm katlar için fit + skor) ve skor
+        results = search.cv_results_
+        for i, params in enumerate(results['params']):
+            aday_suresi = (results['mean_fit_time'][i] + results['mean_score_time'][i]) * cv
+            kaynak = f", {results['n_resources'][i]} ağaç" if 'n_resources' in results else ""
+            logger.info(f"Aday {i + 1}/{len(results['params'])}{kaynak}: {aday_suresi:.2f} saniye, "
+                        f"F1={results['mean_test_score'][i]:.4f}, parametreler={params}")
+        
+        logger.info(f"Hiperparametre araması tamamlandı: {len(results['params']) * cv} model eğitimi, {sure:.1f} saniye")
+        logger.info(f"En iyi parametreler: {search.best_params_} (F1={search.best_score_:.4f})")
+        return search.best_estimator_
+
     def get_model_performance(self):
         """
         Mevcut modelin performans metriklerini döndür
@@ -1102,24 +2447,18 @@ class IlacOneriModel:
             # NaN değerleri olan satırları filtrele
             ilac_etken_df = ilac_etken_df.dropna(subset=['ilac_id', 'etken_madde_id'])
             
-            # Her ilaç için etken madde listesi oluştur
-            ilac_etken_dict = defaultdict(list)
-            
-            for _, row in ilac_etken_df.iterrows():
-                ilac_id = row.get('ilac_id')
-                etken_madde_id = row.get('etken_madde_id')
-                
-                # ID'leri integer olarak sakla
-                try:
-                    ilac_id = int(ilac_id)
-                    etken_madde_id = int(etken_madde_id)
-                    ilac_etken_dict[ilac_id].append(etken_madde_id)
-                except (ValueError, TypeError):
-                    logger.warning(f"Geçersiz ID değerleri: ilac_id={ilac_id}, etken_madde_id={etken_madde_id}")
-                    continue
+            # ID'leri integer olarak sakla, sayıya çevrilemeyenleri atla
+            ilac_ids = pd.to_numeric(ilac_etken_df['ilac_id'], errors='coerce')
+            etken_madde_ids = pd.to_numeric(ilac_etken_df['etken_madde_id'], errors='coerce')
+            valid = ilac_ids.notna() & etken_madde_ids.notna() & (ilac_ids % 1 == 0) & (etken_madde_ids % 1 == 0)
+            if not valid.all():
+                logger.warning(f"Geçersiz ID değerleri içeren {int((~valid).sum())} ilişki atlandı")
             
-            # Vektör tablosunu güncelle
-            self.ilac_etki_vektoru = dict(ilac_etken_dict)
+            # Her ilaç için etken madde listesi oluştur (CSR dizileri, dict gibi okunur)
+            self.ilac_etki_vektoru = CSRIndex.from_pairs(
+                ilac_ids[valid].astype('int64'),
+                etken_madde_ids[valid].astype('int64')
+            )
             
             # Sonuçları logla
             logger.info(f"{len(self.ilac_etki_vektoru)} ilaç için etken madde vektörleri oluşturuldu")
@@ -1150,61 +2489,88 @@ class IlacOneriModel:
             dict: Demografik bilgiler içeren sözlük
         """
         # Eğer önbellekte varsa oradan al
-        if hasta_id in self.hasta_ozellikleri_cache:
+        demografik = self.hasta_ozellikleri_cache.get(hasta_id)
+        if demografik is not None:
             logger.info(f"Hasta {hasta_id} demografik bilgileri önbellekten alındı")
-            return self.hasta_ozellikleri_cache[hasta_id]
+            return demografik
         
         try:
-            # API'den hasta bilgilerini çek
+            # API'den hasta bilgilerini çek (kısa zaman aşımı ve devre kesiciyle)
             logger.info(f"Hasta {hasta_id} demografik bilgileri API'den çekiliyor")
-            logger.info(f"{API_BASE_URL}/hastalar/{hasta_id}")
-            response = requests.get(f"{API_BASE_URL}/hastalar/{hasta_id}")
-            
-            if response.status_code != 200:
-                logger.error(f"Hasta API hatası: {response.status_code} - {response.text[:100]}...")
-                return self._create_default_demografik()
-            
-            hasta_data = response.json().get('data', {}) if isinstance(response.json(), dict) else response.json()
-            
-            # Boş yanıt kontrolü
-            if not hasta_data:
-                logger.warning(f"Hasta {hasta_id} için veri bulunamadı")
-                return self._create_default_demografik()
-            
-            # Gerekli alanları logla
-            logger.info(f"Hasta {hasta_id} alanları: {list(hasta_data.keys())}")
-            
-            # Demografik bilgileri çıkar
-            demografik = {
-                'yas': hasta_data.get('yas', 0),
-                'cinsiyet': hasta_data.get('cinsiyet', 'bilinmiyor'),
-                'cinsiyet_encoded': 1 if hasta_data.get('cinsiyet', '').lower() == 'erkek' else 0,
-                'boy': hasta_data.get('boy', 0),
-                'kilo': hasta_data.get('kilo', 0),
-                'vki': hasta_data.get('vki', 0)
-            }
-            
-            logger.info(f"hasta demografik bilgileri :{demografik}")
-
-            # VKI hesapla (eğer mevcut değilse)
-            if demografik['vki'] == 0 and demografik['boy'] > 0 and demografik['kilo'] > 0:
-                demografik['vki'] = demografik['kilo'] / ((demografik['boy'] / 100) ** 2)
-                logger.info(f"Hasta {hasta_id} için VKI hesaplandı: {demografik['vki']}")
-            
-            # Önbelleğe al
-            self.hasta_ozellikleri_cache[hasta_id] = demografik
-            
-            # Sonuçları logla
-            logger.info(f"Hasta {hasta_id} demografik bilgileri alındı: yaş={demografik['yas']}, "
-                        f"cinsiyet={demografik['cinsiyet']}, VKI={demografik['vki'] if demografik['vki'] else 0}")
-            
-            return demografik
-                
+            hasta_data = laravel_client.get_json(f"/hastalar/{hasta_id}")
+            return self._hasta_demografik_from_api(hasta_id, hasta_data)
+        except UpstreamUnavailable as e:
+            logger.warning(f"Hasta {hasta_id} demografik bilgileri alınamadı, varsayılanlar kullanılıyor: {e}")
+            return self._create_default_demografik()
         except Exception as e:
             logger.error(f"Hasta demografik bilgilerini çekerken hata: {e}")
             import traceback
             logger.error(traceback.format_exc())
             return self._create_default_demografik()
+    
+    def get_hasta_demografik_bilgileri_toplu(self, hasta_ids):
+        """
+        Birden çok hastanın demografik bilgilerini getirir; önbellekte olmayanlar API'den
+        eşzamanlı çekilir
+        
+        Args:
+            hasta_ids (list): Hasta ID'leri
+            
+        Returns:
+            dict: Hasta ID -> demografik bilgiler
+        """
+        hasta_ids = list(dict.fromkeys(hasta_ids))
+        sonuclar = self.hasta_ozellikleri_cache.get_many(hasta_ids)
+        eksik_ids = [hasta_id for hasta_id in hasta_ids if hasta_id not in sonuclar]
+        
+        if eksik_ids:
+            logger.info(f"{len(eksik_ids)} hastanın demografik bilgileri API'den eşzamanlı çekiliyor")
+            yanitlar = laravel_client.get_many([f"/hastalar/{hasta_id}" for hasta_id in eksik_ids])
+            for hasta_id in eksik_ids:
+                hasta_data = yanitlar.get(f"/hastalar/{hasta_id}")
+                if isinstance(hasta_data, Exception):
+                    logger.warning(f"Hasta {hasta_id} demografik bilgileri alınamadı, varsayılanlar kullanılıyor: {hasta_data}")
+                    sonuclar[hasta_id] = self._create_default_demografik()
+                else:
+                    sonuclar[hasta_id] = self._hasta_demografik_from_api(hasta_id, hasta_data)
+        
+        return sonuclar
+    
+    def _hasta_demografik_from_api(self, hasta_id, hasta_data):
+        """API'den gelen hasta kaydından demografik bilgileri çıkarır ve önbelleğe alır"""
+        # Boş yanıt kontrolü
+        if not hasta_data:
+            logger.warning(f"Hasta {hasta_id} için veri bulunamadı")
+            return self._create_default_demografik()
+        
+        # Gerekli alanları logla
+        logger.info(f"Hasta {hasta_id} alanları: {list(hasta_data.keys())}")
+        
+        # Demografik bilgileri çıkar
+        demografik = {
+            'yas': hasta_data.get('yas', 0),
+            'cinsiyet': hasta_data.get('cinsiyet', 'bilinmiyor'),
+            'cinsiyet_encoded': 1 if (hasta_data.get('cinsiyet') or '').lower() == 'erkek' else 0,
+            'boy': hasta_data.get('boy', 0),
+            'kilo': hasta_data.get('kilo', 0),
+            'vki': hasta_data.get('vki', 0)
+        }
+        
+        logger.info(f"hasta demografik bilgileri :{demografik}")
+
+        # VKI hesapla (eğer mevcut değilse)
+        if demografik['vki'] == 0 and demografik['boy'] > 0 and demografik['kilo'] > 0:
+            demografik['vki'] = demografik['kilo'] / ((demografik['boy'] / 100) ** 2)
+            logger.info(f"Hasta {hasta_id} için VKI hesaplandı: {demografik['vki']}")
+        
+        # Önbelleğe al
+        self.hasta_ozellikleri_cache.set(hasta_id, demografik)
+        
+        # Sonuçları logla
+        logger.info(f"Hasta {hasta_id} demografik bilgileri alındı: yaş={demografik['yas']}, "
+                    f"cinsiyet={demografik['cinsiyet']}, VKI={demografik['vki'] if demografik['vki'] else 0}")
+        
+        return demografik
         
     def _create_default_demografik(self):
         """Varsayılan demografik bilgiler oluştur"""
@@ -1226,6 +2592,7 @@ class IlacOneriModel:
                 "etken_madde_lookup": self.etken_madde_lookup,
                 "model_last_trained": self.model_last_trained,
                 "ilac_etki_vektoru": self.ilac_etki_vektoru,
+                "ilac_etken_lookup": getattr(self, "ilac_etken_lookup", {}),
                 "model_version": self.model_version,
                 "model_metrics": self.model_metrics
             }
@@ -1243,7 +2610,8 @@ class IlacOneriModel:
                 logger.error(f"Model dosyası bulunamadı: {self.model_path}")
                 return False
             
-            model_data = joblib.load(self.model_path)
+            # NumPy dizileri (CSR indeksleri vb.) bellek eşlemeli açılır
+            model_data = joblib.load(self.model_path, mmap_mode='r')
             required_keys = ["model", "ilac_lookup", "etken_madde_lookup"]
             missing_keys = [key for key in required_keys if key not in model_data]
             if missing_keys:
@@ -1255,6 +2623,9 @@ class IlacOneriModel:
             self.etken_madde_lookup = model_data["etken_madde_lookup"]
             self.model_last_trained = model_data.get("model_last_trained")
             self.ilac_etki_vektoru = model_data.get("ilac_etki_vektoru", {})
+            # Eski model dosyalarında eşleştirme yoksa etken madde vektörleri kullanılır
+            self.ilac_etken_lookup = model_data.get("ilac_etken_lookup") or self.ilac_etki_vektoru
+            self._build_etken_indexes()
             self.model_version = model_data.get("model_version", "1.0")
             self.model_metrics = model_data.get("model_metrics", {})
             
@@ -1285,8 +2656,8 @@ class IlacOneriModel:
         
         logger.info(f"Tahmin isteği: hasta_id={hasta_id}, hastalik_id={hastalik_id}, etken_madde_ids={etken_madde_ids}, exclude_ilac_ids={exclude_ilac_ids}")
         
-        # Model varlığını kontrol et
-        if self.model is None:
+        # Model varlığını kontrol et (kayıtlı model ilk tahminde yüklenir)
+        if not self.ensure_model_loaded():
             logger.warning("Model eğitilmemiş. Otomatik eğitim başlatılıyor...")
             try:
                 self.train_model()
@@ -1310,6 +2681,14 @@ class IlacOneriModel:
             etken_madde_ids = [etken_madde_ids]
         
         try:
+            # Aynı girdiler ve aynı model için önceki sonucu döndür (anahtar istek girdilerinden,
+            # Laravel'e gitmeden hesaplanır; isabette demografik bilgi hiç çekilmez)
+            cache_key = self._prediction_cache_key(hastalik_id, etken_madde_ids, exclude_ilac_ids, hasta_demografik, hastalik_bilgileri, hasta_id=hasta_id)
+            result = ilac_tahmin_cache.get(cache_key)
+            if result is not None:
+                logger.info(f"Tahmin önbellekten döndü: {len(result.get('recommendations', []))} öneri, {(time.time() - baslangic_zamani):.4f} saniye")
+                return result
+            
             # Hastanın demografik bilgilerini kullan
             if hasta_demografik:
                 logger.info(f"Hasta {hasta_id} demografik bilgileri Laravel'den alındı")
@@ -1366,42 +2745,20 @@ class IlacOneriModel:
                 # Etken madde bazlı tahmin
                 if etken_madde_ids:
                     logger.info(f"Hastalık + {len(etken_madde_ids)} etken madde kombinasyonu ile tahmin yapılıyor")
-                    # Birden fazla etken madde varsa, her biri için ayrı tahmin yap
-                    all_predictions = []
+                    # Her etken madde için bir satır oluştur ve hepsini tek çağrıda tahmin et
+                    test_df = self._build_candidate_frame(test_data, [(hastalik_id, kategori)], etken_madde_ids)
+                    probabilities = self._predict_candidates_proba(test_df)
                     
-                    for etken_id in etken_madde_ids:
-                        logger.debug(f"Etken madde ID {etken_id} için tahmin yapılıyor")
-                        test_data_with_etken = test_data.copy()
-                        test_data_with_etken["etken_madde_id"] = [etken_id]
-                        test_df = pd.DataFrame(test_data_with_etken)
-                        
-                        try:
-                            # Tahmin
-                            probabilities = self.model.predict_proba(test_df)
-                            classes = self.model.classes_
-                            
-                            # Her ilaç için olasılıkları ekle
-                            for idx, ilac_id in enumerate(classes):
-                                all_predictions.append((ilac_id, probabilities[0][idx]))
-                            
-                            logger.debug(f"Etken madde {etken_id} için {len(classes)} ilaç tahmini yapıldı")
-                        except Exception as e:
-                            logger.error(f"Etken madde {etken_id} için tahmin yapılırken hata: {str(e)}", exc_info=True)
-                            continue
-                    
-                    logger.info(f"Toplam {len(all_predictions)} tahmin yapıldı, etken madde uyumuna göre düzenleniyor")
+                    logger.info(f"Toplam {probabilities.size} tahmin yapıldı, etken madde uyumuna göre düzenleniyor")
                     
-                    # Etken madde uyumuna göre tahminleri ayarla
-                    logger.info(f"{len(all_predictions)} tahmin etken madde uyumuna göre ayarlanıyor")
-                    all_predictions = self.adjust_predictions_by_active_substances(all_predictions, etken_madde_ids)
-                    
-                    # Sonuçları formatla
-                    result = self.format_prediction_results(all_predictions, exclude_ilac_ids)
+                    # Etken madde uyumuna göre ayarla, hariç tutulanları çıkar ve sonuçları formatla
+                    result = self._format_recommendations(*self.aggregate_candidate_proba(probabilities, etken_madde_ids, exclude_ilac_ids))
                     
                     # Önerileri logla
                     if "recommendations" in result:
                         logger.info(f"{len(result['recommendations'])} ilaç önerisi oluşturuldu")
                     
+                    ilac_tahmin_cache.set(cache_key, result)
                     bitis_zamani = time.time()
                     logger.info(f"Tahmin tamamlandı: {len(result.get('recommendations', []))} öneri, {(bitis_zamani - baslangic_zamani):.2f} saniye")
                     return result
@@ -1411,7 +2768,6 @@ class IlacOneriModel:
                     logger.info("Sadece hastalık bilgisi ile öneri yapılıyor")
                     # En yaygın etken maddeler üzerinden tahmin yap
                     all_etken_madde_ids = list(self.etken_madde_lookup.keys())
-                    all_predictions = []
                     
                     # Performans için sınırla
                     sample_size = min(20, len(all_etken_madde_ids))
@@ -1419,34 +2775,20 @@ class IlacOneriModel:
                     
                     logger.info(f"{sample_size} etken madde örneklemi ile hastalık bazlı tahmin yapılıyor")
                     
-                    for etken_id in sample_etken_madde_ids:
-                        logger.debug(f"Hastalık {hastalik_id} + Etken madde {etken_id} kombinasyonu için tahmin")
-                        test_data_with_etken = test_data.copy()
-                        test_data_with_etken["etken_madde_id"] = [etken_id]
-                        test_df = pd.DataFrame(test_data_with_etken)
-                        
-                        try:
-                            # Tahmin
-                            probabilities = self.model.predict_proba(test_df)
-                            classes = self.model.classes_
-                            
-                            # Her ilaç için olasılıkları ekle
-                            for idx, ilac_id in enumerate(classes):
-                                all_predictions.append((ilac_id, probabilities[0][idx]))
-                                
-                        except Exception as e:
-                            logger.error(f"Etken madde {etken_id} için tahmin hatası: {str(e)}", exc_info=True)
-                            continue
+                    # Hastalık + örneklem etken madde kombinasyonlarını tek çağrıda tahmin et
+                    test_df = self._build_candidate_frame(test_data, [(hastalik_id, kategori)], sample_etken_madde_ids)
+                    probabilities = self._predict_candidates_proba(test_df)
                     
-                    logger.info(f"Toplam {len(all_predictions)} tahmin yapıldı, sonuçlar formatlanıyor")
+                    logger.info(f"Toplam {probabilities.size} tahmin yapıldı, sonuçlar formatlanıyor")
                     
                     # Sonuçları formatla
-                    result = self.format_prediction_results(all_predictions, exclude_ilac_ids)
+                    result = self._format_recommendations(*self.aggregate_candidate_proba(probabilities, exclude_ilac_ids=exclude_ilac_ids))
                     
                     # Önerileri logla
                     if "recommendations" in result:
                         logger.info(f"{len(result['recommendations'])} ilaç önerisi oluşturuldu")
                     
+                    ilac_tahmin_cache.set(cache_key, result)
                     bitis_zamani = time.time()
                     logger.info(f"Tahmin tamamlandı: {len(result.get('recommendations', []))} öneri, {(bitis_zamani - baslangic_zamani):.2f} saniye")
                     return result
@@ -1466,55 +2808,32 @@ class IlacOneriModel:
                 
                 logger.info(f"{len(hastalik_orneklemi)} hastalık ve {len(etken_madde_ids)} etken madde ile tahmin yapılıyor")
                 
-                all_predictions = []
-                prediction_count = 0
+                # Test verisi oluştur - temel özellikler (hastalık sütunları kombinasyonlarla doldurulur)
+                test_data = {
+                    "hasta_id": [hasta_id],
+                    "hastalik_id": [None],
+                    "hastalik_kategorisi": [None]
+                }
+                
+                # Demografik özellikleri ekle
+                for key, value in hasta_demografik.items():
+                    if key != 'cinsiyet':  # Encoded versiyonu kullanılacak
+                        test_data[key] = [value]
                 
-                # Her hastalık-etken madde kombinasyonu için tahmin yap
-                for hastalik_id, kategori in hastalik_orneklemi:
-                    # Test verisi oluştur - temel özellikler
-                    test_data = {
-                        "hasta_id": [hasta_id],
-                        "hastalik_id": [hastalik_id],
-                        "hastalik_kategorisi": [kategori]
-                    }
-                    
-                    # Demografik özellikleri ekle
-                    for key, value in hasta_demografik.items():
-                        if key != 'cinsiyet':  # Encoded versiyonu kullanılacak
-                            test_data[key] = [value]
-                    
-                    for etken_id in etken_madde_ids:
-                        test_data_with_etken = test_data.copy()
-                        test_data_with_etken["etken_madde_id"] = [etken_id]
-                        test_df = pd.DataFrame(test_data_with_etken)
-                        
-                        try:
-                            # Tahmin
-                            probabilities = self.model.predict_proba(test_df)
-                            classes = self.model.classes_
-                            
-                            # Her ilaç için olasılıkları ekle
-                            prediction_count += len(classes)
-                            for idx, ilac_id in enumerate(classes):
-                                all_predictions.append((ilac_id, probabilities[0][idx]))
-                            
-                        except Exception as e:
-                            # Bazı kombinasyonlar için tahmin yapılamayabilir
-                            continue
+                # Tüm hastalık-etken madde kombinasyonlarını tek çağrıda tahmin et
+                test_df = self._build_candidate_frame(test_data, hastalik_orneklemi, etken_madde_ids)
+                probabilities = self._predict_candidates_proba(test_df)
                 
-                logger.info(f"Toplam {len(all_predictions)} tahmin yapıldı ({prediction_count} sınıf tahmini)")
+                logger.info(f"Toplam {probabilities.size} tahmin yapıldı ({len(test_df)} kombinasyon)")
                 
-                # Etken madde uyumuna göre tahminleri ayarla
-                logger.info(f"{len(all_predictions)} tahmin etken madde uyumuna göre ayarlanıyor")
-                all_predictions = self.adjust_predictions_by_active_substances(all_predictions, etken_madde_ids)
-
-                # Sonuçları formatla
-                result = self.format_prediction_results(all_predictions, exclude_ilac_ids)
+                # Etken madde uyumuna göre ayarla, hariç tutulanları çıkar ve sonuçları formatla
+                result = self._format_recommendations(*self.aggregate_candidate_proba(probabilities, etken_madde_ids, exclude_ilac_ids))
                 
                 # Önerileri logla
                 if "recommendations" in result:
                     logger.info(f"{len(result['recommendations'])} ilaç önerisi oluşturuldu")
                 
+                ilac_tahmin_cache.set(cache_key, result)
                 bitis_zamani = time.time()
                 logger.info(f"Tahmin tamamlandı: {len(result.get('recommendations', []))} öneri, {(bitis_zamani - baslangic_zamani):.2f} saniye")
                 return result
@@ -1525,80 +2844,188 @@ class IlacOneriModel:
             logger.info(f"Tahmin başarısız oldu: {(bitis_zamani - baslangic_zamani):.2f} saniye")
             return {"error": str(e)}   
 
-    def adjust_predictions_by_active_substances(self, predictions, target_etken_madde_ids):
+    def _prediction_cache_key(self, hastalik_id, etken_madde_ids, exclude_ilac_ids, hasta_demografik, hastalik_bilgileri, hasta_id=None):
         """
-        Etken madde uyumuna göre tahminleri düzenle
+        predict_ilac sonucunu belirleyen girdilerin önbellek anahtarı: hastalık ve kategorisi,
+        etken madde ve hariç tutulan ilaç kümeleri, demografik bilgilerin yalnızca modelin
+        kullandığı sütunları (hasta_id hariç) ve modelin eğitim zamanı. Demografik bilgi
+        gönderilmediyse (Laravel'den çekilecekse) yerine hasta_id kullanılır.
+        """
+        if hasta_demografik:
+            model_columns = set(getattr(self.model, "feature_names_in_", [])) - {"hasta_id"}
+            demografik = {
+                key: value for key, value in hasta_demografik.items()
+                if not model_columns or key in model_columns or key == "cinsiyet"
+            }
+        else:
+            demografik = {"hasta_id": hasta_id}
+        hastalik_bilgileri = hastalik_bilgileri or {}
+        kategori = hastalik_bilgileri.get("hastalik_kategorisi", hastalik_bilgileri.get("kategori"))
+        
+        return prediction_cache_key(
+            "ilac_oneri", self.model_version, self.model_last_trained,
+            hastalik_id, kategori,
+            canonical_id_set(etken_madde_ids), canonical_id_set(exclude_ilac_ids),
+            demografik
+        )
+    
+    def _build_candidate_frame(self, test_data, hastaliklar, etken_madde_ids):
+        """
+        Tek satırlık test verisini tüm (hastalık, etken madde) kombinasyonlarına genişletir
         
         Args:
-            predictions (list): [(ilac_id, olasılık), ...] şeklinde tahmin listesi
-            target_etken_madde_ids (list): Hedef etken madde ID'leri
+            test_data (dict): Sütun -> [değer] şeklinde temel test verisi
+            hastaliklar (list): [(hastalik_id, kategori), ...]
+            etken_madde_ids (list): Etken madde ID'leri
             
         Returns:
-            list: Düzenlenmiş tahminler
+            pandas.DataFrame: Her kombinasyon için bir satır
         """
+        n_etken = len(etken_madde_ids)
+        n_rows = len(hastaliklar) * n_etken
+        
+        frame = {key: values * n_rows for key, values in test_data.items()}
+        frame["hastalik_id"] = [hastalik_id for hastalik_id, _ in hastaliklar for _ in range(n_etken)]
+        frame["hastalik_kategorisi"] = [kategori for _, kategori in hastaliklar for _ in range(n_etken)]
+        frame["etken_madde_id"] = list(etken_madde_ids) * len(hastaliklar)
+        return pd.DataFrame(frame)
+
+    def _predict_candidates_proba(self, test_df):
+        """
+        Aday satırların tamamını tek predict_proba çağrısıyla skorlar. Toplu çağrı
+        başarısız olursa satırlar tek tek denenir ve hatalı satırlar atlanır.
         
-        logger.info(f"{len(predictions)} tahmin etken madde uyumuna göre ayarlanıyor")
+        Returns:
+            numpy.ndarray: (satır sayısı, sınıf sayısı) olasılık matrisi
+        """
+        n_classes = len(self.model.classes_)
+        if len(test_df) == 0:
+            return np.empty((0, n_classes))
+        
+        try:
+            return np.asarray(self.model.predict_proba(test_df))
+        except Exception as e:
+            logger.warning(f"Toplu tahmin başarısız, satırlar tek tek deneniyor: {str(e)}")
+        
+        rows = []
+        for i in range(len(test_df)):
+            try:
+                rows.append(self.model.predict_proba(test_df.iloc[[i]])[0])
+            except Exception as e:
+                logger.error(f"Aday satır {i} için tahmin hatası: {str(e)}", exc_info=True)
+        return np.array(rows).reshape(len(rows), n_classes)
+
+    def aggregate_candidate_proba(self, probabilities, etken_madde_ids=None, exclude_ilac_ids=None, top_k=MAX_RECOMMENDATIONS):
+        """
+        predict_proba matrisinden en iyi k ilacı seçer: sınıf başına aday satırlar arasındaki
+        en yüksek olasılık, etken madde uyum çarpanları ve hariç tutma maskesi dizi işlemleriyle uygulanır.
+        
+        Args:
+            probabilities (numpy.ndarray): (aday satır, sınıf) olasılık matrisi
+            etken_madde_ids (list, optional): Uyum çarpanları için hedef etken madde ID'leri
+            exclude_ilac_ids (list, optional): Hariç tutulacak ilaç ID'leri
+            top_k (int): Döndürülecek ilaç sayısı
+            
+        Returns:
+            tuple: (ilaç ID'leri, skorlar) - azalan skor sırasında
+        """
+        classes = np.asarray(self.model.classes_)
+        if len(probabilities) == 0:
+            logger.warning("Format için tahmin sonucu yok")
+            return classes[:0], np.empty(0)
         
+        # Sınıf başına en yüksek olasılık
+        scores = probabilities.max(axis=0)
+        
+        if etken_madde_ids:
+            scores = scores * self._etken_uyum_carpanlari(classes, etken_madde_ids)
+            logger.info(f"Etken madde uyumuna göre {len(scores)} tahmin ayarlandı")
+        
+        return self._select_top_k(classes, scores, exclude_ilac_ids, top_k)
+
+    def _select_top_k(self, ilac_ids, scores, exclude_ilac_ids=None, top_k=MAX_RECOMMENDATIONS):
+        """Hariç tutulan ilaçları maskeler ve en yüksek skorlu k ilacı azalan sırada döndürür"""
+        if exclude_ilac_ids is not None:
+            logger.debug(f"{len(exclude_ilac_ids)} ilaç hariç tutuluyor: {exclude_ilac_ids}")
+            keep = ~np.isin(ilac_ids, list(exclude_ilac_ids))
+            ilac_ids, scores = ilac_ids[keep], scores[keep]
+        
+        top = top_k_indices(scores, top_k)
+        return ilac_ids[top], scores[top]
+
+    def _etken_uyum_carpanlari(self, ilac_ids, target_etken_madde_ids):
+        """
+        Her ilaç için etken madde uyum çarpanını hesaplar
+        (1.0: tam eşleşme, 0.5 - 1.0: kısmi eşleşme, eşleşme yoksa sabit çarpanlar)
+        
+        Args:
+            ilac_ids (numpy.ndarray): İlaç ID'leri
+            target_etken_madde_ids (list): Hedef etken madde ID'leri
+            
+        Returns:
+            numpy.ndarray: ilac_ids ile hizalı çarpanlar
+        """
         if not hasattr(self, 'ilac_etken_lookup'):
             logger.warning("İlaç-etken madde eşleştirmesi (ilac_etken_lookup) bulunamadı")
-            return predictions
+            return np.ones(len(ilac_ids))
         
         # Etken madde ID'lerini set'e çevir
         target_etken_set = set(target_etken_madde_ids)
         
-        # İlaç-olasılık sözlüğü
-        ilac_olasilikar = {}
+        if getattr(self, 'ilac_etken_cardinality', None) is None:
+            self._build_etken_indexes()
         
-        # İlk geçiş: Her ilaç için en yüksek olasılık
-        for ilac_id, prob in predictions:
-            # Bu ilaç daha önce işlendi mi?
-            if ilac_id in ilac_olasilikar:
-                # En yüksek olasılığı tut
-                ilac_olasilikar[ilac_id] = max(prob, ilac_olasilikar[ilac_id])
-            else:
-                ilac_olasilikar[ilac_id] = prob
+        # Eşleşme yok: etken maddesi bilinen ama eşleşmeyen ve etken madde bilgisi olmayan ilaçlar
+        bilinen_ilaclar = self.ilac_etken_lookup.keys_array
+        carpanlar = np.where(np.isin(ilac_ids, bilinen_ilaclar), ETKEN_MADDE_ESLESMESIZ_CARPAN, ETKEN_MADDE_BILGISIZ_CARPAN)
         
-        # İkinci geçiş: Etken madde uyumuna göre puanları ayarla
-        adjusted_predictions = []
+        # Ortak etken madde sayıları: yalnızca hedef etken maddelerin ilaç listeleri dolaşılır,
+        # listede olmayan ilaçların hiç ortak etken maddesi yoktur
+        postings = [self.etken_ilac_index.row(etken_id)[0] for etken_id in target_etken_set if etken_id in self.etken_ilac_index]
+        if not postings:
+            return carpanlar
+        eslesen_ilaclar, ortak_sayilari = np.unique(np.concatenate(postings), return_counts=True)
         
-        for ilac_id, prob in ilac_olasilikar.items():
-            # İlacın etken maddelerini al
-            ilac_etken_ids = self.ilac_etken_lookup.get(ilac_id, [])
-            
-            if not ilac_etken_ids:
-                # Etken madde bilgisi yoksa olasılığı düşür
-                adjusted_prob = prob * 0.5
-                logger.debug(f"İlaç {ilac_id} için etken madde bilgisi bulunamadı, olasılık 0.5 ile ölçeklendi")
-            else:
-                # Etken madde ID'lerini set'e çevir
-                ilac_etken_set = set(ilac_etken_ids)
-                
-                # Etken madde eşleşmesi hesapla
-                ortak_etken = ilac_etken_set.intersection(target_etken_set)
-                
-                # Uyum puanı (1.0: tam eşleşme, 0.5: kısmi eşleşme, 0.3: eşleşme yok)
-                if len(ortak_etken) == len(target_etken_set) and len(ilac_etken_set) == len(target_etken_set):
-                    # Tam eşleşme: Hedeflenen etken maddelerin tamamı ilaçta var ve ilaçta başka etken madde yok
-                    uyum_puani = 1.0
-                    logger.debug(f"İlaç {ilac_id} için tam etken madde eşleşmesi: {ortak_etken}")
-                elif len(ortak_etken) > 0:
-                    # Kısmi eşleşme: Hedeflenen etken maddelerden bir kısmı ilaçta var
-                    uyum_orani = len(ortak_etken) / len(target_etken_set)
-                    uyum_puani = 0.5 + (uyum_orani * 0.5)  # 0.5 - 1.0 arası değer
-                    logger.debug(f"İlaç {ilac_id} için kısmi etken madde eşleşmesi: {ortak_etken}, uyum oranı: {uyum_orani:.2f}")
-                else:
-                    # Eşleşme yok
-                    uyum_puani = 0.3
-                    logger.debug(f"İlaç {ilac_id} için etken madde eşleşmesi yok")
-                
-                # Olasılığı uyum puanı ile ayarla
-                adjusted_prob = prob * uyum_puani
+        pos = np.clip(np.searchsorted(eslesen_ilaclar, ilac_ids), 0, len(eslesen_ilaclar) - 1)
+        eslesen = np.flatnonzero(eslesen_ilaclar[pos] == ilac_ids)
+        if len(eslesen) == 0:
+            return carpanlar
+        
+        ortak_etken = ortak_sayilari[pos[eslesen]]
+        ilac_etken_sayisi = self.ilac_etken_cardinality[np.searchsorted(bilinen_ilaclar, ilac_ids[eslesen])]
+        
+        # Tam eşleşme: Hedeflenen etken maddelerin tamamı ilaçta var ve ilaçta başka etken madde yok
+        # Kısmi eşleşme: Hedeflenen etken maddelerden bir kısmı ilaçta var
+        tam_eslesme = (ortak_etken == len(target_etken_set)) & (ilac_etken_sayisi == len(target_etken_set))
+        uyum_orani = ortak_etken / len(target_etken_set)
+        carpanlar[eslesen] = np.where(tam_eslesme, 1.0, 0.5 + (uyum_orani * 0.5))
+        
+        return carpanlar
+
+    def adjust_predictions_by_active_substances(self, predictions, target_etken_madde_ids):
+        """
+        Etken madde uyumuna göre tahminleri düzenle
+        
+        Args:
+            predictions (list): [(ilac_id, olasılık), ...] şeklinde tahmin listesi
+            target_etken_madde_ids (list): Hedef etken madde ID'leri
             
-            # Düzeltilmiş olasılıkla ekle
-            adjusted_predictions.append((ilac_id, adjusted_prob))
+        Returns:
+            list: Düzenlenmiş tahminler
+        """
+        
+        logger.info(f"{len(predictions)} tahmin etken madde uyumuna göre ayarlanıyor")
+        
+        if not predictions:
+            return []
         
-        # Olasılık sırasına göre sırala
-        adjusted_predictions.sort(key=lambda x: x[1], reverse=True)
+        # Her ilaç için en yüksek olasılık
+        ilac_ids, olasiliklar = max_by_key(*zip(*predictions))
+        
+        # Olasılıkları uyum çarpanlarıyla ayarla ve olasılık sırasına göre sırala
+        adjusted = olasiliklar * self._etken_uyum_carpanlari(ilac_ids, target_etken_madde_ids)
+        order = top_k_indices(adjusted, len(adjusted))
+        adjusted_predictions = list(zip(ilac_ids[order].tolist(), adjusted[order].tolist()))
         
         logger.info(f"Etken madde uyumuna göre {len(adjusted_predictions)} tahmin ayarlandı")
         return adjusted_predictions
@@ -1618,33 +3045,20 @@ class IlacOneriModel:
             logger.warning("Format için tahmin sonucu yok")
             return {"recommendations": []}
         
-        # Exclude belirtilen ilaçları filtrele
-        if exclude_ilac_ids is not None:
-            logger.debug(f"{len(exclude_ilac_ids)} ilaç hariç tutuluyor: {exclude_ilac_ids}")
-            predictions = [(ilac_id, prob) for ilac_id, prob in predictions if ilac_id not in exclude_ilac_ids]
-        
-        # İlaç bazında olasılıkları birleştir (ilaç başına en yüksek olasılık)
-        ilac_olasilikar = {}
-        for ilac_id, prob in predictions:
-            ilac_olasilikar[ilac_id] = max(prob, ilac_olasilikar.get(ilac_id, 0))
-        
-        # İlaç-olasılık çiftlerini oluştur
-        ilac_olasilikar_list = [(ilac_id, prob) for ilac_id, prob in ilac_olasilikar.items()]
-        
-        # Olasılık sırasına göre sırala (azalan)
-        ilac_olasilikar_list.sort(key=lambda x: x[1], reverse=True)
-        
-        # En iyi N tanesini al
-        max_recommendations = 5
-        top_ilaclar = ilac_olasilikar_list[:max_recommendations]
+        # İlaç bazında olasılıkları birleştir (ilaç başına en yüksek olasılık), en iyi N tanesini al
+        ilac_ids, olasiliklar = max_by_key(*zip(*predictions))
+        return self._format_recommendations(*self._select_top_k(ilac_ids, olasiliklar, exclude_ilac_ids))
+
+    def _format_recommendations(self, ilac_ids, olasiliklar):
+        """
+        Sıralı ilaç ID'leri ve olasılıklarından öneri listesini oluşturur
         
-        # Sonuç formatını oluştur
+        Returns:
+            dict: Formatlı sonuçlar
+        """
         recommendations = []
         
-        # Kullanılacak ilaç id listesi için cache
-        processed_ilac_ids = set()
-        
-        for ilac_id, prob in top_ilaclar:
+        for ilac_id, prob in zip(np.asarray(ilac_ids).tolist(), np.asarray(olasiliklar).tolist()):
             # İlaç adını bul
             ilac_adi = self.ilac_lookup.get(ilac_id, f"İlaç_{ilac_id}")
             
@@ -1653,21 +3067,14 @@ class IlacOneriModel:
             
             # İlaç-etken madde eşleştirme verimiz varsa
             if hasattr(self, 'ilac_etken_lookup') and ilac_id in self.ilac_etken_lookup:
-                # Bu fonksiyon ilac_etken_lookup'tan etken madde ID'lerini almalı
-                etken_ids = self.ilac_etken_lookup.get(ilac_id, [])
-                
                 # Benzersiz etken madde ID'leri için işlem yap
-                unique_etken_ids = set(etken_ids)
-                
-                for etken_id in unique_etken_ids:
+                for etken_id in set(self.ilac_etken_lookup.get(ilac_id, [])):
                     etken_adi = self.etken_madde_lookup.get(etken_id, f"Etken madde {etken_id}")
                     etken_maddeler.append({
                         "etken_madde_id": etken_id,
                         "etken_madde_adi": etken_adi
                     })
             else:
-                # İlaç-etken madde ilişkilerini prepare_data içinde oluşturmamız gerekiyor
-                # Şimdilik boş liste döndür
                 logger.warning(f"İlaç {ilac_id} için etken madde bilgisi bulunamadı")
             
             # İlaç önerisini ekle
@@ -1678,9 +3085,6 @@ class IlacOneriModel:
                 "oneri_puani": round(prob * 100, 2),
                 "etken_maddeler": etken_maddeler
             })
-            
-            # İşlenen ilaç ID'sini işaretleyelim
-            processed_ilac_ids.add(ilac_id)
         
         # Sonuçları döndür
         return {
@@ -1704,11 +3108,26 @@ class HybridDrugRecommender:
         self.ilac_lookup = {}
         self.etken_madde_lookup = {}
         self.ilac_etken_vectors = {}
+        self.ilac_etken_cardinality = None  # Her ilacın farklı etken madde sayısı
+        self.ilac_ids = None  # Matris satırlarının ilaç ID'leri
+        self.etken_ilac_index = None  # Etken madde ID -> ilaç ID'leri (ters indeks)
+        self.etken_madde_fallback_score = ETKEN_MADDE_FALLBACK_SCORE
         self.hastalik_ilac_scores = {}
+        self.hastalik_topk = None  # Hastalık -> skora göre sıralı en iyi HASTALIK_TOPK ilaç
+        self.fusion_ilac_ids = None  # Alt model skor vektörlerinin hizalandığı sıralı ilaç ID'leri
+        self.fusion_has_etken = None  # fusion_ilac_ids sırasıyla etken madde bilgisi olan ilaçlar
+        self.fusion_hasta_positions = None  # Hasta modeli sınıflarının fusion_ilac_ids içindeki yerleri
         self.encoder = None
         self.scaler = None
         self.model_version = "2.0"
         self.feature_importances = None
+        self.artifact_version = None  # Yüklenen/kaydedilen kayıt klasörü sürümü
+        self.data_fingerprint = None  # Modeli eğiten verinin özeti (data_fingerprint)
+        self.patient_feature_medians = None  # Hasta modeli eğitim verisinin yaş/VKİ medyanları
+        self.fingerprint = uuid.uuid4().hex  # Tahmin önbelleği anahtarlarındaki model kimliği
+        self.fusion_weights = HYBRID_FUSION_WEIGHTS  # (etken madde, hastalık, hasta özellikleri)
+        self.exploration_rate = HYBRID_EXPLORATION_RATE
+        self.exploration_seed = HYBRID_EXPLORATION_SEED
         
     def fit(self, prepared_data):
         """
@@ -1717,6 +3136,9 @@ class HybridDrugRecommender:
         Args:
             prepared_data: Hazırlanmış veri yapıları
         """
+        self.fingerprint = uuid.uuid4().hex
+        self.fusion_ilac_ids = None
+        
         # Referanslar ve lookup tablolarını oluştur
         self.ilac_lookup = dict(zip(
             prepared_data['ilaclar']['ilac_id'], 
@@ -1746,17 +3168,29 @@ class HybridDrugRecommender:
         """
         from sklearn.metrics.pairwise import cosine_similarity
         
-        # İlaç-etken madde matrisini al
-        ilac_etken_df = prepared_data['ilac_etken_matrix']
+        # İlaç-etken madde matrisini (ilaç başına liste) ilaç-etken madde çiftlerine aç
+        ilac_etken_df = prepared_data['ilac_etken_matrix'].explode('etken_madde_id')
         
-        # Her ilacın etken maddelerini sözlük olarak sakla
-        for _, row in ilac_etken_df.iterrows():
-            ilac_id = row['ilac_id']
-            etken_madde_list = row.get('etken_madde_id', [])
-            if etken_madde_list and isinstance(etken_madde_list, list):
-                self.ilac_etken_vectors[ilac_id] = etken_madde_list
+        # Her ilacın etken maddelerini CSR indeksinde sakla
+        self.ilac_etken_vectors = CSRIndex.from_pairs(ilac_etken_df['ilac_id'], ilac_etken_df['etken_madde_id'])
+        self._build_active_substance_index()
         
         print(f"Etken madde vektörleri oluşturuldu: {len(self.ilac_etken_vectors)} ilaç")
+    
+    def _build_active_substance_index(self):
+        """
+        Etken madde -> ilaç ters indeksini ve ilaç başına farklı etken madde sayısını oluştur.
+        Jaccard benzerliği tahmin sırasında bu iki yapıdan hesaplanır.
+        """
+        # Eski modellerden gelen dict vektörlerini CSR indeksine çevir
+        if not isinstance(self.ilac_etken_vectors, CSRIndex):
+            pairs = [(ilac_id, etken_id) for ilac_id, etken_list in self.ilac_etken_vectors.items() for etken_id in etken_list]
+            self.ilac_etken_vectors = CSRIndex.from_pairs([p[0] for p in pairs], [p[1] for p in pairs])
+        
+        index = self.ilac_etken_vectors
+        self.ilac_ids = index.keys_array
+        self.ilac_etken_cardinality = index.distinct_counts()
+        self.etken_ilac_index = index.inverted()
         
     def _train_disease_drug_model(self, prepared_data):
         """
@@ -1765,19 +3199,100 @@ class HybridDrugRecommender:
         # Hastalık-ilaç matrisini al
         hastalik_ilac_df = prepared_data['hastalik_ilac_matrix']
         
-        # Hastalık-ilaç skorlarını sözlük olarak sakla
-        for _, row in hastalik_ilac_df.iterrows():
-            hastalik_id = row['hastalik_id']
-            ilac_id = row['ilac_id']
-            score = row.get('normalized_count', 0)
-            
-            if hastalik_id not in self.hastalik_ilac_scores:
-                self.hastalik_ilac_scores[hastalik_id] = {}
-            
-            self.hastalik_ilac_scores[hastalik_id][ilac_id] = score
+        # Hastalık-ilaç skorlarını CSR indeksinde sakla (hastalık -> {ilaç: skor})
+        scores = hastalik_ilac_df['normalized_count'] if 'normalized_count' in hastalik_ilac_df.columns else np.zeros(len(hastalik_ilac_df))
+        self.hastalik_ilac_scores = CSRIndex.from_pairs(
+            hastalik_ilac_df['hastalik_id'],
+            hastalik_ilac_df['ilac_id'],
+            scores
+        )
+        self._build_disease_topk()
         
         print(f"Hastalık-ilaç skorları oluşturuldu: {len(self.hastalik_ilac_scores)} hastalık")
         
+    def _build_disease_topk(self):
+        """
+        Her hastalık için ilaçları skora göre (eşitlikte ilaç ID'sine göre) sıralayıp ilk
+        HASTALIK_TOPK tanesini CSR dizileri olarak sakla. Sadece hastalık bilgisiyle gelen
+        istekler tüm ilaçları sıralamak yerine bu kısa listeden karşılanır.
+        """
+        # Eski modellerden gelen dict skorlarını CSR indeksine çevir
+        if not isinstance(self.hastalik_ilac_scores, CSRIndex):
+            triples = [(hastalik_id, ilac_id, score) for hastalik_id, ilac_scores in self.hastalik_ilac_scores.items() for ilac_id, score in ilac_scores.items()]
+            self.hastalik_ilac_scores = CSRIndex.from_pairs(*zip(*triples)) if triples else CSRIndex.from_pairs([], [], [])
+        
+        index = self.hastalik_ilac_scores
+        row_lengths = np.diff(index.indptr)
+        rows = np.repeat(np.arange(len(row_lengths)), row_lengths)
+        
+        # Satır içinde skor azalan, ilaç ID artan sıralama; satır içi sıra < K olanları tut
+        top_k = max(HASTALIK_TOPK, MAX_RECOMMENDATIONS)
+        order = np.lexsort((index.indices, -index.data, rows))
+        ranks = np.arange(len(order)) - index.indptr[rows[order]]
+        keep = order[ranks < top_k]
+        
+        indptr = np.zeros(len(row_lengths) + 1, dtype=np.int64)
+        np.cumsum(np.minimum(row_lengths, top_k), out=indptr[1:])
+        self.hastalik_topk = CSRIndex(index.keys_array, indptr, index.indices[keep], index.data[keep])
+    
+    def _get_disease_only_scores(self, hastalik_id, hastalik_weight, exclude_ilac_ids=None):
+        """
+        Sadece hastalık bilgisiyle gelen istek için önceden sıralanmış listeden skorları döndür
+        
+        Returns:
+            (ilac_ids, scores) dizileri; hariç tutmalardan sonra kısa liste yetersiz kalırsa
+            None (tam skorlarla birleştirme yapılmalı)
+        """
+        if self.hastalik_topk is None:
+            self._build_disease_topk()
+        
+        ilac_ids, scores = self.hastalik_topk.row(hastalik_id)
+        if exclude_ilac_ids:
+            keep = ~np.isin(ilac_ids, list(exclude_ilac_ids))
+            truncated = len(ilac_ids) < len(self.hastalik_ilac_scores.row(hastalik_id)[0])
+            if truncated and keep.sum() < MAX_RECOMMENDATIONS:
+                return None
+            ilac_ids, scores = ilac_ids[keep], scores[keep]
+        
+        return ilac_ids, scores * hastalik_weight
+    
+    def _build_patient_training_set(self, prepared_data):
+        """
+        Hasta özellikleri modeli için sıkıştırılmış eğitim verisi oluştur. Her hasta-ilaç çifti
+        bir kez sayılır, yalnızca PATIENT_MODEL_FEATURES kullanılır (hasta_id, boy, kilo modele
+        girmez) ve aynı (cinsiyet, yaş, VKİ, ilaç) profili tek satırda toplanır.
+        
+        Returns:
+            (X, y, agirlik, medians): Profil özellikleri, ilaç ID'leri, profil tekrar sayıları ve
+            tahminde eksik değerler için kullanılacak yaş/VKİ medyanları; veri yoksa None
+        """
+        hastalar_df = pd.DataFrame(prepared_data.get('hastalar', []))
+        ilac_kullanim_df = pd.DataFrame(prepared_data.get('hasta_ilac_kullanim', []))
+        
+        if hastalar_df.empty or ilac_kullanim_df.empty or 'hasta_id' not in hastalar_df.columns \
+                or not {'hasta_id', 'ilac_id'} <= set(ilac_kullanim_df.columns):
+            return None
+        
+        hastalar = hastalar_df.drop_duplicates('hasta_id').set_index('hasta_id')
+        profil, medians = patient_profile_frame(hastalar)
+        
+        # Her hasta-ilaç çifti bir kez; profil ve ilaç başına tekrar sayısı ağırlık olur
+        kullanim = ilac_kullanim_df[['hasta_id', 'ilac_id']].dropna().drop_duplicates()
+        kullanim = kullanim.join(profil, on='hasta_id', how='inner')
+        if kullanim.empty:
+            return None
+        
+        profiller = (
+            kullanim.groupby(PATIENT_MODEL_FEATURES + ['ilac_id'], observed=True)
+            .size()
+            .reset_index(name='agirlik')
+        )
+        if len(profiller) > PATIENT_MODEL_MAX_ROWS:
+            logger.info(f"Hasta özellikleri modeli: {len(profiller)} profilin en sık {PATIENT_MODEL_MAX_ROWS} tanesi kullanılıyor")
+            profiller = profiller.nlargest(PATIENT_MODEL_MAX_ROWS, 'agirlik', keep='first')
+        
+        return profiller[PATIENT_MODEL_FEATURES], as_id_array(profiller['ilac_id'].to_numpy()), profiller['agirlik'].to_numpy(), medians
+    
     def _train_patient_features_model(self, prepared_data):
         """
         Hasta özellikleri tabanlı modeli eğit (Özellik tabanlı)
@@ -1788,48 +3303,24 @@ class HybridDrugRecommender:
         from sklearn.pipeline import Pipeline
         
         # Veri hazırlama
-        hastalar_df = prepared_data['hastalar']
-        ilac_kullanim_df = pd.DataFrame(prepared_data.get('hasta_ilac_kullanim', []))
+        training_set = self._build_patient_training_set(prepared_data)
         
         # Veri yoksa erken çık
-        if hastalar_df.empty or ilac_kullanim_df.empty:
+        if training_set is None:
             print("Hasta-ilaç kullanım verisi bulunamadı, hasta özellikleri modeli eğitilemiyor.")
             return
+        X, y, agirlik, medians = training_set
         
-        # Hasta-ilaç kullanımlarını birleştir
-        hasta_features = pd.merge(
-            ilac_kullanim_df,
-            hastalar_df,
-            on='hasta_id'
-        )
-        
-        # Özellik sütunlarını seç
-        categorical_features = ['cinsiyet']
-        numerical_features = ['yas', 'vki']
-        
-        # Eksik özellik sütunlarını kontrol et
-        available_cat_features = [f for f in categorical_features if f in hasta_features.columns]
-        available_num_features = [f for f in numerical_features if f in hasta_features.columns]
-        
-        # Veri dönüştürücüleri
-        transformers = []
-        
-        if available_cat_features:
-            cat_transformer = OneHotEncoder(handle_unknown='ignore')
-            transformers.append(('cat', cat_transformer, available_cat_features))
-        
-        if available_num_features:
-            num_transformer = StandardScaler()
-            transformers.append(('num', num_transformer, available_num_features))
-        
-        # Hiç özellik yoksa erken çık
-        if not transformers:
-            print("Yeterli hasta özelliği bulunamadı, hasta özellikleri modeli eğitilemiyor.")
+        if len(np.unique(y)) < 2:
+            print("Hasta özellikleri modeli için en az iki farklı ilaç gerekli, model eğitilmedi.")
             return
         
         # Özellik dönüştürücüsü
         preprocessor = ColumnTransformer(
-            transformers=transformers,
+            transformers=[
+                ('cat', OneHotEncoder(handle_unknown='ignore'), ['cinsiyet']),
+                ('num', StandardScaler(), ['yas', 'vki'])
+            ],
             remainder='drop'
         )
         
@@ -1842,117 +3333,297 @@ class HybridDrugRecommender:
                 min_samples_split=5,
                 min_samples_leaf=2,
                 random_state=42,
-                class_weight='balanced'
+                class_weight='balanced',
+                n_jobs=PATIENT_MODEL_N_JOBS
             ))
         ])
         
-        # Veriyi eğitim için hazırla
-        X = hasta_features.drop(['ilac_id'], axis=1)
-        y = hasta_features['ilac_id']
-        
-        # Modeli eğit
-        model.fit(X, y)
+        # Modeli eğit (profil tekrar sayıları örnek ağırlığı)
+        model.fit(X, y, classifier__sample_weight=agirlik)
         
-        # Modeli sakla
+        # Modeli ve tahminde eksik değerleri dolduracak eğitim medyanlarını sakla
         self.hasta_model = model
         self.encoder = preprocessor
+        self.patient_feature_medians = medians
         
         # Özellik önemlerini sakla (eğer varsa)
         if hasattr(model.named_steps['classifier'], 'feature_importances_'):
             self.feature_importances = model.named_steps['classifier'].feature_importances_
         
-        print("Hasta özellikleri modeli eğitildi.")
+        print(f"Hasta özellikleri modeli eğitildi: {len(X)} profil, {len(model.classes_)} ilaç.")
+    
+    def predict(self, hasta_id, hastalik_id=None, etken_madde_ids=None, exclude_ilac_ids=None, hasta_demografik=None):
+        """
+        Hibrit ilaç önerisi yap
+        
+        Args:
+            hasta_id: Hasta ID'si
+            hastalik_id: Hastalık ID'si (opsiyonel)
+            etken_madde_ids: Etken madde ID'leri (opsiyonel)
+            exclude_ilac_ids: Hariç tutulacak ilaçlar (opsiyonel)
+            hasta_demografik: Hasta demografik bilgileri (opsiyonel)
+            
+        Returns:
+            recommendations: Önerilen ilaçlar listesi
+        """
+        return next(self.predict_batch([{
+            "hasta_id": hasta_id,
+            "hastalik_id": hastalik_id,
+            "etken_madde_ids": etken_madde_ids,
+            "exclude_ilac_ids": exclude_ilac_ids,
+            "hasta_demografik": hasta_demografik
+        }]))
+    
+    def predict_batch(self, queries):
+        """
+        Birden fazla hasta için hibrit ilaç önerisi yap. Aynı girdiler ve aynı model için daha
+        önce hesaplanan sonuçlar önbellekten döner; kalan sorgular _predict_batch_uncached ile
+        birlikte hesaplanır. Sonuçlar sorgu sırasıyla üretilir.
+        
+        Args:
+            queries: predict() parametrelerini içeren sözlüklerin listesi
+            
+        Yields:
+            dict: Her sorgu için predict() ile aynı biçimde sonuç
+        """
+        # Demografik bilgiler tek seferde hasta modelinin profil biçimine çevrilir; önbellek
+        # anahtarı ve model girdisi aynı profilden üretilir
+        profiles = self._patient_profiles([query.get("hasta_demografik") for query in queries])
+        queries = [dict(query, hasta_profil=profile) for query, profile in zip(queries, profiles)]
+        
+        keys = [self._prediction_cache_key(query) for query in queries]
+        cached = hibrit_tahmin_cache.get_many(set(keys) - {None})
+        uncached = self._predict_batch_uncached([query for query, key in zip(queries, keys) if key not in cached])
+        
+        for key in keys:
+            if key in cached:
+                yield cached[key]
+                continue
+            
+            result = next(uncached)
+            if key is not None and "error" not in result:
+                hibrit_tahmin_cache.set(key, result)
+            yield result
+    
+    def _prediction_cache_key(self, query):
+        """
+        Sorgu sonucunu belirleyen girdilerin önbellek anahtarı: hastalık, etken madde ve hariç
+        tutulan ilaç kümeleri, hasta modeli varsa modelin kullandığı demografik özellikler
+        (cinsiyet, yaş, VKİ), model parmak izi ve birleştirme ayarları. Girdiler anahtara
+        dönüştürülemezse None (sorgu önbelleğe alınmaz).
+        """
+        try:
+            return self._build_prediction_cache_key(query)
+        except (TypeError, ValueError):
+            return None
+    
+    def _build_prediction_cache_key(self, query):
+        demografik = self._query_profile(query)
+        
+        return prediction_cache_key(
+            "hibrit", self.fingerprint,
+            self.fusion_weights, self.exploration_rate, self.exploration_seed,
+            query.get("hastalik_id"),
+            canonical_id_set(query.get("etken_madde_ids")),
+            canonical_id_set(query.get("exclude_ilac_ids")),
+            demografik
+        )
+    
+    def _predict_batch_uncached(self, queries):
+        """
+        predict_batch'in önbelleksiz hesaplaması. Hasta özellikleri modeli tüm sorgular için
+        tek predict_proba çağrısıyla, etken madde skorları aynı etken madde kümesi için bir kez
+        hesaplanır; sonuçlar sorgu sırasıyla üretilir.
+        """
+        weights = self.fusion_weights
+        if self.fusion_ilac_ids is None:
+            self._build_fusion_index()
+        
+        # 3. Hasta özellikleri tabanlı öneriler - tüm sorgular için tek çağrı
+        profiles = [self._query_profile(query) for query in queries]
+        patient_positions = [
+            i for i, query in enumerate(queries)
+            if (query.get("hastalik_id") or query.get("etken_madde_ids")) and profiles[i] is not None
+        ]
+        patient_recommendations = dict(zip(
+            patient_positions,
+            self._predict_patient_profiles([profiles[i] for i in patient_positions])
+        ))
+        
+        etken_madde_cache = {}
+        for i, query in enumerate(queries):
+            # Bir sorgudaki hata diğer sorguların sonuçlarını engellemez
+            try:
+                yield self._predict_query(query, patient_recommendations.get(i), weights, etken_madde_cache)
+            except Exception as e:
+                logger.error(f"Sorgu için tahmin yapılamadı ({query.get('hasta_id')}): {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+                yield {"error": f"Tahmin yapılamadı: {e}"}
     
-    def predict(self, hasta_id, hastalik_id=None, etken_madde_ids=None, exclude_ilac_ids=None, hasta_demografik=None):
+    def _predict_query(self, query, patient_recommendations, weights, etken_madde_cache):
         """
-        Hibrit ilaç önerisi yap
+        Tek sorgu için üç modelin skorlarını birleştirip öneri listesini döndür
         
         Args:
-            hasta_id: Hasta ID'si
-            hastalik_id: Hastalık ID'si (opsiyonel)
-            etken_madde_ids: Etken madde ID'leri (opsiyonel)
-            exclude_ilac_ids: Hariç tutulacak ilaçlar (opsiyonel)
-            hasta_demografik: Hasta demografik bilgileri (opsiyonel)
-            
-        Returns:
-            recommendations: Önerilen ilaçlar listesi
+            query: predict() parametrelerini içeren sözlük
+            patient_recommendations: Hasta özellikleri skor vektörü (None olabilir)
+            weights: (etken madde, hastalık, hasta özellikleri) ağırlıkları
+            etken_madde_cache: Toplu istekte aynı etken madde kümesi için skor önbelleği
         """
+        hastalik_id = query.get("hastalik_id")
+        etken_madde_ids = query.get("etken_madde_ids")
+        
         # Parametreleri kontrol et
         if not hastalik_id and not etken_madde_ids:
             return {"error": "Hastalık ID veya etken madde ID'leri gerekli"}
         
-        # İstek zamanına göre stratejileri değiştir
-        # Örneğin, saatin saniyelerine göre ağırlıkları değiştir
-        seconds = int(time.time()) % 60
-        strategy = seconds % 3  # 0, 1 veya 2
-        
-        # Ağırlıkları strateji numarasına göre ayarla
-        if strategy == 0:
-            # Etken madde öncelikli
-            etken_madde_weight = 1.2
-            hastalik_weight = 0.8
-            patient_weight = 0.6
-        elif strategy == 1:
-            # Hastalık öncelikli
-            etken_madde_weight = 0.8
-            hastalik_weight = 1.2
-            patient_weight = 0.6
-        else:
-            # Hasta özellikleri öncelikli
-            etken_madde_weight = 0.8
-            hastalik_weight = 0.6
-            patient_weight = 1.2
-
-        # Her modelden önerileri al
-        recommendations = {}
-        scores = {}
+        rng = self._exploration_rng(query)
+        
+        # Sadece hastalık: önceden sıralanmış kısa listeden karşıla
+        if not etken_madde_ids and patient_recommendations is None:
+            shortlist = self._get_disease_only_scores(hastalik_id, weights[1], query.get("exclude_ilac_ids"))
+            if shortlist is not None:
+                return {"recommendations": self._format_recommendations(*shortlist, rng=rng)}
         
-        # 1. Etken madde tabanlı öneriler
+        # 1. Etken madde tabanlı öneriler (yalnızca ortak etken maddesi olan ilaçlar)
+        etken_madde_recommendations = None
         if etken_madde_ids:
-            etken_madde_recommendations = self._get_active_substance_recommendations(etken_madde_ids)
-            for ilac_id, score in etken_madde_recommendations.items():
-                if ilac_id not in scores:
-                    scores[ilac_id] = []
-                scores[ilac_id].append(score * etken_madde_weight)  # Değişken ağırlık
+            etken_key = frozenset(etken_madde_ids)
+            if etken_key not in etken_madde_cache:
+                etken_madde_cache[etken_key] = self._get_active_substance_recommendations(etken_madde_ids)
+            etken_madde_recommendations = etken_madde_cache[etken_key]
         
         # 2. Hastalık-ilaç ilişkisi tabanlı öneriler
-        if hastalik_id:
-            hastalik_recommendations = self._get_disease_drug_recommendations(hastalik_id)
-            for ilac_id, score in hastalik_recommendations.items():
-                if ilac_id not in scores:
-                    scores[ilac_id] = []
-                scores[ilac_id].append(score * hastalik_weight)  # Hastalık-ilaç ağırlığı 0.8
-        
-        # 3. Hasta özellikleri tabanlı öneriler
-        if hasta_demografik and self.hasta_model:
-            patient_recommendations = self._get_patient_features_recommendations(hasta_demografik, hastalik_id)
-            for ilac_id, score in patient_recommendations.items():
-                if ilac_id not in scores:
-                    scores[ilac_id] = []
-                scores[ilac_id].append(score * patient_weight)  # Hasta özellikleri ağırlığı 0.6
+        hastalik_recommendations = self._get_disease_drug_recommendations(hastalik_id) if hastalik_id else None
+        
+        ilac_ids, final_scores = self._fuse_scores(
+            etken_madde_recommendations,
+            hastalik_recommendations,
+            patient_recommendations,
+            weights,
+            exclude_ilac_ids=query.get("exclude_ilac_ids"),
+            etken_madde_requested=bool(etken_madde_ids)
+        )
+        
+        return {"recommendations": self._format_recommendations(ilac_ids, final_scores, rng=rng)}
+    
+    def _exploration_rng(self, query):
+        """
+        Keşif modu açıksa tohum ve sorgu girdilerinden türetilen rastgele sayı üreteci döndür;
+        aynı sorgu her çağrıda aynı skor değişimini alır. Kapalıysa None.
+        """
+        if self.exploration_rate <= 0:
+            return None
+        
+        query_seed = int(self._prediction_cache_key(query)[:16], 16)
+        return np.random.default_rng([self.exploration_seed, query_seed])
+    
+    def _build_fusion_index(self):
+        """
+        Alt modellerin skor vektörlerinin hizalanacağı tek ilaç indeksini oluştur: etken madde,
+        hastalık ve hasta özellikleri modellerinin skorlayabildiği tüm ilaçların sıralı ID'leri.
+        """
+        if self.etken_ilac_index is None:
+            self._build_active_substance_index()
+        if self.hastalik_topk is None or not isinstance(self.hastalik_ilac_scores, CSRIndex):
+            self._build_disease_topk()
+        
+        parts = [as_id_array(self.ilac_ids), as_id_array(self.hastalik_ilac_scores.indices)]
+        hasta_classes = as_id_array(self.hasta_model.classes_) if self.hasta_model else None
+        if hasta_classes is not None:
+            parts.append(hasta_classes)
+        fusion_ilac_ids = np.unique(np.concatenate(parts))
+        
+        self.fusion_has_etken = np.isin(fusion_ilac_ids, self.ilac_ids)
+        self.fusion_hasta_positions = None if hasta_classes is None else np.searchsorted(fusion_ilac_ids, hasta_classes)
+        self.fusion_ilac_ids = fusion_ilac_ids  # en son atanır: diğer diziler hazır olmadan kullanılmaz
+    
+    def _dense_scores(self, ilac_ids, scores):
+        """
+        İlaç ID'leri ve skorlarından fusion_ilac_ids ile hizalı yoğun skor vektörü oluştur;
+        skoru olmayan ilaçlar NaN'dır
+        """
+        vector = np.full(len(self.fusion_ilac_ids), np.nan)
+        vector[np.searchsorted(self.fusion_ilac_ids, ilac_ids)] = scores
+        return vector
+    
+    def _apply_exploration(self, ilac_ids, scores, rng):
+        """
+        Keşif modunda skorları ±exploration_rate oranında değiştir. Yalnızca son en iyi
+        MAX_RECOMMENDATIONS öneriye uygulanır; çarpanlar ilaç ID sırasıyla çekildiğinden aynı
+        sorgu, kısa liste ya da tam birleştirme yolundan gelsin, her zaman aynı sonucu verir.
+        """
+        if rng is None or not len(scores):
+            return scores
+        
+        order = np.argsort(ilac_ids, kind="stable")
+        factors = np.empty(len(scores))
+        factors[order] = rng.uniform(1 - self.exploration_rate, 1 + self.exploration_rate, len(scores))
+        return scores * factors
+    
+    def _fuse_scores(self, etken_madde_recommendations, hastalik_recommendations, patient_recommendations, weights,
+                     exclude_ilac_ids=None, etken_madde_requested=False):
+        """
+        Üç modelin skor vektörlerini ağırlıklandırıp ilaç başına birleştir: ağırlıklı toplam,
+        skor veren model sayısına bölünür (ortalama)
+        
+        Args:
+            etken_madde_recommendations: Etken madde skor vektörü (fusion_ilac_ids ile hizalı, None olabilir)
+            hastalik_recommendations: Hastalık-ilaç skor vektörü (None olabilir)
+            patient_recommendations: Hasta özellikleri skor vektörü (None olabilir)
+            weights: (etken madde, hastalık, hasta özellikleri) ağırlıkları
+            exclude_ilac_ids: Hariç tutulacak ilaçlar
+            etken_madde_requested: Etken madde filtresi istendi mi (yedek skor için)
+            
+        Returns:
+            (ilac_ids, scores): Aday ilaç ID'leri (artan) ve birleşik skorları
+        """
+        etken_madde_weight = weights[0]
+        totals = np.zeros(len(self.fusion_ilac_ids))
+        counts = np.zeros(len(self.fusion_ilac_ids), dtype=np.int64)
+        
+        for vector, weight in zip((etken_madde_recommendations, hastalik_recommendations, patient_recommendations), weights):
+            if vector is None:
+                continue
+            present = ~np.isnan(vector)
+            totals[present] += vector[present] * weight
+            counts += present
+        
+        # Etken madde eşleşmesi olmayan ama diğer modellerden gelen aday ilaçlara yedek skor ver
+        if etken_madde_requested and self.etken_madde_fallback_score is not None:
+            fallback = (counts > 0) & self.fusion_has_etken
+            if etken_madde_recommendations is not None:
+                fallback &= np.isnan(etken_madde_recommendations)
+            totals[fallback] += self.etken_madde_fallback_score * etken_madde_weight
+            counts[fallback] += 1
         
         # Hariç tutulan ilaçları filtrele
         if exclude_ilac_ids:
-            for ilac_id in exclude_ilac_ids:
-                if ilac_id in scores:
-                    del scores[ilac_id]
-        
-        # Skorları hesapla (ortalama)
-        final_scores = {}
-        for ilac_id, score_list in scores.items():
-            if score_list:
-                # Ortalama skorun %10'u kadar rastgele bir değişim ekle
-                base_score = sum(score_list) / len(score_list)
-                variation = base_score * 0.1  # %10 değişim
-                random_factor = random.uniform(-variation, variation)
-                final_scores[ilac_id] = base_score + random_factor
-        
-        # Skorları sırala
-        sorted_scores = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
-        
-        # En iyi 5 ilaç önerisini hazırla
+            counts[np.isin(self.fusion_ilac_ids, list(exclude_ilac_ids))] = 0
+        
+        candidates = np.flatnonzero(counts)
+        ilac_ids = self.fusion_ilac_ids[candidates]
+        scores = totals[candidates] / counts[candidates]
+        return ilac_ids, scores
+    
+    def _format_recommendations(self, ilac_ids, scores, rng=None):
+        """
+        Aday ilaçlar ve birleşik skorlarından en iyi MAX_RECOMMENDATIONS öneriyi oluştur
+        (tam sıralama yerine argpartition). Keşif modunda (rng verilirse) seçilen öneriler
+        değiştirilmiş skorlarıyla yeniden sıralanır.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        top = top_k_indices(scores, MAX_RECOMMENDATIONS)
+        ilac_ids, scores = np.asarray(ilac_ids)[top], scores[top]
+        
+        if rng is not None:
+            scores = self._apply_exploration(ilac_ids, scores, rng)
+            order = np.argsort(-scores, kind="stable")
+            ilac_ids, scores = ilac_ids[order], scores[order]
+        
         recommendations = []
-        for ilac_id, score in sorted_scores[:5]:
+        for ilac_id, score in zip(ilac_ids.tolist(), scores.tolist()):
             ilac_adi = self.ilac_lookup.get(ilac_id, f"İlaç_{ilac_id}")
             
             # Etken maddeleri al
@@ -1972,7 +3643,7 @@ class HybridDrugRecommender:
                 "etken_maddeler": etken_maddeler
             })
         
-        return {"recommendations": recommendations}
+        return recommendations
     
     def _get_active_substance_recommendations(self, etken_madde_ids):
         """
@@ -1982,28 +3653,27 @@ class HybridDrugRecommender:
             etken_madde_ids: Hedef etken madde ID'leri
             
         Returns:
-            recommendations: İlaç ID'leri ve skorları sözlüğü
+            recommendations: fusion_ilac_ids ile hizalı skor vektörü; aday yoksa None
         """
         # Hedef etken maddeleri set'e çevir
         target_set = set(etken_madde_ids)
         
-        # Her ilaç için benzerlik skoru hesapla
-        scores = {}
-        for ilac_id, etken_madde_list in self.ilac_etken_vectors.items():
-            ilac_set = set(etken_madde_list)
-            
-            # Jaccard benzerliği hesapla
-            intersection = len(target_set.intersection(ilac_set))
-            union = len(target_set.union(ilac_set))
-            
-            if union > 0:
-                similarity = intersection / union
-            else:
-                similarity = 0
-            
-            scores[ilac_id] = similarity
+        if self.etken_ilac_index is None:
+            self._build_active_substance_index()
+        
+        # Aday ilaçlar: hedef etken maddelerin ters indeks listeleri. Bir ilacın listelerde
+        # kaç kez geçtiği, hedefle ortak etken madde sayısıdır (|A ∩ B|). Diğer ilaçların
+        # benzerliği 0'dır ve skorlanmaz.
+        postings = [self.etken_ilac_index.row(etken_id)[0] for etken_id in target_set if etken_id in self.etken_ilac_index]
+        if not postings:
+            return None
+        ilac_ids, intersection = np.unique(np.concatenate(postings), return_counts=True)
         
-        return scores
+        # Jaccard benzerliği: |A ∩ B| / (|A| + |B| - |A ∩ B|)
+        cardinality = self.ilac_etken_cardinality[np.searchsorted(self.ilac_ids, ilac_ids)]
+        similarity = intersection / (cardinality + len(target_set) - intersection)
+        
+        return self._dense_scores(ilac_ids, similarity)
     
     def _get_disease_drug_recommendations(self, hastalik_id):
         """
@@ -2013,13 +3683,41 @@ class HybridDrugRecommender:
             hastalik_id: Hastalık ID'si
             
         Returns:
-            recommendations: İlaç ID'leri ve skorları sözlüğü
+            recommendations: fusion_ilac_ids ile hizalı skor vektörü; kayıtlı ilişki yoksa None
         """
         # Hastalık için ilaç skorlarını al
-        if hastalik_id in self.hastalik_ilac_scores:
-            return self.hastalik_ilac_scores[hastalik_id]
-        else:
-            return {}  # Bu hastalık için kayıtlı ilişki yok
+        ilac_ids, scores = self.hastalik_ilac_scores.row(hastalik_id)
+        if not len(ilac_ids):
+            return None  # Bu hastalık için kayıtlı ilişki yok
+        return self._dense_scores(ilac_ids, scores)
+    
+    def _patient_profiles(self, hasta_demografik_list):
+        """
+        Demografik bilgileri hasta modelinin eğitimdeki profil biçimine çevirir
+        (patient_profile_frame, eğitim medyanlarıyla)
+        
+        Returns:
+            list: Her hasta için PATIENT_MODEL_FEATURES sırasıyla [cinsiyet, yas, vki]; demografik
+            bilgi yoksa veya hasta modeli eğitilmemişse None
+        """
+        profiles = [None] * len(hasta_demografik_list)
+        present = [i for i, demografik in enumerate(hasta_demografik_list) if demografik and isinstance(demografik, dict)]
+        if not self.hasta_model or not present:
+            return profiles
+        
+        profil, _ = patient_profile_frame(
+            pd.DataFrame.from_records([hasta_demografik_list[i] for i in present]),
+            self.patient_feature_medians or {}
+        )
+        for i, (cinsiyet, yas, vki) in zip(present, profil.itertuples(index=False)):
+            profiles[i] = [cinsiyet, float(yas), float(vki)]
+        return profiles
+    
+    def _query_profile(self, query):
+        """Sorgunun hasta profili: predict_batch'in eklediği 'hasta_profil', yoksa demografik bilgiden"""
+        if "hasta_profil" in query:
+            return query["hasta_profil"]
+        return self._patient_profiles([query.get("hasta_demografik")])[0]
     
     def _get_patient_features_recommendations(self, hasta_demografik, hastalik_id=None):
         """
@@ -2030,89 +3728,241 @@ class HybridDrugRecommender:
             hastalik_id: Hastalık ID'si (opsiyonel)
             
         Returns:
-            recommendations: İlaç ID'leri ve skorları sözlüğü
+            recommendations: fusion_ilac_ids ile hizalı skor vektörü; tahmin yapılamazsa None
         """
-        # Hasta modelimiz yoksa boş sözlük döndür
-        if not self.hasta_model:
-            return {}
+        return self._get_patient_features_recommendations_batch([hasta_demografik], [hastalik_id])[0]
+    
+    def _get_patient_features_recommendations_batch(self, hasta_demografik_list, hastalik_ids):
+        """
+        Birden fazla hasta için hasta özellikleri tabanlı öneriler (tek predict_proba çağrısı)
         
-        # Test verisi oluştur
-        test_data = {
-            'hasta_id': [hasta_demografik.get('hasta_id', 0)],
-            'hastalik_id': [hastalik_id] if hastalik_id else [0],
-            'yas': [hasta_demografik.get('yas', 0)],
-            'cinsiyet': [hasta_demografik.get('cinsiyet', 'bilinmiyor')],
-            'vki': [hasta_demografik.get('vki', 0)]
-        }
+        Args:
+            hasta_demografik_list: Hasta demografik bilgileri listesi
+            hastalik_ids: Her hasta için hastalık ID'si (hasta profili modeli hastalık kullanmaz; arayüz uyumluluğu için)
+            
+        Returns:
+            list: Her hasta için fusion_ilac_ids ile hizalı skor vektörü (tahmin yapılamazsa None)
+        """
+        profiles = self._patient_profiles(hasta_demografik_list)
+        positions = [i for i, profile in enumerate(profiles) if profile is not None]
+        recommendations = [None] * len(profiles)
+        for i, vector in zip(positions, self._predict_patient_profiles([profiles[i] for i in positions])):
+            recommendations[i] = vector
+        return recommendations
+    
+    def _predict_patient_profiles(self, profiles):
+        """
+        Hasta profillerini (_patient_profiles) hasta modeliyle skorlar
+        
+        Returns:
+            list: Her profil için fusion_ilac_ids ile hizalı skor vektörü (tahmin yapılamazsa None)
+        """
+        if not self.hasta_model or not profiles:
+            return [None for _ in profiles]
+        if self.fusion_ilac_ids is None:
+            self._build_fusion_index()
+        
+        # Test verisi oluştur - her hasta için bir satır, eğitimdeki profil özellikleriyle
+        test_df = pd.DataFrame(profiles, columns=PATIENT_MODEL_FEATURES)
+        
+        positions = self.fusion_hasta_positions
         
-        # Test verisi DataFrame'i oluştur
-        test_df = pd.DataFrame(test_data)
+        def dense(row):
+            vector = np.full(len(self.fusion_ilac_ids), np.nan)
+            vector[positions] = row
+            return vector
         
         try:
             # Olasılık tahminlerini al
             proba = self.hasta_model.predict_proba(test_df)
-            classes = self.hasta_model.classes_
-            
-            # İlaç ID'leri ve olasılıkları eşleştir
-            recommendations = {}
-            for idx, ilac_id in enumerate(classes):
-                recommendations[ilac_id] = proba[0][idx]
-            
-            return recommendations
-        except:
-            # Tahmin yapılamazsa boş sözlük döndür
-            return {}
+            return [dense(row) for row in proba]
+        except Exception:
+            pass
+        
+        # Toplu tahmin yapılamazsa satırları tek tek dene, başarısız olanlar için None döndür
+        recommendations = []
+        for i in range(len(test_df)):
+            try:
+                recommendations.append(dense(self.hasta_model.predict_proba(test_df.iloc[[i]])[0]))
+            except Exception:
+                recommendations.append(None)
+        return recommendations
     
-    def save_model(self, path='improved_drug_recommender.joblib'):
+    def save_model(self, path=None):
         """
         Modeli kaydet
         
         Args:
-            path: Kayıt yolu
+            path: Kayıt klasörü (varsayılan RECOMMENDER_MODEL_PATH); .joblib ile biterse
+                eski tek dosyalık biçimde kaydedilir
         """
         import joblib
         
+        path = path or RECOMMENDER_MODEL_PATH
+        if not path.endswith('.joblib'):
+            version = self._save_artifact(path)
+            print(f"Model kaydedildi: {path} (Sürüm: {version})")
+            return
+        
         model_data = {
             'ilac_lookup': self.ilac_lookup,
             'etken_madde_lookup': self.etken_madde_lookup,
             'ilac_etken_vectors': self.ilac_etken_vectors,
             'hastalik_ilac_scores': self.hastalik_ilac_scores,
+            'hastalik_topk': self.hastalik_topk,
             'hasta_model': self.hasta_model,
             'encoder': self.encoder,
             'scaler': self.scaler,
             'model_version': self.model_version,
-            'feature_importances': self.feature_importances
+            'feature_importances': self.feature_importances,
+            'patient_feature_medians': self.patient_feature_medians
         }
         
-        joblib.dump(model_data, path)
+        # Önce geçici dosyaya yaz, sonra tek adımda yer değiştir (yarım dosya okunmaz)
+        tmp_path = f"{path}.tmp"
+        joblib.dump(model_data, tmp_path)
+        os.replace(tmp_path, path)
         print(f"Model kaydedildi: {path}")
+    
+    def _save_artifact(self, directory):
+        """
+        Modeli sürümlü kayıt klasörüne yazar: CSR indeksleri ve skor tabloları .npy,
+        diğer nesneler joblib olarak. Sürüm önce geçici klasöre yazılır,
+        ardından CURRENT dosyası os.replace ile tek adımda yeni sürümü gösterir.
+        
+        Returns:
+            version: Yazılan sürümün adı
+        """
+        import joblib
+        import shutil
+        
+        if self.hastalik_topk is None:
+            self._build_disease_topk()
+        
+        os.makedirs(directory, exist_ok=True)
+        version = f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        tmp_dir = os.path.join(directory, f".{version}.tmp")
+        os.makedirs(tmp_dir)
         
-    def load_model(self, path='improved_drug_recommender.joblib'):
+        # Sayısal diziler (yüklemede bellek eşlemeli açılır)
+        self.ilac_etken_vectors.save_arrays(tmp_dir, "ilac_etken_vectors")
+        self.etken_ilac_index.save_arrays(tmp_dir, "etken_ilac_index")
+        self.hastalik_ilac_scores.save_arrays(tmp_dir, "hastalik_ilac_scores")
+        self.hastalik_topk.save_arrays(tmp_dir, "hastalik_topk")
+        
+        # Hasta özellikleri modeli ayrı dosyada; küçük Python nesneleri meta dosyasında
+        joblib.dump(self.hasta_model, os.path.join(tmp_dir, "hasta_model.joblib"))
+        joblib.dump({
+            'ilac_lookup': self.ilac_lookup,
+            'etken_madde_lookup': self.etken_madde_lookup,
+            'encoder': self.encoder,
+            'scaler': self.scaler,
+            'feature_importances': self.feature_importances,
+            'patient_feature_medians': self.patient_feature_medians
+        }, os.path.join(tmp_dir, "meta.joblib"))
+        
+        manifest = {
+            "format": 1,
+            "model_version": self.model_version,
+            "created_at": datetime.datetime.now().isoformat(),
+            "data_fingerprint": self.data_fingerprint
+        }
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        
+        # Sürümü yayınla
+        os.rename(tmp_dir, os.path.join(directory, version))
+        current_tmp = os.path.join(directory, "CURRENT.tmp")
+        with open(current_tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(current_tmp, os.path.join(directory, "CURRENT"))
+        self.artifact_version = version
+        self.fingerprint = version
+        
+        # Eski sürümleri temizle (açık bellek eşlemeleri silinen dosyalarla çalışmaya devam eder)
+        versions = sorted(
+            (name for name in os.listdir(directory)
+             if not name.startswith(".") and name != version and os.path.isdir(os.path.join(directory, name))),
+            key=lambda name: os.path.getmtime(os.path.join(directory, name))
+        )
+        for old_version in versions[:max(0, len(versions) - RECOMMENDER_ARTIFACT_KEEP + 1)]:
+            shutil.rmtree(os.path.join(directory, old_version), ignore_errors=True)
+        
+        return version
+    
+    def _load_artifact(self, directory):
+        """
+        CURRENT dosyasının gösterdiği sürümü yükler. Sayısal diziler mmap_mode='r' ile
+        açılır; hasta modeli (orman) her süreçte belleğe ayrı yüklenir.
+        """
+        import joblib
+        
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as f:
+            version = f.read().strip()
+        version_dir = os.path.join(directory, version)
+        with open(os.path.join(version_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        meta = joblib.load(os.path.join(version_dir, "meta.joblib"))
+        
+        self.ilac_etken_vectors = CSRIndex.load_arrays(version_dir, "ilac_etken_vectors")
+        self.etken_ilac_index = CSRIndex.load_arrays(version_dir, "etken_ilac_index")
+        self.hastalik_ilac_scores = CSRIndex.load_arrays(version_dir, "hastalik_ilac_scores")
+        self.hastalik_topk = CSRIndex.load_arrays(version_dir, "hastalik_topk")
+        self.ilac_ids = self.ilac_etken_vectors.keys_array
+        self.ilac_etken_cardinality = self.ilac_etken_vectors.distinct_counts()
+        
+        # Ağaç düğümleri sklearn tarafından kopyalandığından mmap_mode burada bellek paylaştırmaz
+        self.hasta_model = joblib.load(os.path.join(version_dir, "hasta_model.joblib"))
+        self.ilac_lookup = meta.get('ilac_lookup', {})
+        self.etken_madde_lookup = meta.get('etken_madde_lookup', {})
+        self.encoder = meta.get('encoder')
+        self.scaler = meta.get('scaler')
+        self.feature_importances = meta.get('feature_importances')
+        self.patient_feature_medians = meta.get('patient_feature_medians')
+        self.model_version = manifest.get('model_version', '2.0')
+        self.data_fingerprint = manifest.get('data_fingerprint')
+        self.artifact_version = version
+        self.fingerprint = version
+        
+    def load_model(self, path=None):
         """
         Modeli yükle
         
         Args:
-            path: Yükleme yolu
+            path: Kayıt klasörü veya eski .joblib dosyası (varsayılan: resolve_recommender_path())
         """
         import joblib
         import os
         
-        if not os.path.exists(path):
+        path = path or resolve_recommender_path()
+        if not path or not os.path.exists(path):
             print(f"Model dosyası bulunamadı: {path}")
             return False
         
         try:
-            model_data = joblib.load(path)
+            if os.path.isdir(path):
+                self._load_artifact(path)
+                print(f"Model yüklendi: {path} (Versiyon: {self.model_version}, Sürüm: {self.artifact_version})")
+                return True
+            
+            # Eski tek dosyalık biçim; NumPy dizileri yine bellek eşlemeli açılır
+            model_data = joblib.load(path, mmap_mode='r')
             
             self.ilac_lookup = model_data.get('ilac_lookup', {})
             self.etken_madde_lookup = model_data.get('etken_madde_lookup', {})
             self.ilac_etken_vectors = model_data.get('ilac_etken_vectors', {})
+            self._build_active_substance_index()
             self.hastalik_ilac_scores = model_data.get('hastalik_ilac_scores', {})
+            self.hastalik_topk = model_data.get('hastalik_topk')
+            if self.hastalik_topk is None:
+                self._build_disease_topk()
             self.hasta_model = model_data.get('hasta_model')
             self.encoder = model_data.get('encoder')
             self.scaler = model_data.get('scaler')
             self.model_version = model_data.get('model_version', '2.0')
             self.feature_importances = model_data.get('feature_importances')
+            self.patient_feature_medians = model_data.get('patient_feature_medians')
+            self.fingerprint = uuid.uuid4().hex
             
             print(f"Model yüklendi: {path} (Versiyon: {self.model_version})")
             return True
@@ -2134,14 +3984,17 @@ def improved_data_preparation(data):
         Returns:
             prepared_data: Hazırlanmış veri yapıları
         """
-        # DataFrame'leri oluştur
-        ilaclar_df = pd.DataFrame(data["ilaclar"])
-        etken_maddeler_df = pd.DataFrame(data["etken_maddeler"])
-        ilac_etken_df = pd.DataFrame(data["ilac_etken_maddeler"])
-        hastaliklar_df = pd.DataFrame(data["hastaliklar"])
-        hastalar_df = pd.DataFrame(data["hastalar"])
-        hasta_hastalik_df = pd.DataFrame(data["hasta_hastaliklar"])
-        ilac_kullanim_df = pd.DataFrame(data["hasta_ilac_kullanim"])
+        # DataFrame'leri oluştur (anlık görüntü tabloları kopyalanarak kullanılır)
+        def as_frame(rows):
+            return rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        
+        ilaclar_df = as_frame(data["ilaclar"])
+        etken_maddeler_df = as_frame(data["etken_maddeler"])
+        ilac_etken_df = as_frame(data["ilac_etken_maddeler"])
+        hastaliklar_df = as_frame(data["hastaliklar"])
+        hastalar_df = as_frame(data["hastalar"])
+        hasta_hastalik_df = as_frame(data["hasta_hastaliklar"])
+        ilac_kullanim_df = as_frame(data["hasta_ilac_kullanim"])
         
         # Sütun adlarını standardize et
         column_mappings = {
@@ -2170,12 +4023,12 @@ def improved_data_preparation(data):
                 hastaliklar_df[col] = hastaliklar_df[col].fillna(hastaliklar_df[col].mode()[0])
         
         # İlaç-etken madde matrisi oluştur (one-hot encoding yerine)
-        ilac_etken_matrix = pd.pivot_table(
-            ilac_etken_df, 
-            values='etken_madde_id', 
-            index='ilac_id',
-            aggfunc=lambda x: list(x)
-        ).reset_index()
+        ilac_etken_matrix = (
+            ilac_etken_df.dropna(subset=['ilac_id', 'etken_madde_id'])
+            .groupby('ilac_id')['etken_madde_id']
+            .agg(list)
+            .reset_index()
+        )
         
         # İlaç-hastalık ilişkisi matrisi
         # Önce hasta-hastalık ve hasta-ilaç verilerini birleştir
@@ -2190,13 +4043,10 @@ def improved_data_preparation(data):
         hastalik_ilac_normalized = hastalik_ilac_matrix.copy()
         
         # Her hastalık için ilaç kullanım sayılarını normalize et (0-1 arası)
-        for hastalik_id in hastalik_ilac_matrix['hastalik_id'].unique():
-            mask = hastalik_ilac_matrix['hastalik_id'] == hastalik_id
-            max_count = hastalik_ilac_matrix.loc[mask, 'count'].max()
-            if max_count > 0:  # Sıfıra bölme hatasını önle
-                hastalik_ilac_normalized.loc[mask, 'normalized_count'] = hastalik_ilac_matrix.loc[mask, 'count'] / max_count
-            else:
-                hastalik_ilac_normalized.loc[mask, 'normalized_count'] = 0
+        max_count = hastalik_ilac_matrix.groupby('hastalik_id')['count'].transform('max')
+        hastalik_ilac_normalized['normalized_count'] = (
+            hastalik_ilac_matrix['count'] / max_count.where(max_count > 0)  # Sıfıra bölme hatasını önle
+        ).fillna(0)
         
         # Hazırlanmış verileri döndür
         prepared_data = {
@@ -2205,6 +4055,7 @@ def improved_data_preparation(data):
             'ilac_etken_matrix': ilac_etken_matrix,
             'hastaliklar': hastaliklar_df,
             'hastalar': hastalar_df,
+            'hasta_ilac_kullanim': ilac_kullanim_df,
             'hastalik_ilac_matrix': hastalik_ilac_normalized
         }
         
@@ -2216,10 +4067,326 @@ ilac_oneri_model = IlacOneriModel()
 
 drug_recommender = HybridDrugRecommender()
 
+# Servis edilen model yalnızca bu kilit altında ve tek atamayla değiştirilir; istekler
+# başlangıçta aldıkları model referansıyla çalışır, eğitim sürerken eski model hizmet verir
+recommender_lock = threading.Lock()
+recommender_checked_at = 0.0  # CURRENT dosyasının son kontrol zamanı (time.monotonic)
+
+# Arka plan eğitim işleri
+train_executor = ThreadPoolExecutor(max_workers=TRAIN_MAX_WORKERS, thread_name_prefix="egitim")
+train_jobs = {}
+train_jobs_lock = threading.Lock()
+
+def is_recommender_ready(recommender):
+    """Modelin tahmin için hazır olup olmadığını döndürür"""
+    return bool(getattr(recommender, 'ilac_lookup', None))
+
+def swap_recommender(new_recommender):
+    """Servis edilen hibrit modeli atomik olarak değiştirir ve eski modeli döndürür"""
+    global drug_recommender
+    with recommender_lock:
+        old_recommender = drug_recommender
+        drug_recommender = new_recommender
+    # Eski modelin sonuçları artık eşleşmez; anahtarda model parmak izi olduğundan paylaşılan
+    # (Redis) önbellek diğer worker'lar için silinmez, TTL ile düşer
+    if not hibrit_tahmin_cache.shared:
+        hibrit_tahmin_cache.clear()
+    return old_recommender
+
+def ensure_recommender_loaded():
+    """Hibrit model eğitilmemişse kayıtlı dosyadan yüklemeyi dener; model hazırsa True döner"""
+    global drug_recommender
+    if is_recommender_ready(drug_recommender):
+        reload_recommender_if_changed()
+        return True
+    
+    with recommender_lock:
+        # Kilidi beklerken başka bir istek modeli yüklemiş olabilir
+        if is_recommender_ready(drug_recommender):
+            return True
+        
+        # Modeli yeni bir nesneye yükle, başarılı olursa servis edilen modelle değiştir
+        model_path = resolve_recommender_path()
+        if model_path:
+            logger.info("Model yükleniyor...")
+            recommender = HybridDrugRecommender()
+            if recommender.load_model(model_path):
+                drug_recommender = recommender
+                return True
+            logger.error("Model yüklenemedi")
+            return False
+    
+    logger.warning("Hibrit model henüz eğitilmemiş")
+    return False
+
+def current_artifact_version():
+    """Kayıt klasöründe CURRENT dosyasının gösterdiği sürümü döndürür (yoksa None)"""
+    try:
+        with open(os.path.join(RECOMMENDER_MODEL_PATH, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def current_artifact_manifest():
+    """CURRENT dosyasının gösterdiği sürümün manifest.json içeriğini döndürür (yoksa None)"""
+    version = current_artifact_version()
+    if version is None:
+        return None
+    try:
+        with open(os.path.join(RECOMMENDER_MODEL_PATH, version, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def data_fingerprint(data):
+    """Eğitim verisi tablolarının içerik özeti (SHA-1); veri değişmediyse aynı kalır"""
+    digest = hashlib.sha1()
+    for key in sorted(data):
+        digest.update(key.encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(data[key], index=False).values.tobytes())
+    return digest.hexdigest()
+
+def reload_recommender_if_changed():
+    """
+    Başka bir worker süreci yeni model sürümü yayınladıysa (CURRENT değiştiyse) yeni sürümü
+    yükler ve servis edilen modelle değiştirir. Kontrol en fazla RECOMMENDER_RELOAD_INTERVAL
+    saniyede bir yapılır; yükleme sürerken diğer istekler eski modelle devam eder.
+    """
+    global drug_recommender, recommender_checked_at
+    now = time.monotonic()
+    if RECOMMENDER_RELOAD_INTERVAL <= 0 or now - recommender_checked_at < RECOMMENDER_RELOAD_INTERVAL:
+        return
+    
+    # Başka bir istek zaten kontrol ediyor veya model değiştiriliyorsa bekleme
+    if not recommender_lock.acquire(blocking=False):
+        return
+    try:
+        recommender_checked_at = now
+        version = current_artifact_version()
+        if version is None or version == drug_recommender.artifact_version:
+            return
+        
+        logger.info(f"Yeni model sürümü bulundu, yükleniyor: {version}")
+        recommender = HybridDrugRecommender()
+        if recommender.load_model(RECOMMENDER_MODEL_PATH):
+            drug_recommender = recommender
+            if not hibrit_tahmin_cache.shared:
+                hibrit_tahmin_cache.clear()
+        else:
+            logger.error(f"Yeni model sürümü yüklenemedi: {version}")
+    finally:
+        recommender_lock.release()
+
+def validate_recommender(recommender):
+    """
+    Yeni eğitilen modeli servis edilmeden önce doğrular; sorun varsa ValueError fırlatır
+    
+    Args:
+        recommender: Eğitilmiş HybridDrugRecommender
+    """
+    if not is_recommender_ready(recommender):
+        raise ValueError("Eğitilen model ilaç bilgisi içermiyor")
+    if not recommender.hastalik_ilac_scores and recommender.hasta_model is None:
+        raise ValueError("Eğitilen model hastalık-ilaç skorları veya hasta modeli içermiyor")
+    
+    # Örnek bir hastalık için uçtan uca tahmin dene
+    sample_hastalik_id = next(iter(recommender.hastalik_ilac_scores), None)
+    if sample_hastalik_id is not None:
+        result = recommender.predict(hasta_id=0, hastalik_id=sample_hastalik_id)
+        if "error" in result:
+            raise ValueError(f"Eğitilen model örnek tahminde hata verdi: {result['error']}")
+
+def persist_train_job(job):
+    """İş kaydını TRAIN_JOBS_DIR altına yazar (diğer worker süreçleri durumu buradan okur)"""
+    try:
+        os.makedirs(TRAIN_JOBS_DIR, exist_ok=True)
+        path = os.path.join(TRAIN_JOBS_DIR, f"{job['job_id']}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, default=json_default)
+        os.replace(f"{path}.tmp", path)
+    except Exception as e:
+        logger.error(f"Eğitim işi kaydı yazılamadı: {e}")
+
+def read_train_job(job_id):
+    """
+    İş kaydını TRAIN_JOBS_DIR altından okur (eğitim süreci aşamaları buraya yazar),
+    okunamazsa bellekten döndürür; bulunamazsa None
+    """
+    try:
+        uuid.UUID(hex=job_id)  # yalnızca geçerli iş ID'leri dosya yolu olarak kullanılır
+        with open(os.path.join(TRAIN_JOBS_DIR, f"{job_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        pass
+    
+    with train_jobs_lock:
+        job = train_jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+def update_train_job(job_id, **fields):
+    """Eğitim işinin durum kaydını günceller"""
+    with train_jobs_lock:
+        train_jobs[job_id].update(fields)
+        job = dict(train_jobs[job_id])
+    persist_train_job(job)
+
+def submit_train_job(params):
+    """
+    Eğitim işini kuyruğa ekler. Bekleyen veya çalışan bir iş varsa yeni iş açılmaz.
+    
+    Returns:
+        (job, created): İş kaydının kopyası ve yeni iş oluşturulup oluşturulmadığı
+    """
+    with train_jobs_lock:
+        for job in train_jobs.values():
+            if job["status"] in ("queued", "running"):
+                return dict(job), False
+        
+        job_id = uuid.uuid4().hex
+        train_jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "params": params,
+            "created_at": datetime.datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+        
+        # Eski tamamlanmış işleri unut
+        finished = [key for key, job in train_jobs.items() if job["status"] in ("success", "error")]
+        for key in finished[:max(0, len(train_jobs) - TRAIN_JOB_HISTORY)]:
+            del train_jobs[key]
+            try:
+                os.remove(os.path.join(TRAIN_JOBS_DIR, f"{key}.json"))
+            except OSError:
+                pass
+        
+        job = dict(train_jobs[job_id])
+    
+    persist_train_job(job)
+    train_executor.submit(run_train_job, job_id, params)
+    return job, True
+
+def run_train_job(job_id, params):
+    """
+    Arka planda eğitim sürecini başlatır ve bekler; süreç veriyi çeker, yeni bir hibrit
+    model eğitir, doğrular ve yeni sürüm olarak yayınlar. Ardından bu worker yeni sürümü
+    yükler. Hata olursa servis edilen model değişmez.
+    Aynı makinedeki worker süreçlerinin eğitimleri dosya kilidiyle sıraya girer.
+    """
+    os.makedirs(TRAIN_JOBS_DIR, exist_ok=True)
+    with open(os.path.join(TRAIN_JOBS_DIR, "egitim.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            train_and_swap(job_id, params)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def train_and_swap(job_id, params):
+    """run_train_job'un kilit altında çalışan adımları: eğitim süreci ve yeni sürümün yüklenmesi"""
+    update_train_job(job_id, status="running", stage="veri_cekme", started_at=datetime.datetime.now().isoformat())
+    logger.info(f"Eğitim işi başladı: {job_id} {params}")
+    
+    try:
+        # Her iş için yeni süreç: eğitimin belleği iş bitince işletim sistemine geri döner
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            result = pool.submit(train_recommender_artifact, read_train_job(job_id), params).result()
+        
+        # Yayınlanan sürümü bu worker'da hemen yükle (diğerleri CURRENT kontrolüyle yükler)
+        if result.get("published"):
+            recommender = HybridDrugRecommender()
+            if not recommender.load_model(RECOMMENDER_MODEL_PATH):
+                raise RuntimeError("Yayınlanan model sürümü yüklenemedi")
+            swap_recommender(recommender)
+        else:
+            ensure_recommender_loaded()
+        
+        update_train_job(
+            job_id,
+            status="success",
+            stage=None,
+            finished_at=datetime.datetime.now().isoformat(),
+            message=result["message"],
+            model_info=result["model_info"]
+        )
+        logger.info(f"Eğitim işi tamamlandı: {job_id}")
+    except Exception as e:
+        logger.error(f"Model eğitimi sırasında hata: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        update_train_job(job_id, status="error", stage=None, finished_at=datetime.datetime.now().isoformat(), message=str(e))
+
+def train_recommender_artifact(job, params):
+    """
+    Ayrı eğitim sürecinde çalışır: veriyi çeker, yeni bir hibrit model eğitir, doğrular ve
+    RECOMMENDER_MODEL_PATH altına yeni sürüm olarak yayınlar. force_retrain verilmemişse ve
+    veri yayınlanan sürümü eğiten veriyle aynıysa eğitim atlanır. Aşamalar iş kaydına yazılır.
+    
+    Args:
+        job: İş kaydı (aşama güncellemeleri bu kayıt üzerinden dosyaya yazılır)
+        params: /train parametreleri (force_retrain, full_sync, use_snapshot)
+        
+    Returns:
+        dict: published (yeni sürüm yayınlandı mı), message ve model_info
+    """
+    def set_stage(stage):
+        job["stage"] = stage
+        persist_train_job(job)
+    
+    # Verileri çek (yerel anlık görüntü varsa yalnızca değişenler)
+    data = ilac_oneri_model.sync_data(full=params["full_sync"], use_snapshot=params["use_snapshot"])
+    if ilac_oneri_model.last_fetch_errors:
+        raise RuntimeError(f"Veri kümeleri eksik çekildi, eğitim yapılmadı: {sorted(ilac_oneri_model.last_fetch_errors)}")
+    
+    fingerprint = data_fingerprint(data)
+    manifest = current_artifact_manifest()
+    if not params.get("force_retrain") and manifest and manifest.get("data_fingerprint") == fingerprint:
+        logger.info("Eğitim verisi değişmedi, yayınlanan model korunuyor")
+        return {
+            "published": False,
+            "message": "Veri değişmedi, mevcut model güncel (yeniden eğitmek için force_retrain=true)",
+            "model_info": {"version": manifest.get("model_version"), "artifact_version": current_artifact_version()}
+        }
+    
+    # Verileri hazırla
+    set_stage("veri_hazirlama")
+    prepared_data = improved_data_preparation(data)
+    
+    # Yeni modeli eğit
+    set_stage("egitim")
+    recommender = HybridDrugRecommender()
+    recommender.fit(prepared_data)
+    recommender.data_fingerprint = fingerprint
+    
+    # Doğrula ve yayınla
+    set_stage("dogrulama")
+    validate_recommender(recommender)
+    recommender.save_model(RECOMMENDER_MODEL_PATH)
+    
+    return {
+        "published": True,
+        "message": "Model başarıyla eğitildi" if manifest is None else "Model başarıyla güncellendi",
+        "model_info": {
+            "version": recommender.model_version,
+            "artifact_version": recommender.artifact_version,
+            "ilac_count": len(recommender.ilac_lookup),
+            "etken_madde_count": len(recommender.etken_madde_lookup),
+            "hastalik_count": len(recommender.hastalik_ilac_scores)
+        }
+    }
+
+def json_default(value):
+    """NumPy skalerlerini JSON'a uygun Python tiplerine çevirir"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"JSON'a çevrilemeyen tip: {type(value)}")
+
 @app.route("/")
 def index():
     """API ana sayfası"""
-    model_status = "trained" if ilac_oneri_model.model is not None else "not_trained"
+    model_status = "trained" if ilac_oneri_model.model is not None or os.path.exists(ilac_oneri_model.model_path) else "not_trained"
     
     return jsonify({
         "status": "running",
@@ -2227,9 +4394,14 @@ def index():
         "description": "İlaç Öneri Sistemi API",
         "version": ilac_oneri_model.model_version,
         "endpoints": [
-            {"path": "/train", "method": "POST", "description": "Modeli eğit (force_retrain parametresi opsiyonel)"},
+            {"path": "/train", "method": "POST", "description": "Arka planda model eğitimi başlat, iş ID'si döner (force_retrain: veri değişmese de yeniden eğit; full_sync ve use_snapshot opsiyonel)"},
+            {"path": "/train/status/{job_id}", "method": "GET", "description": "Eğitim işinin durumunu göster"},
             {"path": "/predict", "method": "POST", "description": "İlaç tahmini yap (hasta_id, hastalik_id veya etken_madde_ids gerekli)"},
+            {"path": "/predict/batch", "method": "POST", "description": "Toplu ilaç tahmini yap (queries listesi, NDJSON akışı döner)"},
             {"path": "/model-info", "method": "GET", "description": "Model bilgilerini göster"},
+            {"path": "/ready", "method": "GET", "description": "Hazır olma yoklaması (model yüklüyse 200, değilse 503)"},
+            {"path": "/cache/stats", "method": "GET", "description": "Önbellek istatistiklerini göster"},
+            {"path": "/cache/prefetch", "method": "POST", "description": "Hasta demografik önbelleğini önceden doldur (hasta_ids listesi)"},
             {"path": "/ilac-info/{ilac_id}", "method": "GET", "description": "İlaç bilgilerini göster"},
             {"path": "/etken-maddeler", "method": "GET", "description": "Tüm etken maddeleri listele"}
         ]
@@ -2237,39 +4409,29 @@ def index():
 
 @app.route("/train", methods=["POST"])
 def train_model():
-    """Model eğitimi endpoint'i"""
+    """Model eğitimi endpoint'i - eğitimi arka planda başlatır, iş ID'si döner"""
     try:
         force_retrain = request.json.get("force_retrain", False) if request.is_json else False
-        logger.info(f"Model eğitimi isteği alındı. force_retrain={force_retrain}")
-        
-        # Eğitim öncesi durum kontrolü
-        model_existed = hasattr(drug_recommender, 'ilac_lookup') and bool(drug_recommender.ilac_lookup)
-        
-        # Verileri çek
-        data = ilac_oneri_model.fetch_data()
-        
-        # Verileri hazırla
-        prepared_data = improved_data_preparation(data)
-        
-        # Modeli eğit
-        drug_recommender.fit(prepared_data)
-        
-        # Modeli kaydet
-        drug_recommender.save_model()
-        
-        # Eğitim sonucunu hazırla
-        return jsonify({
-            "status": "success",
-            "message": "Model başarıyla eğitildi" if not model_existed else "Model başarıyla güncellendi",
-            "model_info": {
-                "version": drug_recommender.model_version,
-                "ilac_count": len(drug_recommender.ilac_lookup),
-                "etken_madde_count": len(drug_recommender.etken_madde_lookup),
-                "hastalik_count": len(drug_recommender.hastalik_ilac_scores)
-            }
+        full_sync = request.json.get("full_sync", False) if request.is_json else False
+        use_snapshot = request.json.get("use_snapshot", False) if request.is_json else False
+        logger.info(f"Model eğitimi isteği alındı. force_retrain={force_retrain}, full_sync={full_sync}, use_snapshot={use_snapshot}")
+        
+        job, created = submit_train_job({
+            "force_retrain": force_retrain,
+            "full_sync": full_sync,
+            "use_snapshot": use_snapshot
         })
+        
+        response = {
+            "status": "accepted" if created else "already_running",
+            "message": "Model eğitimi arka planda başlatıldı" if created else "Devam eden bir eğitim işi var",
+            "job_id": job["job_id"],
+            "job_status": job["status"],
+            "status_url": f"/train/status/{job['job_id']}"
+        }
+        return jsonify(response), 202 if created else 409
     except Exception as e:
-        logger.error(f"Model eğitimi sırasında hata: {e}")
+        logger.error(f"Model eğitimi başlatılırken hata: {e}")
         import traceback
         logger.error(traceback.format_exc())
         return jsonify({
@@ -2277,6 +4439,16 @@ def train_model():
             "message": str(e)
         }), 500
 
+@app.route("/train/status/<job_id>", methods=["GET"])
+def train_status(job_id):
+    """Eğitim işinin durumunu gösteren endpoint"""
+    job = read_train_job(job_id)
+    
+    if job is None:
+        return jsonify({"status": "error", "message": "Eğitim işi bulunamadı"}), 404
+    
+    return jsonify(job)
+
 @app.route("/predict", methods=["POST"])
 def predict():
     """İlaç tahmin endpoint'i"""
@@ -2303,18 +4475,19 @@ def predict():
     if not hastalik_id and not etken_madde_ids:
         return jsonify({"error": "Hastalık ID veya Etken Madde ID'leri gerekli"}), 400
     
+    try:
+        etken_madde_ids = normalize_id_list(etken_madde_ids)
+        exclude_ilac_ids = normalize_id_list(exclude_ilac_ids)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     # Model varlığını kontrol et
-    if not hasattr(drug_recommender, 'ilac_lookup') or not drug_recommender.ilac_lookup:
-        # Modeli yüklemeyi dene
-        if os.path.exists('improved_drug_recommender.joblib'):
-            logger.info("Model yükleniyor...")
-            drug_recommender.load_model()
-        else:
-            logger.warning("Tahmin isteği geldi ama model eğitilmemiş")
-            return jsonify({"error": "Model henüz eğitilmemiş. Lütfen önce /train endpoint'ini kullanın."}), 400
+    if not ensure_recommender_loaded():
+        return jsonify({"error": "Model henüz eğitilmemiş. Lütfen önce /train endpoint'ini kullanın."}), 400
     
     # Tahmin yap
-    result = drug_recommender.predict(
+    recommender = drug_recommender
+    result = recommender.predict(
         hasta_id=hasta_id, 
         hastalik_id=hastalik_id, 
         etken_madde_ids=etken_madde_ids,
@@ -2333,30 +4506,157 @@ def predict():
     
     return jsonify(result)
 
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Toplu ilaç tahmin endpoint'i
+    
+    Gövde: {"queries": [{hasta_id, hastalik_id, etken_madde_ids, exclude_ilac_ids, hasta_demografik}, ...]}
+    Yanıt: Her sorgu için bir satır JSON (application/x-ndjson), sorgu sırasıyla akış halinde
+    """
+    start_time = datetime.datetime.now()
+    
+    if not request.is_json:
+        return jsonify({"error": "JSON verisi gerekli"}), 400
+    
+    queries = request.json.get("queries")
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "queries listesi gerekli"}), 400
+    
+    if len(queries) > PREDICT_BATCH_MAX_SIZE:
+        return jsonify({"error": f"Bir istekte en fazla {PREDICT_BATCH_MAX_SIZE} sorgu gönderilebilir"}), 400
+    
+    # Model varlığını kontrol et
+    if not ensure_recommender_loaded():
+        return jsonify({"error": "Model henüz eğitilmemiş. Lütfen önce /train endpoint'ini kullanın."}), 400
+    
+    logger.info(f"Toplu tahmin isteği: {len(queries)} sorgu")
+    
+    # Parametre doğrulama - geçersiz sorgular hata satırı olarak döner
+    errors = {}
+    valid_queries = []
+    for index, query in enumerate(queries):
+        if not isinstance(query, dict) or not query.get("hasta_id"):
+            errors[index] = "Hasta ID gerekli"
+            continue
+        hasta_demografik = query.get("hasta_demografik") or {}
+        if not isinstance(hasta_demografik, dict):
+            errors[index] = "hasta_demografik bir nesne olmalı"
+            continue
+        try:
+            valid_queries.append({
+                "hasta_id": query.get("hasta_id"),
+                "hastalik_id": query.get("hastalik_id"),
+                "etken_madde_ids": normalize_id_list(query.get("etken_madde_ids")),
+                "exclude_ilac_ids": normalize_id_list(query.get("exclude_ilac_ids")),
+                "hasta_demografik": hasta_demografik
+            })
+        except ValueError as e:
+            errors[index] = str(e)
+    
+    # Akış boyunca aynı model kullanılır (arada model değişse bile)
+    recommender = drug_recommender
+    
+    def generate():
+        results = recommender.predict_batch(valid_queries)
+        for index, query in enumerate(queries):
+            if index in errors:
+                line = {"index": index, "error": errors[index]}
+            else:
+                # Yanıt başlıkları gönderildikten sonra hata akışı kesmemeli
+                try:
+                    result = next(results)
+                except Exception as e:
+                    logger.error(f"Toplu tahmin sorgusu başarısız (index {index}): {e}")
+                    result = {"error": "Tahmin yapılamadı"}
+                line = {"index": index, "hasta_id": query.get("hasta_id"), **result}
+            yield json.dumps(line, ensure_ascii=False, default=json_default) + "\n"
+        
+        duration = (datetime.datetime.now() - start_time).total_seconds()
+        logger.info(f"Toplu tahmin tamamlandı: {len(queries)} sorgu, {duration:.2f} saniye")
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
 @app.route("/model-info", methods=["GET"])
 def model_info():
-    """Model bilgilerini gösteren endpoint"""
-    if not hasattr(drug_recommender, 'ilac_lookup') or not drug_recommender.ilac_lookup:
+    """Model bilgilerini gösteren endpoint (model gerekirse ilk çağrıda yüklenir)"""
+    if not ensure_recommender_loaded():
         return jsonify({
             "status": "not_trained",
             "message": "Model henüz eğitilmemiş"
         })
     
     # İstatistikleri hazırla
+    recommender = drug_recommender
     model_stats = {
         "status": "trained",
-        "version": drug_recommender.model_version,
-        "total_ilaclar": len(drug_recommender.ilac_lookup),
-        "total_etken_maddeler": len(drug_recommender.etken_madde_lookup),
-        "total_hastaliklar": len(drug_recommender.hastalik_ilac_scores)
+        "version": recommender.model_version,
+        "artifact_version": recommender.artifact_version,
+        "fusion_weights": list(recommender.fusion_weights),
+        "exploration_rate": recommender.exploration_rate,
+        "total_ilaclar": len(recommender.ilac_lookup),
+        "total_etken_maddeler": len(recommender.etken_madde_lookup),
+        "total_hastaliklar": len(recommender.hastalik_ilac_scores)
     }
     
     return jsonify(model_stats)
 
 
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    """Önbelleklerin boyut ve isabet/ıska istatistiklerini gösteren endpoint"""
+    return jsonify({"caches": [cache.stats() for cache in caches.values()]})
+
+@app.route("/cache/prefetch", methods=["POST"])
+def cache_prefetch():
+    """
+    Hasta demografik önbelleğini önceden doldurur
+    
+    Gövde: {"hasta_ids": [...]} - önbellekte olmayan hastalar API'den eşzamanlı çekilir
+    """
+    if not request.is_json:
+        return jsonify({"error": "JSON verisi gerekli"}), 400
+    
+    hasta_ids = request.json.get("hasta_ids")
+    if not isinstance(hasta_ids, list) or not hasta_ids:
+        return jsonify({"error": "hasta_ids listesi gerekli"}), 400
+    
+    if len(hasta_ids) > PREDICT_BATCH_MAX_SIZE:
+        return jsonify({"error": f"Bir istekte en fazla {PREDICT_BATCH_MAX_SIZE} hasta gönderilebilir"}), 400
+    
+    start_time = datetime.datetime.now()
+    demografikler = ilac_oneri_model.get_hasta_demografik_bilgileri_toplu(hasta_ids)
+    duration = (datetime.datetime.now() - start_time).total_seconds()
+    logger.info(f"Önbellek ön doldurma: {len(demografikler)} hasta, {duration:.2f} saniye")
+    
+    return jsonify({
+        "status": "success",
+        "hasta_count": len(demografikler),
+        "duration": duration
+    })
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Hazır olma yoklaması: hibrit model yüklüyse (gerekirse ilk çağrıda yüklenir) 200, değilse 503"""
+    if not ensure_recommender_loaded():
+        return jsonify({
+            "status": "not_ready",
+            "message": "Model henüz eğitilmemiş"
+        }), 503
+    
+    recommender = drug_recommender
+    return jsonify({
+        "status": "ready",
+        "version": recommender.model_version,
+        "artifact_version": recommender.artifact_version
+    })
+
+
 @app.route("/ilac-info/<int:ilac_id>", methods=["GET"])
 def ilac_info(ilac_id):
     """Belirli bir ilacın bilgilerini gösteren endpoint"""
+    ilac_oneri_model.ensure_model_loaded()
+    
     # İlaç adını lookup tablosundan al
     ilac_adi = ilac_oneri_model.ilac_lookup.get(ilac_id)
     
@@ -2377,19 +4677,17 @@ def ilac_info(ilac_id):
         "etken_maddeler": etken_maddeler
     }
     
-    # İlaç API'den bilgi çek (opsiyonel)
+    # İlaç API'den bilgi çek (opsiyonel; API yavaşsa veya devre açıksa yerel bilgilerle yanıt verilir)
     try:
-        response = requests.get(f"{API_BASE_URL}/ilaclar/{ilac_id}")
-        if response.status_code == 200:
-            api_data = response.json().get('data', {}) if isinstance(response.json(), dict) else response.json()
-            
-            # API'den gelen ilac bilgilerini ekle
-            if isinstance(api_data, dict):
-                for key, value in api_data.items():
-                    if key not in ilac_info and key != "etken_maddeler":
-                        ilac_info[key] = value
-    except:
-        pass
+        api_data = laravel_client.get_json(f"/ilaclar/{ilac_id}")
+        
+        # API'den gelen ilac bilgilerini ekle
+        if isinstance(api_data, dict):
+            for key, value in api_data.items():
+                if key not in ilac_info and key != "etken_maddeler":
+                    ilac_info[key] = value
+    except Exception as e:
+        logger.warning(f"İlaç {ilac_id} bilgileri API'den alınamadı: {e}")
     
     return jsonify(ilac_info)
 
@@ -2397,6 +4695,7 @@ def ilac_info(ilac_id):
 def list_etken_maddeler():
     """Tüm etken maddeleri listeleyen endpoint"""
     etken_maddeler = []
+    ilac_oneri_model.ensure_model_loaded()
     
     for etken_id, etken_adi in ilac_oneri_model.etken_madde_lookup.items():
         etken_maddeler.append({
@@ -2415,7 +4714,7 @@ def not_found(e):
     return jsonify({
         "status": "error",
         "message": "İstenen endpoint bulunamadı",
-        "available_endpoints": ["/", "/train", "/predict", "/model-info", "/ilac-info/{ilac_id}", "/etken-maddeler"]
+        "available_endpoints": ["/", "/train", "/train/status/{job_id}", "/predict", "/predict/batch", "/model-info", "/ready", "/cache/stats", "/cache/prefetch", "/ilac-info/{ilac_id}", "/etken-maddeler"]
     }), 404
 
 @app.errorhandler(500)
@@ -2434,9 +4733,10 @@ if __name__ == "__main__":
     logger.info(f"API URL: {API_BASE_URL}")
     
     # Uygulama başlatıldığında modeli yükle
-    if os.path.exists('improved_drug_recommender.joblib'):
-        logger.info("Mevcut model dosyası bulundu, yükleniyor...")
-        if drug_recommender.load_model():
+    model_path = resolve_recommender_path()
+    if model_path:
+        logger.info(f"Mevcut model bulundu, yükleniyor: {model_path}")
+        if drug_recommender.load_model(model_path):
             logger.info("Model başarıyla yüklendi")
         else:
             logger.error("Model yüklenemedi")
@@ -2450,5 +4750,10 @@ if __name__ == "__main__":
     if hasattr(drug_recommender, 'etken_madde_lookup'):
         logger.info(f"Etken madde sayısı: {len(drug_recommender.etken_madde_lookup)}")
     
-    # Uygulamayı başlat
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Geliştirme sunucusunu başlat (üretimde: gunicorn -c gunicorn.conf.py wsgi:app)
+    app.run(
+        host=os.environ.get("FLASK_HOST", "0.0.0.0"),
+        port=int(os.environ.get("FLASK_PORT", 5000)),
+        debug=os.environ.get("FLASK_DEBUG", "0") == "1",
+        threaded=True
+    )
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""Testler için ortak ayarlar: modül yolu, sentetik eğitim verisi ve eğitilmiş hibrit model"""
+import os
+import random
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ilac_oneri_model as iom  # noqa: E402
+
+
+def synthetic_tables(seed=0, n_ilac=60, n_etken=20, n_hastalik=10, n_hasta=150):
+    """Laravel API tablolarının küçük, tekrarlanabilir bir örneği (ağ erişimi gerekmez)"""
+    rng = random.Random(seed)
+    tables = {
+        "hastalar": [
+            {
+                "hasta_id": i,
+                "yas": rng.randint(1, 90) if i % 11 else None,
+                "cinsiyet": rng.choice(["Erkek", "Kadın"]),
+                "boy": float(rng.randint(150, 190)),
+                "kilo": float(rng.randint(50, 110)),
+                "vki": round(rng.uniform(18, 35), 2) if i % 3 else None
+            }
+            for i in range(1, n_hasta + 1)
+        ],
+        "hastaliklar": [
+            {"hastalik_id": i, "hastalik_adi": f"Hastalık {i}", "hastalik_kategorisi": rng.choice(["A", "B"])}
+            for i in range(1, n_hastalik + 1)
+        ],
+        "hasta_hastaliklar": [
+            {"hasta_hastalik_id": i, "hasta_id": rng.randint(1, n_hasta), "hastalik_id": rng.randint(1, n_hastalik)}
+            for i in range(1, 401)
+        ],
+        "ilaclar": [{"ilac_id": i, "ilac_adi": f"İlaç {i}"} for i in range(1, n_ilac + 1)],
+        "etken_maddeler": [{"etken_madde_id": i, "etken_madde_adi": f"Etken {i}"} for i in range(1, n_etken + 1)],
+        "ilac_etken_maddeler": [],
+        "hasta_ilac_kullanim": [
+            {"kullanim_id": i, "hasta_id": rng.randint(1, n_hasta), "ilac_id": rng.randint(1, n_ilac)}
+            for i in range(1, 801)
+        ]
+    }
+    for ilac_id in range(1, n_ilac + 1):
+        for etken_madde_id in rng.sample(range(1, n_etken + 1), rng.randint(1, 3)):
+            tables["ilac_etken_maddeler"].append({"ilac_id": ilac_id, "etken_madde_id": etken_madde_id})
+    return tables
+
+
+@pytest.fixture(scope="session")
+def prepared_data():
+    tables = synthetic_tables()
+    prepared = iom.improved_data_preparation(tables)
+    prepared["hasta_ilac_kullanim"] = pd.DataFrame(tables["hasta_ilac_kullanim"])[["hasta_id", "ilac_id"]]
+    return prepared
+
+
+@pytest.fixture(scope="session")
+def recommender(prepared_data):
+    return iom.HybridDrugRecommender().fit(prepared_data)
+
+
+@pytest.fixture(autouse=True)
+def fresh_prediction_caches(monkeypatch):
+    """Her test boş tahmin önbellekleriyle başlar (sonuçlar testler arasında taşınmaz)"""
+    monkeypatch.setattr(iom, "hibrit_tahmin_cache", iom.TTLCache("hibrit_tahmin", 1000, 600))
+    monkeypatch.setattr(iom, "ilac_tahmin_cache", iom.TTLCache("ilac_tahmin", 1000, 600))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic yerine elle ilerletilen saat (TTL ve devre kesici süreleri için)"""
+    class Clock:
+        now = 1000.0
+
+        def advance(self, seconds):
+            self.now += seconds
+
+    fake = Clock()
+    monkeypatch.setattr(iom.time, "monotonic", lambda: fake.now)
+    return fake
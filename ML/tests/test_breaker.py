@@ -0,0 +1,60 @@
+from ilac_oneri_model import CircuitBreaker
+
+
+def open_breaker():
+    breaker = CircuitBreaker(max_failures=3, reset_timeout=30)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(max_failures=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # başarı sayacı sıfırlar
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_allows_single_trial(clock):
+    breaker = open_breaker()
+
+    clock.advance(29)
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.advance(1)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # deneme sürerken diğer çağrılar reddedilir
+
+
+def test_successful_trial_closes(clock):
+    breaker = open_breaker()
+    clock.advance(30)
+    assert breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_reopens(clock):
+    breaker = open_breaker()
+    clock.advance(30)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    clock.advance(29)
+    assert not breaker.allow()
+    clock.advance(1)
+    assert breaker.allow()
@@ -0,0 +1,60 @@
+from ilac_oneri_model import TTLCache
+
+
+def test_lru_eviction(clock):
+    cache = TTLCache("test", 2, 60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # a en son kullanılan olur
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(clock):
+    cache = TTLCache("test", 10, 60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=120)
+
+    clock.advance(59)
+    assert cache.get("a") == 1
+
+    clock.advance(1)
+    assert cache.get("a", "yok") == "yok"
+    assert cache.get_many(["a", "b"]) == {"b": 2}
+
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["size"] == 1
+
+
+def test_hit_and_miss_counters(clock):
+    cache = TTLCache("test", 10, 60)
+    cache.set_many({"a": 1, "b": 2})
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 1, 0.6667)
+
+
+def test_returned_values_are_copies():
+    cache = TTLCache("test", 10, 60)
+    value = {"recommendations": [{"ilac_id": 1}]}
+    cache.set("a", value)
+
+    # Kaydedilen nesneyi veya dönen sonucu değiştirmek önbellekteki kaydı bozmaz
+    value["recommendations"].append({"ilac_id": 2})
+    cache.get("a")["recommendations"][0]["ilac_id"] = 99
+    cache.get_many(["a"])["a"]["recommendations"].clear()
+
+    assert cache.get("a") == {"recommendations": [{"ilac_id": 1}]}
+
+
+def test_falsy_values_are_cached():
+    cache = TTLCache("test", 10, 60)
+    cache.set("bos", {})
+
+    assert cache.get("bos", "yok") == {}
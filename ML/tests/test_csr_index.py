@@ -0,0 +1,74 @@
+import mmap
+
+import numpy as np
+
+from ilac_oneri_model import CSRIndex
+
+
+def is_memory_mapped(array):
+    """Dizi (veya görünümü olduğu dizi) bir dosyaya bellek eşlemeli mi"""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def make_index():
+    return CSRIndex.from_pairs([3, 1, 3, 2, 3], [10, 11, 12, 10, 10], [0.5, 0.1, 0.2, 0.9, 0.3])
+
+
+def test_from_pairs_sorts_keys_and_keeps_value_order():
+    index = make_index()
+
+    assert index.keys_array.tolist() == [1, 2, 3]
+    assert index.indptr.tolist() == [0, 1, 2, 5]
+    assert index[3] == {10: 0.3, 12: 0.2}  # tekrarlanan değerde son skor sözlükte kalır
+    assert index.row(3)[0].tolist() == [10, 12, 10]
+
+
+def test_from_pairs_skips_missing_keys_and_values():
+    index = CSRIndex.from_pairs([1, None, 2, 2], [5, 6, np.nan, 7])
+
+    assert dict(index) == {1: [5], 2: [7]}
+
+
+def test_mapping_interface():
+    index = CSRIndex.from_pairs([1, 1, 2], [5, 6, 7])
+
+    assert len(index) == 2
+    assert 1 in index and 9 not in index
+    assert index.get(9) is None
+    assert index.row(9)[0].size == 0
+    assert list(index.items()) == [(1, [5, 6]), (2, [7])]
+
+
+def test_save_load_roundtrip_is_memory_mapped(tmp_path):
+    index = make_index()
+    index.save_arrays(tmp_path, "skorlar")
+
+    loaded = CSRIndex.load_arrays(tmp_path, "skorlar")
+
+    for array in (loaded.keys_array, loaded.indptr, loaded.indices, loaded.data):
+        assert is_memory_mapped(array)
+    assert dict(loaded) == dict(index)
+    for key in index:
+        np.testing.assert_array_equal(loaded.row(key)[0], index.row(key)[0])
+        np.testing.assert_array_equal(loaded.row(key)[1], index.row(key)[1])
+
+
+def test_save_load_without_data(tmp_path):
+    index = CSRIndex.from_pairs([1, 1, 2], [5, 6, 7])
+    index.save_arrays(tmp_path, "liste")
+
+    loaded = CSRIndex.load_arrays(tmp_path, "liste")
+
+    assert loaded.data is None
+    assert dict(loaded) == {1: [5, 6], 2: [7]}
+
+
+def test_inverted_and_distinct_counts():
+    index = CSRIndex.from_pairs([1, 1, 1, 2], [5, 6, 5, 5])
+
+    assert index.distinct_counts().tolist() == [2, 1]
+    assert dict(index.inverted()) == {5: [1, 2], 6: [1]}
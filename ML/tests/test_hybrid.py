@@ -0,0 +1,196 @@
+import json
+
+import pytest
+
+import ilac_oneri_model as iom
+
+QUERIES = [
+    {"hasta_id": 1, "hastalik_id": 2},
+    {"hasta_id": 2, "hastalik_id": 3, "exclude_ilac_ids": [1, 2, 3]},
+    {"hasta_id": 3, "etken_madde_ids": [4, 7]},
+    {"hasta_id": 4, "hastalik_id": 5, "etken_madde_ids": [1],
+     "hasta_demografik": {"cinsiyet": "Kadın", "yas": 34, "vki": 22.5}},
+    {"hasta_id": 5, "hastalik_id": 1, "hasta_demografik": {"cinsiyet": "Erkek", "boy": 180, "kilo": 81}}
+]
+
+
+def ranking(result):
+    return [(item["ilac_id"], round(item["olaslik"], 12)) for item in result["recommendations"]]
+
+
+def predict_all(recommender):
+    return [ranking(result) for result in recommender.predict_batch(QUERIES)]
+
+
+@pytest.mark.parametrize("name", ["kayit", "eski.joblib"], ids=["surumlu", "tek_dosya"])
+def test_predictions_survive_save_and_load(recommender, tmp_path, name):
+    expected = predict_all(recommender)
+    path = str(tmp_path / name)
+    recommender.save_model(path)
+
+    loaded = iom.HybridDrugRecommender()
+    assert loaded.load_model(path)
+
+    assert loaded.patient_feature_medians == recommender.patient_feature_medians
+    assert predict_all(loaded) == expected
+    assert all(expected)
+
+
+def test_batch_matches_single_predictions(recommender):
+    batch = predict_all(recommender)
+    iom.hibrit_tahmin_cache.clear()
+
+    assert [ranking(recommender.predict(**query)) for query in QUERIES] == batch
+
+
+def test_shortlist_matches_full_fusion_with_exploration(recommender, monkeypatch):
+    monkeypatch.setattr(recommender, "exploration_rate", 0.3)
+    if recommender.fusion_ilac_ids is None:
+        recommender._build_fusion_index()
+    weights = recommender.fusion_weights
+
+    for hastalik_id in recommender.hastalik_ilac_scores:
+        query = {"hasta_id": 1, "hastalik_id": hastalik_id}
+        shortlist = recommender._get_disease_only_scores(hastalik_id, weights[1])
+        full = recommender._fuse_scores(None, recommender._get_disease_drug_recommendations(hastalik_id), None, weights)
+
+        from_shortlist = recommender._format_recommendations(*shortlist, rng=recommender._exploration_rng(query))
+        from_full = recommender._format_recommendations(*full, rng=recommender._exploration_rng(query))
+        assert from_shortlist == from_full
+
+
+def test_cached_result_is_not_aliased(recommender):
+    query = QUERIES[0]
+    first = recommender.predict(**query)
+    expected = ranking(first)
+
+    first["recommendations"].clear()
+
+    assert ranking(recommender.predict(**query)) == expected
+
+
+def test_demographics_are_bucketed_for_key_and_input(recommender):
+    exact = {"hasta_id": 1, "hastalik_id": 2, "hasta_demografik": {"cinsiyet": "Erkek", "yas": 40, "vki": 24.0}}
+    noisy = {"hasta_id": 2, "hastalik_id": 2, "hasta_demografik": {"cinsiyet": "Erkek", "yas": "40.3", "vki": 24.04}}
+
+    assert recommender._prediction_cache_key(exact) == recommender._prediction_cache_key(noisy)
+    assert ranking(recommender.predict(**exact)) == ranking(recommender.predict(**noisy))
+
+
+@pytest.mark.parametrize("shared", [False, True], ids=["bellek", "paylasilan"])
+def test_swap_clears_only_process_local_cache(recommender, monkeypatch, shared):
+    monkeypatch.setattr(iom, "drug_recommender", recommender)
+    monkeypatch.setattr(iom.hibrit_tahmin_cache, "shared", shared)
+    recommender.predict(**QUERIES[0])
+
+    iom.swap_recommender(recommender)
+
+    assert (iom.hibrit_tahmin_cache.stats()["size"] > 0) == shared
+
+
+def test_failing_query_does_not_stop_batch(recommender, monkeypatch):
+    original = recommender._get_disease_drug_recommendations
+
+    def failing(hastalik_id):
+        if hastalik_id == 2:
+            raise RuntimeError("bozuk")
+        return original(hastalik_id)
+
+    monkeypatch.setattr(recommender, "_get_disease_drug_recommendations", failing)
+    queries = [{"hasta_id": 1, "hastalik_id": 2, "etken_madde_ids": [1]}, {"hasta_id": 2, "hastalik_id": 3}]
+
+    results = list(recommender.predict_batch(queries))
+
+    assert "error" in results[0]
+    assert results[1]["recommendations"]
+
+
+@pytest.fixture
+def client(recommender, monkeypatch):
+    monkeypatch.setattr(iom, "drug_recommender", recommender)
+    monkeypatch.setattr(iom, "RECOMMENDER_RELOAD_INTERVAL", 0)
+    return iom.app.test_client()
+
+
+def test_batch_route_accepts_scalar_ids(client):
+    response = client.post("/predict/batch", json={"queries": [
+        {"hasta_id": 1, "etken_madde_ids": 4, "exclude_ilac_ids": 7},
+        {"hasta_id": 2, "hastalik_id": 2, "etken_madde_ids": [[1]]},
+        {"hastalik_id": 2},
+        {"hasta_id": 3, "hastalik_id": 2}
+    ]})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert response.status_code == 200
+    assert [line["index"] for line in lines] == [0, 1, 2, 3]
+    assert lines[0]["recommendations"]
+    assert all(item["ilac_id"] != 7 for item in lines[0]["recommendations"])
+    assert "error" in lines[1] and "error" in lines[2]
+    assert lines[3]["recommendations"]
+
+
+def test_predict_route_accepts_scalar_ids(client):
+    response = client.post("/predict", json={"hasta_id": 1, "etken_madde_ids": 4, "exclude_ilac_ids": 7})
+
+    assert response.status_code == 200
+    assert response.get_json()["recommendations"]
+
+
+def test_fusion_weights_scale_scores_and_key(recommender, monkeypatch):
+    query = {"hasta_id": 1, "hastalik_id": 2, "etken_madde_ids": [1]}
+    base = recommender.predict(**query)["recommendations"]
+    base_key = recommender._prediction_cache_key(query)
+
+    etken, hastalik, hasta = recommender.fusion_weights
+    monkeypatch.setattr(recommender, "fusion_weights", (etken * 2, hastalik * 2, hasta * 2))
+    scaled = recommender.predict(**query)["recommendations"]
+
+    assert recommender._prediction_cache_key(query) != base_key
+    assert [item["ilac_id"] for item in scaled] == [item["ilac_id"] for item in base]
+    assert [item["olaslik"] for item in scaled] == pytest.approx([item["olaslik"] * 2 for item in base])
+
+
+def test_exploration_is_deterministic_per_query(recommender, monkeypatch):
+    monkeypatch.setattr(recommender, "exploration_rate", 0.3)
+    query = {"hasta_id": 1, "hastalik_id": 2}
+
+    first = recommender.predict(**query)
+    iom.hibrit_tahmin_cache.clear()
+
+    assert recommender.predict(**query) == first
+
+
+def test_fusion_averages_weighted_scores_of_present_models(recommender, monkeypatch):
+    if recommender.fusion_ilac_ids is None:
+        recommender._build_fusion_index()
+    monkeypatch.setattr(recommender, "etken_madde_fallback_score", 0.1)
+    a, b, c = recommender.fusion_ilac_ids[:3].tolist()
+    etken = recommender._dense_scores([a, b], [0.5, 0.2])
+    hastalik = recommender._dense_scores([b, c], [0.4, 1.0])
+    weights = (1.0, 2.0, 0.8)
+
+    ilac_ids, scores = recommender._fuse_scores(etken, hastalik, None, weights)
+    assert ilac_ids.tolist() == [a, b, c]
+    assert scores == pytest.approx([0.5, (0.2 + 0.8) / 2, 2.0])
+
+    # Etken madde istendiğinde etken skoru olmayan aday yedek skor alır; hariç tutulan düşer
+    ilac_ids, scores = recommender._fuse_scores(
+        etken, hastalik, None, weights, exclude_ilac_ids=[a], etken_madde_requested=True
+    )
+    assert ilac_ids.tolist() == [b, c]
+    assert scores == pytest.approx([(0.2 + 0.8) / 2, (2.0 + 0.1) / 2])
+
+
+def test_missing_demographics_use_training_medians(recommender):
+    medians = recommender.patient_feature_medians
+
+    profiles = recommender._patient_profiles([
+        {"cinsiyet": None, "yas": None, "vki": "bilinmiyor"},
+        {"cinsiyet": "Kadın", "yas": 30.4, "boy": 200, "kilo": 100},
+        {},
+        "gecersiz"
+    ])
+
+    assert profiles[0] == ["bilinmiyor", round(medians["yas"]), round(medians["vki"], 1)]
+    assert profiles[1] == ["Kadın", 30.0, 25.0]
+    assert profiles[2:] == [None, None]
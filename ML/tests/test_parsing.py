@@ -0,0 +1,53 @@
+import io
+import json
+
+import pytest
+
+import ilac_oneri_model as iom
+
+ROWS = [
+    {"ilac_id": 1, "ilac_adi": "A", "etken_maddeler": [{"etken_madde_id": 5}]},
+    {"ilac_id": 2, "ilac_adi": None}
+]
+
+
+def stream(payload):
+    return io.BytesIO(json.dumps(payload).encode("utf-8"))
+
+
+@pytest.mark.skipif(iom.ijson is None, reason="ijson kurulu değil")
+@pytest.mark.parametrize("payload", [
+    ROWS,
+    {"data": ROWS},
+    {"status": "success", "data": {"current_page": 1, "data": ROWS, "last_page": 1}}
+], ids=["dizi", "data", "sayfali"])
+def test_parse_page_stream_response_shapes(payload):
+    page = iom.parse_page_stream(stream(payload), ["ilac_id", "ilac_adi"])
+
+    assert page.rows == 2
+    assert page.values == {"ilac_id": [1, 2], "ilac_adi": ["A", None]}
+
+
+@pytest.mark.skipif(iom.ijson is None, reason="ijson kurulu değil")
+def test_parse_page_stream_pagination_fields():
+    payload = {"data": {"data": ROWS, "last_page": 4, "per_page": "2", "total": 7}}
+
+    page = iom.parse_page_stream(stream(payload), ["ilac_id"])
+
+    assert (page.last_page, page.per_page, page.total) == (4, 2, 7)
+
+
+@pytest.mark.parametrize("payload, expected_pages", [
+    (ROWS, 1),
+    ({"data": ROWS}, 1),
+    ({"data": {"data": ROWS, "last_page": 3}}, 3)
+], ids=["dizi", "data", "sayfali"])
+def test_parse_page_fallback(payload, expected_pages):
+    records, last_page = iom.ilac_oneri_model._parse_page("ilaclar", payload)
+
+    assert records == ROWS
+    assert last_page == expected_pages
+
+
+def test_parse_page_rejects_non_list():
+    assert iom.ilac_oneri_model._parse_page("ilaclar", {"data": "hata"}) == ([], 1)
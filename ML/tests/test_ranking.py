@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from ilac_oneri_model import top_k_indices
+
+
+def test_ties_prefer_smaller_index():
+    scores = np.array([1.0, 3.0, 3.0, 2.0, 3.0])
+
+    assert top_k_indices(scores, 2).tolist() == [1, 2]
+    assert top_k_indices(scores, 4).tolist() == [1, 2, 4, 3]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_stable_sort(seed):
+    rng = np.random.default_rng(seed)
+    scores = rng.integers(0, 5, size=50).astype(np.float64)  # çok sayıda eşit skor
+
+    for k in (1, 5, 17, 50):
+        expected = np.argsort(-scores, kind="stable")[:k]
+        assert top_k_indices(scores, k).tolist() == expected.tolist()
+
+
+def test_k_out_of_range():
+    scores = np.array([0.2, 0.7])
+
+    assert top_k_indices(scores, 10).tolist() == [1, 0]
+    assert top_k_indices(scores, 0).size == 0
+    assert top_k_indices(np.array([]), 3).size == 0
@@ -0,0 +1,18 @@
+"""
+İlaç Öneri Sistemi WSGI giriş noktası
+
+Üretimde çalıştırma:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+preload_app açıkken bu modül fork öncesi ana süreçte bir kez içe aktarılır. Kayıtlı hibrit
+model burada yüklenir. .npy dizileri bellek eşlemeli olduğu için tüm worker'larda tek fiziksel
+kopyadır. Hasta özellikleri modeli (RandomForest) ise paylaşılmaz: fork sonrası sayfaları ancak
+yazılana kadar ortak kalır ve yeni bir sürüm yüklendiğinde her worker ormanın kendi kopyasını
+taşır. Bellek ihtiyacı bu yüzden worker sayısıyla artar.
+"""
+from ilac_oneri_model import app, ensure_recommender_loaded, logger
+
+if ensure_recommender_loaded():
+    logger.info("Hibrit model worker'lar başlatılmadan önce yüklendi")
+else:
+    logger.warning("Kayıtlı hibrit model bulunamadı, /train ile eğitim gerekli")